@@ -1,41 +1,215 @@
 import os
 import json
+import time
+import queue
+import hashlib
+import logging
+import threading
+from collections import Counter, OrderedDict
 from pathlib import Path
-from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-def generate_scheme_form(question: str) -> str:
-    """Generate scheme form using ACTUAL query context"""
+logger = logging.getLogger(__name__)
+
+# ---- Form store ----
+# Templates are built once per (form class, scheme), kept in memory addressed by their sha256,
+# and served from /api/forms/{digest}. Entries evicted from memory are written to a bounded
+# spill directory by a background thread, which also expires old spill files; an evicted entry
+# stays readable from memory until its spill file exists.
+FORMS_MEMORY_BYTES = int(os.getenv("FORMS_MEMORY_BYTES", str(4 * 1024 * 1024)))
+FORMS_SPILL_DIR = Path(os.getenv("FORMS_SPILL_DIR", "temp_files/forms"))
+FORMS_SPILL_MAX_FILES = int(os.getenv("FORMS_SPILL_MAX_FILES", "2000"))
+FORMS_SPILL_TTL_S = float(os.getenv("FORMS_SPILL_TTL_S", str(7 * 24 * 3600)))
+FORMS_CLEANUP_INTERVAL_S = float(os.getenv("FORMS_CLEANUP_INTERVAL_S", "600"))
+FORMS_URL_PREFIX = "/api/forms/"
+
+BASE_FIELDS = [
+    "personal_information",
+    "educational_qualifications",
+    "income_details",
+    "supporting_documents",
+    "bank_account_details",
+    "contact_information"
+]
+
+# query class -> (keywords, extra fields)
+FORM_CLASSES = {
+    "education": (("scholarship", "student", "education", "college", "school", "fee"),
+                  ["institution_details", "course_details", "previous_marks"]),
+    "agriculture": (("farmer", "crop", "agricultur", "land", "kisan", "irrigation"),
+                    ["land_records", "crop_details"]),
+    "business": (("business", "loan", "msme", "enterprise", "startup", "mudra"),
+                 ["business_registration", "project_report"]),
+    "pension": (("pension", "senior", "old age", "widow", "retire"),
+                ["age_proof", "pension_account_details"]),
+    "health": (("health", "hospital", "medical", "insurance", "treatment"),
+               ["medical_records", "hospital_details"]),
+    "disability": (("disability", "disabled", "pwd", "divyang"),
+                   ["disability_certificate"]),
+}
+
+def classify_form(question: str) -> str:
+    q = question.lower()
+    for name, (keywords, _) in FORM_CLASSES.items():
+        if any(k in q for k in keywords):
+            return name
+    return "general"
+
+def _scheme_of(chunks: Optional[List[Dict[str, Any]]]) -> str:
+    """Most frequent scheme_name among the retrieved chunks ('' if none)."""
+    from .docstore import _parse_metadata
+    names = Counter(_parse_metadata(c.get("metadata")).get("scheme_name") for c in chunks or [])
+    names.pop(None, None)
+    return names.most_common(1)[0][0] if names else ""
+
+def build_form_template(form_class: str, scheme: str) -> bytes:
+    extra = FORM_CLASSES.get(form_class, ((), []))[1]
+    return json.dumps({
+        "scheme": scheme or None,
+        "form_class": form_class,
+        "auto_generated": True,
+        "suggested_fields": BASE_FIELDS + extra,
+        "status": "draft",
+        "notes": "This is an auto-generated form template based on your query. Please fill in the actual details as required by the specific scheme."
+    }, indent=2).encode("utf-8")
+
+class FormStore:
+    def __init__(self, max_bytes: int = FORMS_MEMORY_BYTES, spill_dir: Path = FORMS_SPILL_DIR):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self._lock = threading.Lock()
+        self._blobs: "OrderedDict[str, bytes]" = OrderedDict()     # digest -> body (LRU)
+        self._digests: Dict[Tuple[str, str], str] = {}              # (form class, scheme) -> digest, resident only
+        self._keys: Dict[str, set] = {}                             # digest -> its (form class, scheme) keys
+        self._spilling: Dict[str, bytes] = {}                       # evicted, spill file not written yet
+        self._bytes = 0
+        self._spill_queue: "queue.SimpleQueue[Tuple[str, bytes]]" = queue.SimpleQueue()
+        self.counters = Counter()
+        self._janitor = threading.Thread(target=self._run_janitor, name="form-janitor", daemon=True)
+        self._janitor.start()
+
+    def form_for(self, form_class: str, scheme: str) -> str:
+        """Digest of the template for this class/scheme, building it on first use."""
+        key = (form_class, scheme)
+        with self._lock:
+            digest = self._digests.get(key)
+            if digest is not None and digest in self._blobs:
+                self._blobs.move_to_end(digest)
+                self.counters["hits"] += 1
+                return digest
+        body = build_form_template(form_class, scheme)
+        digest = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            self.counters["built"] += 1
+            self._put(digest, body)
+            self._digests[key] = digest
+            self._keys.setdefault(digest, set()).add(key)
+        return digest
+
+    def _put(self, digest: str, body: bytes) -> None:
+        if digest in self._blobs:
+            self._blobs.move_to_end(digest)
+            return
+        self._blobs[digest] = body
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes and len(self._blobs) > 1:
+            old, old_body = self._blobs.popitem(last=False)
+            self._bytes -= len(old_body)
+            self.counters["evicted"] += 1
+            for key in self._keys.pop(old, ()):
+                self._digests.pop(key, None)
+            # written by the janitor, not the request thread; served from _spilling until then
+            self._spilling[old] = old_body
+            self._spill_queue.put((old, old_body))
+
+    def get(self, digest: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._blobs.get(digest)
+            if body is not None:
+                self._blobs.move_to_end(digest)
+                return body
+            body = self._spilling.get(digest)
+            if body is not None:
+                return body
+        path = self._spill_path(digest)
+        if path is None or not path.exists():
+            return None
+        body = path.read_bytes()
+        if hashlib.sha256(body).hexdigest() != digest:
+            return None
+        self.counters["spill_reads"] += 1
+        return body
+
+    def _spill_path(self, digest: str) -> Optional[Path]:
+        if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+            return None
+        return self.spill_dir / f"{digest}.json"
+
+    # ---- background spill + cleanup ----
+    def _spill(self, digest: str, body: bytes) -> None:
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.spill_dir / f".{digest}.tmp"
+            tmp.write_bytes(body)
+            os.replace(tmp, self.spill_dir / f"{digest}.json")
+            self.counters["spilled"] += 1
+        except OSError as e:
+            self.counters["spill_failed"] += 1
+            logger.error(f"Form spill failed: {e}")
+        finally:
+            with self._lock:
+                self._spilling.pop(digest, None)     # the file is in place (or never will be)
+
+    def _run_janitor(self) -> None:
+        """Started with the store: spills evicted entries and runs cleanup() every FORMS_CLEANUP_INTERVAL_S."""
+        last_cleanup = 0.0
+        while True:
+            try:
+                self._spill(*self._spill_queue.get(timeout=FORMS_CLEANUP_INTERVAL_S))
+            except queue.Empty:
+                pass
+            if time.monotonic() - last_cleanup >= FORMS_CLEANUP_INTERVAL_S:
+                try:
+                    self.cleanup()
+                except OSError as e:       # e.g. another worker deleted a file mid-scan; retry next round
+                    logger.error(f"Form spill cleanup failed: {e}")
+                last_cleanup = time.monotonic()
+
+    def cleanup(self) -> int:
+        """Delete spill files past FORMS_SPILL_TTL_S, then the oldest beyond FORMS_SPILL_MAX_FILES."""
+        if not self.spill_dir.exists():
+            return 0
+        files = sorted(self.spill_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        cutoff = time.time() - FORMS_SPILL_TTL_S
+        doomed = [p for p in files if p.stat().st_mtime < cutoff]
+        keep = [p for p in files if p.stat().st_mtime >= cutoff]
+        doomed += keep[:max(0, len(keep) - FORMS_SPILL_MAX_FILES)]
+        for p in doomed:
+            try:
+                p.unlink()
+            except OSError:
+                pass
+        self.counters["spill_deleted"] += len(doomed)
+        return len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._blobs), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "keys": len(self._digests), "spilling": len(self._spilling), **self.counters}
+
+form_store = FormStore()
+
+def generate_scheme_form(question: str, chunks: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Download URL of the form template for this question's class and scheme (no disk I/O)"""
     try:
-        # Create temp directory
-        temp_dir = Path("temp_files")
-        temp_dir.mkdir(exist_ok=True)
-        
-        # Create safe filename
-        filename = f"scheme_form_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        temp_file = temp_dir / filename
-        
-        # Create form based on ACTUAL query
-        with open(temp_file, "w", encoding="utf-8") as f:
-            json.dump({
-                "scheme_query": question,
-                "auto_generated": True,
-                "timestamp": datetime.now().isoformat(),
-                "suggested_fields": [
-                    "personal_information",
-                    "educational_qualifications", 
-                    "income_details",
-                    "supporting_documents",
-                    "bank_account_details",
-                    "contact_information"
-                ],
-                "status": "draft",
-                "notes": "This is an auto-generated form template based on your query. Please fill in the actual details as required by the specific scheme."
-            }, f, indent=2)
-        
-        return str(temp_file)
-        
+        digest = form_store.form_for(classify_form(question), _scheme_of(chunks))
+        return FORMS_URL_PREFIX + digest
     except Exception as e:
-        print(f"Error generating scheme form: {e}")
+        logger.error(f"Error generating scheme form: {e}")
         return ""
 
-# RTI FUNCTION COMPLETELY REMOVED
\ No newline at end of file
+def iter_form(body: bytes, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    for i in range(0, len(body), chunk_size):
+        yield body[i:i + chunk_size]
+
+# RTI FUNCTION COMPLETELY REMOVED
@@ -0,0 +1,108 @@
+# app/admin.py  (operator endpoints, guarded by the X-Admin-Token header)
+import os
+import secrets
+import logging
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from .database import get_db
+from . import segment_cache, singleflight, resilience, sharding, conversation, prewarm, profiling, dedup, embed_executor, suggest, hierarchy
+from .admission import llm_gate
+
+logger = logging.getLogger(__name__)
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def is_admin(token: str | None) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and secrets.compare_digest(token, ADMIN_TOKEN)
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints disabled (set ADMIN_TOKEN)")
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+@router.get("/segment-cache")
+async def segment_cache_report():
+    """Hit rate overall and per profile segment."""
+    return segment_cache.cache.report()
+
+@router.post("/segment-cache/warm")
+def segment_cache_warm(top_n: int = 20, db: Session = Depends(get_db)):
+    """Precompute results for the most common stored segments x SEGMENT_WARM_QUERIES."""
+    return segment_cache.warm(db, top_n=top_n)
+
+@router.delete("/segment-cache")
+async def segment_cache_clear():
+    segment_cache.cache.clear()
+    return {"success": True}
+
+@router.get("/admission")
+async def admission_stats():
+    """LLM gate: active/queued slots, wait percentiles, admitted/rejected counters."""
+    return llm_gate.stats()
+
+@router.get("/singleflight")
+async def singleflight_stats():
+    """Executed vs coalesced counts for retrieval and LLM calls."""
+    return singleflight.stats()
+
+@router.get("/resilience")
+async def resilience_stats():
+    """Circuit breaker states, retry counters and hedging stats for the database and the LLM."""
+    return resilience.stats()
+
+@router.get("/dedup")
+async def dedup_stats():
+    """DEDUP_ENABLED=1: near-duplicate clusters collapsed at the last index build, and the memory saved."""
+    return dedup.stats()
+
+@router.get("/embedding")
+async def embedding_stats():
+    """Last corpus embedding run: batches, padding, RSS growth against EMBED_MEMORY_BUDGET_MB, throughput."""
+    return embed_executor.stats()
+
+@router.get("/suggest")
+async def suggest_stats():
+    """Autocomplete index: generation it was built for, distinct names, prefix keys, approximate bytes."""
+    return suggest.stats()
+
+@router.get("/hierarchy")
+async def hierarchy_stats():
+    """SEARCH_HIERARCHICAL=1: scheme/section groups, and the share of the flat scan each query actually scored."""
+    return hierarchy.stats()
+
+@router.get("/shards")
+async def shard_stats():
+    """INDEX_MODE=sharded: per-shard health, chunk counts and scatter latency."""
+    return sharding.stats()
+
+@router.get("/prewarm")
+async def prewarm_status():
+    """Last pre-warm run: per-step timings and results, total duration, readiness."""
+    return prewarm.status()
+
+@router.post("/prewarm")
+def prewarm_run(traffic_log: str | None = None):
+    """Run the pre-warm now (e.g. after a reload); blocks until done."""
+    return prewarm.run(traffic_log)
+
+@router.get("/profiles")
+async def profile_list():
+    """Recent request profiles: duration, sample count, allocation peak and top allocation sites."""
+    return {**profiling.stats(), "profiles": profiling.list_profiles()}
+
+@router.get("/profiles/{profile_id}")
+async def profile_download(profile_id: str):
+    """Speedscope JSON for one profile (open at https://www.speedscope.app)."""
+    doc = profiling.get_profile(profile_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return JSONResponse(doc, headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'})
+
+@router.get("/conversations")
+async def conversation_stats():
+    """Sessions held by the conversation store and fresh / blend / reuse retrieval counts."""
+    return conversation.stats()
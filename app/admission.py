@@ -0,0 +1,189 @@
+# app/admission.py  (concurrency limiter + bounded priority queue in front of the LLM)
+import os
+import time
+import heapq
+import itertools
+import logging
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "32"))
+LLM_QUEUE_TIMEOUT_S = float(os.getenv("LLM_QUEUE_TIMEOUT_S", "15"))
+LLM_PER_SESSION_MAX = int(os.getenv("LLM_PER_SESSION_MAX", "2"))    # in flight + queued per session
+LLM_SHED_MODE = os.getenv("LLM_SHED_MODE", "reject").lower()        # reject -> 429/503, degrade -> retrieval-only
+SHORT_PROMPT_CHARS = int(os.getenv("LLM_SHORT_PROMPT_CHARS", "4000"))
+
+class Overloaded(Exception):
+    """Raised instead of queueing unbounded work; carries the HTTP status and Retry-After."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ("granted", "cancelled")
+
+    def __init__(self):
+        self.granted = False
+        self.cancelled = False
+
+def priority_for(prompt_chars: int, cached: bool = False) -> int:
+    """Lower runs first: cached work, then short prompts, then long ones."""
+    if cached:
+        return 0
+    return 1 if prompt_chars <= SHORT_PROMPT_CHARS else 2
+
+class AdmissionController:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, queue_size: int = LLM_QUEUE_SIZE,
+                 per_session: int = LLM_PER_SESSION_MAX, timeout_s: float = LLM_QUEUE_TIMEOUT_S):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.per_session = per_session
+        self.timeout_s = timeout_s
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queued = 0
+        self._heap: List[list] = []
+        self._session_load: Dict[str, int] = defaultdict(int)
+        self._seq = itertools.count()
+        self._service_s = 2.0                 # EMA of time spent holding a slot
+        self._waits = deque(maxlen=2000)
+        self.counters = defaultdict(int)
+
+    def _retry_after(self) -> int:
+        backlog = self._queued + self._active
+        return max(1, int(round(self._service_s * backlog / max(self.max_concurrency, 1))))
+
+    def acquire(self, session_id: Optional[str] = None, priority: int = 1) -> None:
+        sid = session_id or ""
+        t0 = time.monotonic()
+        with self._cond:
+            if sid and self._session_load[sid] >= self.per_session:
+                self.counters["rejected_session"] += 1
+                raise Overloaded(429, "Too many concurrent requests for this session", self._retry_after())
+            if self._active < self.max_concurrency and self._queued == 0:
+                self._active += 1
+                self._session_load[sid] += 1
+                self.counters["admitted"] += 1
+                self._waits.append(0.0)
+                return
+            if self._queued >= self.queue_size:
+                self.counters["rejected_full"] += 1
+                raise Overloaded(503, "LLM queue is full", self._retry_after())
+
+            waiter = _Waiter()
+            # sessions with less outstanding work are served first within a priority class
+            heapq.heappush(self._heap, [priority, self._session_load[sid], next(self._seq), waiter])
+            self._queued += 1
+            self._session_load[sid] += 1
+            deadline = t0 + self.timeout_s
+            while not waiter.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    waiter.cancelled = True
+                    self._queued -= 1
+                    self._dec_session(sid)
+                    self.counters["rejected_timeout"] += 1
+                    raise Overloaded(503, "Timed out waiting for an LLM slot", self._retry_after())
+                self._cond.wait(remaining)
+            self.counters["admitted"] += 1
+            self._waits.append(time.monotonic() - t0)
+
+    def _dec_session(self, sid: str) -> None:
+        self._session_load[sid] -= 1
+        if self._session_load[sid] <= 0:
+            del self._session_load[sid]
+
+    def release(self, session_id: Optional[str] = None, held_s: Optional[float] = None) -> None:
+        with self._cond:
+            self._active -= 1
+            self._dec_session(session_id or "")
+            if held_s is not None:
+                self._service_s = 0.9 * self._service_s + 0.1 * held_s
+            while self._heap and self._active < self.max_concurrency:
+                _, _, _, waiter = heapq.heappop(self._heap)
+                if waiter.cancelled:
+                    continue
+                waiter.granted = True
+                self._queued -= 1
+                self._active += 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, session_id: Optional[str] = None, priority: int = 1):
+        self.acquire(session_id, priority)
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(session_id, time.monotonic() - t0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            waits = np.asarray(self._waits) * 1000.0 if self._waits else np.zeros(1)
+            p50, p95, p99 = np.percentile(waits, [50, 95, 99])
+            return {"active": self._active, "queued": self._queued, "max_concurrency": self.max_concurrency,
+                    "queue_size": self.queue_size, "per_session": self.per_session, "shed_mode": LLM_SHED_MODE,
+                    "service_time_s": round(self._service_s, 3), "retry_after_s": self._retry_after(),
+                    "wait_ms": {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)},
+                    **self.counters}
+
+class SlotStream:
+    """Iterable over open_stream() that holds an admission slot from construction on.
+
+    The slot is taken eagerly, so a shed request still fails before its response starts. It is
+    released exactly once: when the stream ends or fails, on close(), or when the object is
+    dropped without ever being iterated (a client that disconnects before the first delta).
+    """
+
+    def __init__(self, gate: AdmissionController, session_id: Optional[str], priority: int,
+                 open_stream: Callable[[], Iterable[Any]]):
+        self._gate, self._session_id, self._open = gate, session_id, open_stream
+        self._lock = threading.Lock()
+        self._held = False
+        gate.acquire(session_id, priority)
+        self._held = True
+        self._t0 = time.monotonic()
+
+    def __iter__(self) -> Iterator[Any]:
+        with self._lock:
+            if not self._held:
+                return
+        try:
+            yield from self._open()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            held, self._held = self._held, False
+        if held:
+            self._gate.release(self._session_id, time.monotonic() - self._t0)
+
+    def __del__(self):
+        self.close()
+
+llm_gate = AdmissionController()
+
+def overloaded_response(e: Overloaded) -> JSONResponse:
+    return JSONResponse(status_code=e.status_code, content={"detail": e.reason},
+                        headers={"Retry-After": str(e.retry_after)})
+
+def degraded_answer(chunks: List[Dict[str, Any]], max_chars: int = 300) -> str:
+    """Retrieval-only reply used when generation is shed."""
+    if not chunks:
+        return "The assistant is busy right now and no matching information was found. Please try again shortly."
+    lines = ["The assistant is busy right now, so here are the most relevant passages we found:"]
+    for c in chunks:
+        text = " ".join(c["content"].split())
+        lines.append(f"- {c.get('title') or c.get('source', '')}: {text[:max_chars]}{'...' if len(text) > max_chars else ''}")
+    return "\n".join(lines)
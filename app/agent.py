@@ -1,32 +1,41 @@
-from .search import retrieve
+from .search import retrieve, retrieve_near, chunks_by_id, query_vector
+from .rerank import context_k
 from .llm import answer
 from .actions import generate_scheme_form
+from . import classifier, conversation
+from .admission import llm_gate, priority_for, Overloaded, LLM_SHED_MODE, degraded_answer
+from .singleflight import llm_flight, fingerprint, normalize_text
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 import re
+import time
 import logging
 import json  # Added for JSON parsing
 
 logger = logging.getLogger(__name__)
 
-async def run_agent(question: str, db: Session, user_context: str = ""):
+async def run_agent(question: str, db: Session, user_context: str = "", session_id: str | None = None):
     try:
-        logger.info(f"Processing question: {question}")
+        logger.info("Processing question: %s", question)
         if user_context:
-            logger.info(f"User context provided: {user_context}")
+            logger.debug("User context provided: %s", user_context)
         
-        # 1. Retrieve relevant chunks from ACTUAL database
-        chunks = retrieve(question, k=5, db=db)
+        # 1. Retrieve relevant chunks from ACTUAL database (follow-ups reuse / blend the previous turn)
+        remember = bool(session_id) and conversation.CONVERSATION_ENABLED
+        turns = await run_in_threadpool(conversation.store.turns, session_id) if remember else []   # may read SQLite
+        chunks, q_vec, mode = await _plan_and_retrieve(question, turns, context_k(5), db, remember)
         logger.info(f"Retrieved {len(chunks)} chunks from database")
         
-        # Log the actual retrieved content for debugging
-        logger.info("Retrieved chunks content:")
-        for i, chunk in enumerate(chunks):
-            logger.info(f"Chunk {i+1}: Source={chunk.get('source', 'unknown')}, Title={chunk.get('title', 'No title')}")
-            logger.info(f"Content preview: {chunk['content'][:200]}...")
-            
-            # Log metadata if available
-            if 'metadata' in chunk:
-                logger.info(f"Metadata: {chunk['metadata']}")
+        # Log the actual retrieved content for debugging (DEBUG only: this is the request hot path)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Retrieved chunks content:")
+            for i, chunk in enumerate(chunks):
+                logger.debug(f"Chunk {i+1}: Source={chunk.get('source', 'unknown')}, Title={chunk.get('title', 'No title')}")
+                logger.debug(f"Content preview: {chunk['content'][:200]}...")
+                
+                # Log metadata if available
+                if 'metadata' in chunk:
+                    logger.debug(f"Metadata: {chunk['metadata']}")
         
         if not chunks:
             return {
@@ -36,25 +45,39 @@ async def run_agent(question: str, db: Session, user_context: str = ""):
                 "sources": []
             }
         
-        # 2. Build context from ACTUAL database chunks
-        context = build_database_context(chunks)
-        logger.info(f"Built context with {len(context)} characters")
+        # 2. Build context from ACTUAL database chunks (chunks sent last turn are trimmed, unless this
+        #    turn reuses them: the history only has a summary of them, the full text must go again)
+        seen = set() if mode == "reuse" else conversation.seen_chunk_ids(turns)
+        context = build_database_context(chunks, seen)
+        history = conversation.history(turns)
+        logger.debug("Built context with %d characters", len(context))
         
-        # 3. Classify query based on ACTUAL content found in database
-        category = classify_query_based_on_content(chunks)
+        # 3. Classify the query (query vector; the chunks only with CLASSIFIER_CONTENT_WEIGHT > 0 or keywords)
+        category = classify_query(chunks, question)
         logger.info(f"Classified query as: {category}")
         
         # 4. Generate answer using ACTUAL database content with user context
-        answer_text = answer_scheme_question(question, context, user_context)
+        #    (in a worker thread: the LLM call and the admission wait must not block the event loop)
+        degraded = False
+        try:
+            answer_text = await run_in_threadpool(_admitted_answer, question, context, user_context, session_id, history,
+                                                  mode == "reuse")
+        except Overloaded:
+            if LLM_SHED_MODE != "degrade":
+                raise
+            answer_text, degraded = degraded_answer(chunks), True
         logger.info(f"Generated answer with {len(answer_text)} characters")
+        if remember:
+            await run_in_threadpool(conversation.store.append, session_id, conversation.Turn(
+                question, conversation.summarize(answer_text), [c["id"] for c in chunks], q_vec, time.time()))
         
-        # 5. Only generate form if it's a scheme AND needs form
-        pdf_path = generate_scheme_form(question) if needs_form(question) else None
+        # 5. Only generate form if it's a scheme AND needs form (cached template, served by /api/forms)
+        pdf_path = generate_scheme_form(question, chunks) if needs_form(question) else None
         if pdf_path:
-            logger.info(f"Generated form at: {pdf_path}")
+            logger.info(f"Form template: {pdf_path}")
 
         # 6. Return response with ACTUAL database sources
-        return {
+        result = {
             "answer": answer_text,
             "category": category,
             "file": pdf_path,
@@ -67,7 +90,12 @@ async def run_agent(question: str, db: Session, user_context: str = ""):
                 "content_preview": c["content"][:100] + "..." if len(c["content"]) > 100 else c["content"]
             } for c in chunks]
         }
+        if degraded:
+            result["degraded"] = True
+        return result
         
+    except Overloaded:
+        raise
     except Exception as e:
         logger.error(f"Error in run_agent: {str(e)}")
         import traceback
@@ -79,6 +107,35 @@ async def run_agent(question: str, db: Session, user_context: str = ""):
             "sources": []
         }
 
+async def _retrieve(*args, **kwargs):
+    # worker thread for the embedding/DB work; DB retries wrap only the corpus query (search._load_docs)
+    return await run_in_threadpool(retrieve, *args, **kwargs)
+
+async def _retrieve_near(*args, **kwargs):
+    return await run_in_threadpool(retrieve_near, *args, **kwargs)
+
+async def _plan_and_retrieve(question, turns, k, db, remember):
+    """(chunks, query vector this turn is remembered by, mode); the vector is None when not remembering."""
+    if not turns:
+        chunks = await _retrieve(question, k=k, db=db)
+        if not remember:
+            return chunks, None, "fresh"
+        conversation.store.counters["fresh"] += 1
+        return chunks, await run_in_threadpool(query_vector, question), "fresh"   # cached by retrieve()
+    q_vec = await run_in_threadpool(query_vector, question)
+    mode, vec, source = conversation.plan(question, q_vec, turns)
+    chunks = None
+    if mode == "reuse":
+        chunks = chunks_by_id(source.chunk_ids) or None
+    elif mode == "blend":
+        chunks = await _retrieve_near(question, vec, k=k, db=db)
+    if chunks is None:
+        mode, vec = "fresh", q_vec
+        chunks = await _retrieve(question, k=k, db=db)
+    conversation.store.counters[mode] += 1
+    logger.info(f"Conversation turn {len(turns) + 1}: {mode} retrieval")
+    return chunks, vec, mode
+
 def parse_metadata(metadata):
     """Parse metadata whether it's a string or dict"""
     if isinstance(metadata, str):
@@ -91,8 +148,8 @@ def parse_metadata(metadata):
     else:
         return {}
 
-def build_database_context(chunks):
-    """Build context from ACTUAL database chunks with metadata"""
+def build_database_context(chunks, seen=()):
+    """Build context from ACTUAL database chunks with metadata (chunks in `seen` are trimmed)"""
     context_parts = []
     
     for chunk in chunks:
@@ -113,12 +170,27 @@ def build_database_context(chunks):
         source_info = f"Source: {chunk.get('source', 'unknown')}"
         
         header = f"{source_info} | {scheme_info}{field_info}"
-        context_parts.append(f"{header}\n{chunk['content']}")
+        content = chunk['content']
+        if chunk.get('id') in seen and len(content) > conversation.SEEN_CHUNK_CHARS:
+            # already sent last turn and summarised in the history
+            content = content[:conversation.SEEN_CHUNK_CHARS] + "..."
+        context_parts.append(f"{header}\n{content}")
     
     return "\n\n---\n\n".join(context_parts)
 
-def classify_query_based_on_content(chunks):
-    """Classify query based on ACTUAL content found in database"""
+def classify_query(chunks, question=""):
+    """SCHEME / CONSTITUTION / GENERAL. The embedding classifier reads the question's vector and blends in
+    the retrieved chunks only with CLASSIFIER_CONTENT_WEIGHT > 0; the keyword fallback reads the chunks."""
+    if classifier.CLASSIFIER_MODE == "embedding" and question:
+        try:
+            # reuses the query vector retrieve() just computed + the chunks' index vectors
+            return classifier.classify_category(question, chunks)
+        except Exception as e:
+            logger.error(f"Embedding classifier failed, using keywords: {e}")
+    return classify_by_keywords(chunks)
+
+def classify_by_keywords(chunks):
+    """Substring scan over content + metadata (CLASSIFIER_MODE=keywords, and the fallback)"""
     content_text = " ".join([chunk['content'].lower() for chunk in chunks])
     
     # Handle metadata parsing for classification
@@ -148,9 +220,10 @@ def classify_query_based_on_content(chunks):
     else:
         return "GENERAL"
 
-def answer_scheme_question(question, context, user_context=""):
+def answer_scheme_question(question, context, user_context="", history=""):
     """Answer using ACTUAL scheme data from database with optional user context"""
     user_context_part = f"\nUSER CONTEXT (personal information): {user_context}" if user_context else ""
+    history_part = f"\nCONVERSATION SO FAR (earlier questions and answer summaries):\n{history}\n" if history else ""
     
     scheme_prompt = f"""
     You are a government scheme assistant. Use ONLY the database context below.
@@ -158,7 +231,7 @@ def answer_scheme_question(question, context, user_context=""):
     DATABASE CONTEXT (real scheme data):
     {context}
     {user_context_part}
-    
+    {history_part}
     QUESTION: {question}
     
     Provide a comprehensive answer based on the REAL database information. Include:
@@ -174,7 +247,25 @@ def answer_scheme_question(question, context, user_context=""):
     """
     return answer(scheme_prompt, "")
 
+def _admitted_answer(question, context, user_context, session_id, history="", cached=False):
+    # identical concurrent prompts share one completion (and one admission slot)
+    key = fingerprint("agent", normalize_text(question), context, user_context, history)
+    return llm_flight.do(key, _gated_answer, question, context, user_context, session_id, history, cached)
+
+def _gated_answer(question, context, user_context, session_id, history="", cached=False):
+    # a reused turn skipped retrieval entirely: it goes ahead of fresh work in the queue
+    with llm_gate.slot(session_id, priority_for(len(context) + len(user_context) + len(history), cached)):
+        return answer_scheme_question(question, context, user_context, history)
+
 def needs_form(question):
     """Check if question requires form generation - based on ACTUAL query"""
+    if classifier.CLASSIFIER_MODE == "embedding":
+        try:
+            return classifier.wants_form(question)
+        except Exception as e:
+            logger.error(f"Embedding classifier failed, using keywords: {e}")
+    return needs_form_by_keywords(question)
+
+def needs_form_by_keywords(question):
     form_keywords = ['apply', 'application', 'form', 'register', 'enroll', 'how to', 'process', 'procedure']
     return any(keyword in question.lower() for keyword in form_keywords)
\ No newline at end of file
@@ -0,0 +1,251 @@
+# app/bulk_load.py  (bulk loader for structured scheme datasets: CSV / JSON / Parquet -> unified_chunks)
+#
+#   python -m app.bulk_load schemes.csv --method staging
+#
+# One input row per scheme; each non-empty field column (details, benefits, eligibility, ...) becomes
+# one 'scheme' chunk with chunk_metadata {scheme_name, field, level, category, state}. The explode,
+# metadata serialisation and the diff against the table are pandas column operations, not per-row
+# Python. Chunks are upserted on (scheme_name, field): an existing chunk keeps its id and is only
+# rewritten if its content or metadata changed. If the table has an `embedding` column (TiDB), the
+# changed chunks are embedded with the index builder's batching (app/embed_executor.py).
+#
+# Write methods:
+#   executemany -> chunked multi-row upserts straight into unified_chunks
+#   staging     -> plain inserts into a temporary table, then one set-based INSERT ... SELECT upsert
+#                  (the LOAD DATA pattern, without needing local_infile on client and server)
+# --dedup also reports near-duplicate clusters in the dump (app/dedup.py); every chunk is still written,
+# the index build collapses them when DEDUP_ENABLED=1.
+# Running workers keep serving their in-memory index until restarted (or `python -m app.sharding reload`).
+import os
+import io
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+BULK_LOAD_CHUNK = int(os.getenv("BULK_LOAD_CHUNK", "5000"))       # rows per executemany / transaction
+BULK_MIN_CHARS = int(os.getenv("BULK_MIN_CHARS", "20"))           # shorter field values are dropped
+
+SCHEME_FIELDS = ["details", "benefits", "eligibility", "application_process", "documents_required"]
+META_COLUMNS = ["level", "category", "state"]
+# common myScheme export headers, after snake-casing
+ALIASES = {"name": "scheme_name", "scheme": "scheme_name", "title": "scheme_name",
+           "description": "details", "brief_description": "details", "scheme_details": "details",
+           "application": "application_process", "how_to_apply": "application_process",
+           "documents": "documents_required", "required_documents": "documents_required",
+           "scheme_category": "category", "categories": "category", "beneficiary_state": "state"}
+COLUMNS = ["id", "source_type", "title", "content", "chunk_metadata"]
+
+# ---------- 1. read ----------
+def read_frame(path: Path) -> pd.DataFrame:
+    """CSV, JSON (list or JSON Lines) or Parquet, with column names snake-cased and aliased."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in (".parquet", ".pq"):
+        df = pd.read_parquet(path)          # needs pyarrow or fastparquet
+    elif suffix in (".jsonl", ".ndjson"):
+        df = pd.read_json(path, lines=True, dtype=False)
+    elif suffix == ".json":
+        df = pd.read_json(path, dtype=False)
+    else:
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df.columns = (df.columns.astype(str).str.strip()
+                  .str.replace(r"([a-z0-9])([A-Z])", r"\1_\2", regex=True)
+                  .str.lower().str.replace(r"[^a-z0-9]+", "_", regex=True).str.strip("_"))
+    df = df.rename(columns={c: ALIASES[c] for c in df.columns if c in ALIASES and ALIASES[c] not in df.columns})
+    if "scheme_name" not in df.columns:
+        raise ValueError(f"{path}: no scheme_name column (have: {', '.join(df.columns)})")
+    return df.loc[:, ~df.columns.duplicated()]
+
+def _as_text(s: pd.Series) -> pd.Series:
+    """List cells (JSON exports) joined with ', '; everything else as stripped strings, '' for missing."""
+    if s.dtype == object:
+        lists = s.map(lambda v: isinstance(v, (list, tuple)))
+        if lists.any():
+            s = s.where(~lists, s[lists].str.join(", "))
+    return s.astype("string").fillna("").str.strip()
+
+# ---------- 2. explode ----------
+def explode(df: pd.DataFrame, fields: Sequence[str] = SCHEME_FIELDS) -> pd.DataFrame:
+    """One row per (scheme, field) with title, content and serialised chunk_metadata."""
+    fields = [f for f in fields if f in df.columns]
+    if not fields:
+        raise ValueError(f"none of the field columns {list(fields)} are present")
+    meta = [c for c in META_COLUMNS if c in df.columns]
+    wide = pd.DataFrame({c: _as_text(df[c]) for c in ["scheme_name", *meta, *fields]})
+    wide = wide[wide["scheme_name"] != ""]
+    long = wide.melt(id_vars=["scheme_name", *meta], value_vars=fields, var_name="field", value_name="content")
+    long = long[long["content"].str.len() >= BULK_MIN_CHARS]
+    # a scheme listed twice: the later row wins
+    long = long.drop_duplicates(["scheme_name", "field"], keep="last").reset_index(drop=True)
+    long["title"] = long["scheme_name"].str.slice(0, 255)
+    long["source_type"] = "scheme"
+    long["chunk_metadata"] = _metadata_json(long, meta)
+    return long
+
+def _metadata_json(frame: pd.DataFrame, meta: Sequence[str]) -> pd.Series:
+    cols = frame.reindex(columns=["scheme_name", "field", *meta])
+    cols = cols.astype(object).where(cols.notna() & (cols != ""), None)
+    if cols.empty:
+        return pd.Series([], dtype=object, index=frame.index)
+    lines = cols.to_json(orient="records", lines=True, force_ascii=False).splitlines()
+    return pd.Series(lines, index=frame.index)
+
+# ---------- 3. diff against the table ----------
+def existing_chunks(engine: Engine, meta: Sequence[str]) -> pd.DataFrame:
+    """Current scheme chunks keyed by (scheme_name, field), with metadata re-serialised like explode()'s."""
+    with engine.connect() as conn:
+        cur = pd.read_sql(text("SELECT id, content, chunk_metadata FROM unified_chunks WHERE source_type = 'scheme'"), conn)
+    if cur.empty:
+        return pd.DataFrame(columns=["id", "scheme_name", "field", "old_content", "old_metadata"])
+    parsed = pd.read_json(io.StringIO("\n".join(cur["chunk_metadata"].fillna("{}").replace("", "{}"))),
+                          lines=True, dtype=False).reindex(columns=["scheme_name", "field", *meta])
+    parsed.index = cur.index
+    out = pd.DataFrame({"id": cur["id"], "scheme_name": _as_text(parsed["scheme_name"]),
+                        "field": _as_text(parsed["field"]), "old_content": cur["content"],
+                        "old_metadata": _metadata_json(parsed, meta)})
+    # duplicates from older loaders: the lowest id is the one updated
+    return out.sort_values("id").drop_duplicates(["scheme_name", "field"], keep="first")
+
+def plan(engine: Engine, chunks: pd.DataFrame, meta: Sequence[str]) -> pd.DataFrame:
+    """chunks with an id and an `action` of insert / update / unchanged."""
+    old = existing_chunks(engine, meta)
+    merged = chunks.merge(old, on=["scheme_name", "field"], how="left")
+    new = merged["id"].isna()
+    with engine.connect() as conn:
+        next_id = (conn.execute(text("SELECT MAX(id) FROM unified_chunks")).scalar() or 0) + 1
+    merged.loc[new, "id"] = np.arange(next_id, next_id + int(new.sum()))
+    merged["id"] = merged["id"].astype("int64")
+    same = (merged["content"] == merged["old_content"]) & (merged["chunk_metadata"] == merged["old_metadata"])
+    merged["action"] = np.where(new, "insert", np.where(same.fillna(False), "unchanged", "update"))
+    return merged.drop(columns=["old_content", "old_metadata"])
+
+# ---------- 4. embed ----------
+def has_embedding_column(engine: Engine) -> bool:
+    return any(c["name"] == "embedding" for c in inspect(engine).get_columns("unified_chunks"))
+
+def vector_literals(vecs: np.ndarray) -> List[str]:
+    """'[v1,v2,...]' strings, the literal form TiDB's VECTOR column accepts."""
+    buf = io.StringIO()
+    np.savetxt(buf, vecs, fmt="%.7g", delimiter=",")
+    return ["[" + line + "]" for line in buf.getvalue().splitlines()]
+
+# ---------- 5. write ----------
+def _upsert_sql(dialect: str, columns: Sequence[str], source: Optional[str] = None) -> str:
+    updates = [c for c in columns if c != "id"]
+    cols = ", ".join(columns)
+    body = (f"SELECT {cols} FROM {source} WHERE 1 = 1" if source
+            else "VALUES (" + ", ".join(f":{c}" for c in columns) + ")")
+    if dialect == "mysql":
+        tail = "ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = VALUES({c})" for c in updates)
+    else:   # sqlite / postgresql
+        tail = "ON CONFLICT (id) DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in updates)
+    return f"INSERT INTO unified_chunks ({cols}) {body} {tail}"
+
+def _records(frame: pd.DataFrame, columns: Sequence[str]) -> List[Dict[str, Any]]:
+    frame = frame[list(columns)].astype(object).where(frame[list(columns)].notna(), None)
+    return frame.to_dict("records")
+
+def write_executemany(engine: Engine, rows: pd.DataFrame, columns: Sequence[str], chunk: int = BULK_LOAD_CHUNK) -> int:
+    stmt = text(_upsert_sql(engine.dialect.name, columns))
+    for i in range(0, len(rows), chunk):
+        with engine.begin() as conn:
+            conn.execute(stmt, _records(rows.iloc[i:i + chunk], columns))
+    return len(rows)
+
+def write_staging(engine: Engine, rows: pd.DataFrame, columns: Sequence[str], chunk: int = BULK_LOAD_CHUNK) -> int:
+    staging = "unified_chunks_staging"
+    types = {"id": "BIGINT", "source_type": "VARCHAR(32)", "title": "VARCHAR(255)",
+             "content": "TEXT", "chunk_metadata": "TEXT", "embedding": "TEXT"}
+    insert = text(f"INSERT INTO {staging} ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})")
+    with engine.begin() as conn:     # temporary tables are per connection: one transaction end to end
+        conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+        conn.execute(text(f"CREATE TEMPORARY TABLE {staging} ({', '.join(f'{c} {types[c]}' for c in columns)})"))
+        for i in range(0, len(rows), chunk):
+            conn.execute(insert, _records(rows.iloc[i:i + chunk], columns))
+        conn.execute(text(_upsert_sql(engine.dialect.name, columns, source=staging)))
+        conn.execute(text(f"DROP TABLE {staging}"))
+    return len(rows)
+
+WRITERS = {"executemany": write_executemany, "staging": write_staging}
+
+# ---------- 6. run ----------
+def load(engine: Engine, path: Path, method: str = "staging", embed_mode: str = "auto",
+         fields: Sequence[str] = SCHEME_FIELDS, chunk: int = BULK_LOAD_CHUNK, dry_run: bool = False,
+         dedup: bool = False) -> Dict[str, Any]:
+    """Read, explode, diff, embed and upsert one dataset; returns counts, per-phase seconds and rows/s."""
+    timings: Dict[str, float] = {}
+    t = t0 = time.perf_counter()
+
+    def lap(name: str) -> None:
+        nonlocal t
+        now = time.perf_counter()
+        timings[name] = round(now - t, 3)
+        t = now
+
+    df = read_frame(path)
+    lap("read")
+    chunks = explode(df, fields)
+    lap("explode")
+    meta = [c for c in META_COLUMNS if c in df.columns]
+    planned = plan(engine, chunks, meta)
+    changed = planned[planned["action"] != "unchanged"]
+    lap("diff")
+
+    near_duplicates = None
+    if dedup:
+        from . import dedup as near_dup
+        labels = near_dup.clusters(chunks["content"].tolist(), chunks["field"].astype("category").cat.codes.to_numpy())
+        sizes = np.bincount(labels, minlength=len(labels))
+        near_duplicates = {"clusters": int((sizes > 1).sum()), "collapsible": int(len(labels) - (sizes > 0).sum()),
+                           "dedup_ratio": round(1 - (sizes > 0).sum() / len(labels), 4) if len(labels) else 0.0}
+        lap("dedup")
+
+    columns = list(COLUMNS)
+    embed_col = embed_mode != "no" and has_embedding_column(engine)
+    if embed_mode == "yes" and not embed_col:
+        raise ValueError("--embed yes, but unified_chunks has no embedding column")
+    if embed_col and len(changed) and not dry_run:
+        from .search import _embed_corpus
+        changed = changed.assign(embedding=vector_literals(_embed_corpus(changed["content"].tolist())))
+        columns.append("embedding")
+    lap("embed")
+
+    written = 0 if dry_run else WRITERS[method](engine, changed, columns, chunk)
+    lap("write")
+    elapsed = time.perf_counter() - t0
+    counts = planned["action"].value_counts()
+    report = {"file": str(path), "schemes": int(chunks["scheme_name"].nunique()), "chunks": len(chunks),
+              "inserted": int(counts.get("insert", 0)), "updated": int(counts.get("update", 0)),
+              "unchanged": int(counts.get("unchanged", 0)), "written": written,
+              "embedded": written if embed_col else 0, "method": method, "dry_run": dry_run,
+              "seconds": timings, "elapsed_s": round(elapsed, 3),
+              "chunks_per_s": round(len(chunks) / elapsed, 1) if elapsed else 0.0,
+              "write_rows_per_s": round(written / timings["write"], 1) if timings["write"] else 0.0}
+    if near_duplicates is not None:
+        report["near_duplicates"] = near_duplicates
+    logger.info(f"Bulk load: {report}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load a scheme dataset (CSV / JSON / Parquet) into unified_chunks")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--method", choices=sorted(WRITERS), default="staging")
+    parser.add_argument("--embed", choices=["auto", "yes", "no"], default="auto",
+                        help="auto = only if unified_chunks has an embedding column")
+    parser.add_argument("--fields", default=",".join(SCHEME_FIELDS), help="field columns, one chunk each")
+    parser.add_argument("--chunk", type=int, default=BULK_LOAD_CHUNK)
+    parser.add_argument("--dry-run", action="store_true", help="read, explode and diff only")
+    parser.add_argument("--dedup", action="store_true", help="also report near-duplicate chunks in the dump")
+    args = parser.parse_args()
+    from .database import engine
+    print(json.dumps(load(engine, args.path, args.method, args.embed, args.fields.split(","), args.chunk, args.dry_run,
+                          args.dedup)))
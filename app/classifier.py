@@ -0,0 +1,132 @@
+# app/classifier.py  (nearest-centroid query/content classifier on the MiniLM vectors retrieve() already computes)
+import os
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# embedding -> nearest centroid (default); keywords -> the old substring scans in app/agent.py
+CLASSIFIER_MODE = os.getenv("CLASSIFIER_MODE", "embedding").lower()
+# weight of the retrieved chunks' mean vector against the query vector. 0 (query only) is the default on
+# purpose: it scored best in bench/classifier_eval.py, because off-topic questions still retrieve *some*
+# chunks and get pulled towards SCHEME. With 0 the chunks are not read at all (no chunk_vectors lookup)
+CONTENT_WEIGHT = float(os.getenv("CLASSIFIER_CONTENT_WEIGHT", "0"))
+
+# Label exemplars; each centroid is the normalised mean of their embeddings.
+CATEGORY_EXEMPLARS = {
+    "SCHEME": [
+        "government scheme eligibility criteria and benefits",
+        "scholarship for students financial assistance",
+        "subsidy for farmers under the kisan yojana",
+        "pension scheme for senior citizens and widows",
+        "housing scheme awas yojana for BPL families",
+        "health insurance scheme for poor families",
+        "loan and financial aid for small entrepreneurs",
+        "documents required to apply for the scheme",
+        "welfare scheme for persons with disability",
+        "skill development and employment scheme",
+    ],
+    "CONSTITUTION": [
+        "article of the constitution of india",
+        "fundamental rights guaranteed by the constitution",
+        "right to equality before the law",
+        "directive principles of state policy",
+        "constitutional amendment procedure",
+        "section of the act and legal provision",
+        "right to freedom of religion and speech",
+        "protection of life and personal liberty",
+        "legal rights of citizens under indian law",
+        "what does the law say about discrimination",
+    ],
+    "GENERAL": [
+        "hello how are you",
+        "what can you help me with",
+        "thank you",
+        "who are you",
+        "tell me something about india",
+        "what is the weather today",
+        "explain this in simple words",
+        "can you repeat that",
+    ],
+}
+FORM_EXEMPLARS = {
+    True: [
+        "how do I apply for this scheme",
+        "application form for scholarship",
+        "how to register for the pension scheme",
+        "steps to enroll in the yojana",
+        "procedure to submit the application online",
+        "where can I get the form to apply",
+        "how to fill the application for housing scheme",
+    ],
+    False: [
+        "what are the benefits of this scheme",
+        "who is eligible for the scholarship",
+        "what does article 21 say",
+        "explain the right to equality",
+        "how much money do farmers get",
+        "which schemes are available for women",
+        "tell me about fundamental rights",
+    ],
+}
+
+class NearestCentroid:
+    """Cosine nearest-centroid over unit vectors; predict() is one (labels x 384) mat-vec."""
+
+    def __init__(self, labels: Sequence[Any], centroids: np.ndarray):
+        self.labels = list(labels)
+        self.centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+
+    @classmethod
+    def from_exemplars(cls, exemplars: Dict[Any, List[str]], embed) -> "NearestCentroid":
+        labels = list(exemplars)
+        cents = np.stack([embed(exemplars[l]).mean(axis=0) for l in labels]).astype(np.float32)
+        return cls(labels, cents)
+
+    def scores(self, vec: np.ndarray) -> np.ndarray:
+        n = np.linalg.norm(vec)
+        return self.centroids @ vec / n if n else np.zeros(len(self.labels), dtype=np.float32)
+
+    def predict(self, vec: np.ndarray) -> Any:
+        return self.labels[int(np.argmax(self.scores(vec)))]
+
+_lock = threading.Lock()
+_models: Optional[Tuple[NearestCentroid, NearestCentroid]] = None
+
+def _load() -> Tuple[NearestCentroid, NearestCentroid]:
+    """Embed the exemplars once (a few dozen short texts) on first use."""
+    global _models
+    if _models is None:
+        with _lock:
+            if _models is None:
+                from .search import _embed
+                _models = (NearestCentroid.from_exemplars(CATEGORY_EXEMPLARS, _embed),
+                           NearestCentroid.from_exemplars(FORM_EXEMPLARS, _embed))
+                logger.info("Classifier centroids ready")
+    return _models
+
+def _unit_mean(vectors: np.ndarray) -> Optional[np.ndarray]:
+    if not len(vectors):
+        return None
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return unit.mean(axis=0)
+
+def classify_category(question: str, chunks: Sequence[Dict[str, Any]] = ()) -> str:
+    """SCHEME / CONSTITUTION / GENERAL from the query vector (optionally blended with the chunks' vectors)."""
+    from .search import query_vector, chunk_vectors
+    category, _ = _load()
+    scores = category.scores(query_vector(question))
+    content = _unit_mean(chunk_vectors([c["id"] for c in chunks])) if CONTENT_WEIGHT > 0 else None
+    if content is not None:
+        scores = (1 - CONTENT_WEIGHT) * scores + CONTENT_WEIGHT * category.scores(content)
+    return category.labels[int(np.argmax(scores))]
+
+def wants_form(question: str) -> bool:
+    from .search import query_vector
+    _, form = _load()
+    return bool(form.predict(query_vector(question)))
+
+def warm() -> None:
+    _load()
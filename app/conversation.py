@@ -0,0 +1,186 @@
+# app/conversation.py  (per-session conversation state: recent turns, their chunk ids and query vectors)
+#
+# /api/agent consults the store before retrieving:
+#   reuse -> near-repeat of a recent question: answer from that turn's chunks, no retrieval
+#   blend -> follow-up ("what documents do I need for that?"): rank with the query vector blended
+#            with the previous turn's, so the topic carries over
+#   fresh -> unrelated question: plain retrieve()
+# The prompt gets a compressed history (question + first sentences of each answer) instead of a
+# replay, and chunks the previous turn already sent are trimmed.
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import Counter, OrderedDict, deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_ENABLED = os.getenv("CONVERSATION_ENABLED", "1").lower() in ("1", "true", "yes")
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "4"))
+CONVERSATION_TTL_S = float(os.getenv("CONVERSATION_TTL_S", "3600"))
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "")                    # sqlite path; empty = memory only
+FOLLOWUP_REUSE_SIM = float(os.getenv("FOLLOWUP_REUSE_SIM", "0.92"))    # cosine to the last query
+FOLLOWUP_BLEND_SIM = float(os.getenv("FOLLOWUP_BLEND_SIM", "0.45"))
+FOLLOWUP_BLEND_WEIGHT = float(os.getenv("FOLLOWUP_BLEND_WEIGHT", "0.6"))  # weight of the previous vector
+HISTORY_CHARS = int(os.getenv("CONVERSATION_HISTORY_CHARS", "800"))
+SUMMARY_CHARS = int(os.getenv("CONVERSATION_SUMMARY_CHARS", "240"))
+SEEN_CHUNK_CHARS = int(os.getenv("CONVERSATION_SEEN_CHUNK_CHARS", "300"))
+
+# short questions leaning on an earlier turn
+_ANAPHORA = re.compile(r"\b(that|this|it|its|those|these|them|they|same|above|the scheme|the form)\b", re.I)
+FOLLOWUP_MAX_WORDS = 12
+
+class Turn:
+    __slots__ = ("question", "summary", "chunk_ids", "q_vec", "ts")
+
+    def __init__(self, question: str, summary: str, chunk_ids: Sequence[int], q_vec: np.ndarray, ts: float):
+        self.question, self.summary, self.ts = question, summary, ts
+        self.chunk_ids = [int(i) for i in chunk_ids]
+        self.q_vec = np.asarray(q_vec, dtype=np.float32)
+
+def summarize(answer: str, limit: int = SUMMARY_CHARS) -> str:
+    """Leading sentences of an answer, cut at a sentence (or word) boundary."""
+    text = " ".join(answer.split())
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    end = max(cut.rfind(". "), cut.rfind("? "), cut.rfind("! "))
+    return cut[:end + 1] if end > limit // 3 else cut.rsplit(" ", 1)[0] + "…"
+
+# ---------- 1. store ----------
+class ConversationStore:
+    """LRU of session_id -> last CONVERSATION_MAX_TURNS turns, optionally persisted to SQLite."""
+
+    def __init__(self, max_sessions: int = CONVERSATION_MAX_SESSIONS, max_turns: int = CONVERSATION_MAX_TURNS,
+                 ttl_s: float = CONVERSATION_TTL_S, db_path: str = CONVERSATION_DB):
+        self.max_sessions, self.max_turns, self.ttl_s = max_sessions, max_turns, ttl_s
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, deque]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS conversation_turns (session_id TEXT NOT NULL, ts REAL NOT NULL, "
+                             "question TEXT NOT NULL, summary TEXT NOT NULL, chunk_ids TEXT NOT NULL, q_vec BLOB NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_conversation_turns_session_ts ON conversation_turns (session_id, ts)")
+            self._db.commit()
+        self.counters = Counter()
+
+    def turns(self, session_id: str) -> List[Turn]:
+        """Live turns for this session, oldest first.
+
+        With CONVERSATION_DB the SQLite file is authoritative and read on every call: other workers
+        (and earlier processes) append to it, so this worker's LRU may be behind. Blocking either way.
+        """
+        now = time.time()
+        if self._db is not None:
+            turns = deque(self._load(session_id), maxlen=self.max_turns)
+            with self._lock:
+                self._sessions[session_id] = turns
+                self._sessions.move_to_end(session_id)
+                self._evict()
+        else:
+            with self._lock:
+                turns = self._sessions.get(session_id)
+                if turns is None:
+                    turns = self._sessions[session_id] = deque(maxlen=self.max_turns)
+                    self._evict()
+                else:
+                    self._sessions.move_to_end(session_id)
+        with self._lock:
+            return [t for t in turns if now - t.ts < self.ttl_s]
+
+    def append(self, session_id: str, turn: Turn) -> None:
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is None:
+                turns = self._sessions[session_id] = deque(maxlen=self.max_turns)
+            turns.append(turn)
+            self._sessions.move_to_end(session_id)
+            self._evict()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("INSERT INTO conversation_turns VALUES (?, ?, ?, ?, ?, ?)",
+                                 (session_id, turn.ts, turn.question, turn.summary,
+                                  json.dumps(turn.chunk_ids), turn.q_vec.tobytes()))
+                self._db.execute("DELETE FROM conversation_turns WHERE session_id = ? AND ts < "
+                                 "(SELECT MIN(ts) FROM (SELECT ts FROM conversation_turns WHERE session_id = ? "
+                                 "ORDER BY ts DESC LIMIT ?))", (session_id, session_id, self.max_turns))
+                self._db.commit()
+
+    def forget(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM conversation_turns WHERE session_id = ?", (session_id,))
+                self._db.commit()
+
+    def _load(self, session_id: str) -> List[Turn]:
+        if self._db is None:
+            return []
+        with self._db_lock:
+            rows = self._db.execute("SELECT question, summary, chunk_ids, q_vec, ts FROM conversation_turns "
+                                    "WHERE session_id = ? AND ts > ? ORDER BY ts DESC LIMIT ?",
+                                    (session_id, time.time() - self.ttl_s, self.max_turns)).fetchall()
+        return [Turn(q, s, json.loads(ids), np.frombuffer(vec, dtype=np.float32), ts) for q, s, ids, vec, ts in reversed(rows)]
+
+    def _evict(self) -> None:
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.counters["evicted"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = len(self._sessions)
+        return {"enabled": CONVERSATION_ENABLED, "sessions": sessions, "max_sessions": self.max_sessions,
+                "max_turns": self.max_turns, "persistent": self._db is not None, **self.counters}
+
+store = ConversationStore()
+
+# ---------- 2. follow-up planning ----------
+def _unit(v: np.ndarray) -> np.ndarray:
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+def is_followup(question: str) -> bool:
+    return len(question.split()) <= FOLLOWUP_MAX_WORDS and bool(_ANAPHORA.search(question))
+
+def plan(question: str, q_vec: np.ndarray, turns: Sequence[Turn]) -> Tuple[str, np.ndarray, Optional[Turn]]:
+    """('fresh' | 'reuse' | 'blend', vector to rank with, turn whose chunks to reuse)."""
+    if not turns:
+        return "fresh", q_vec, None
+    u = _unit(q_vec)
+    sims = [float(u @ _unit(t.q_vec)) for t in turns]
+    best = int(np.argmax(sims))
+    if sims[best] >= FOLLOWUP_REUSE_SIM:
+        return "reuse", turns[best].q_vec, turns[best]
+    if sims[-1] >= FOLLOWUP_BLEND_SIM or is_followup(question):
+        w = FOLLOWUP_BLEND_WEIGHT
+        return "blend", _unit((1 - w) * u + w * _unit(turns[-1].q_vec)).astype(np.float32), None
+    return "fresh", q_vec, None
+
+# ---------- 3. prompt compression ----------
+def history(turns: Sequence[Turn], limit: int = HISTORY_CHARS) -> str:
+    """Most recent turns first until `limit` characters, rendered oldest first."""
+    parts, used = [], 0
+    for t in reversed(turns):
+        entry = f"Q: {t.question}\nA: {t.summary}"
+        if used + len(entry) > limit and parts:
+            break
+        parts.append(entry)
+        used += len(entry)
+    return "\n".join(reversed(parts))
+
+def seen_chunk_ids(turns: Sequence[Turn]) -> set:
+    return set(turns[-1].chunk_ids) if turns else set()
+
+def stats() -> Dict[str, Any]:
+    return store.stats()
@@ -1,30 +1,9 @@
-from sqlalchemy.exc import OperationalError
-import time, functools
+from .resilience import db_guard
 
-def retry_db(func, retries=3, delay=1):
-    @functools.wraps(func)
-    def wrapped(*args, **kwargs):
-        for attempt in range(retries):
-            try:
-                return func(*args, **kwargs)
-            except OperationalError as e:
-                if "2013" in str(e) and attempt < retries - 1:
-                    time.sleep(delay)
-                    continue
-                raise
-    return wrapped
-from sqlalchemy.exc import OperationalError
-import time, functools
+def retry_db(func):
+    """Retry transient TiDB errors with jittered backoff behind the database circuit breaker.
 
-def retry_db(func, retries=3, delay=1):
-    @functools.wraps(func)
-    def wrapped(*args, **kwargs):
-        for attempt in range(retries):
-            try:
-                return func(*args, **kwargs)
-            except OperationalError as e:
-                if "2013" in str(e) and attempt < retries - 1:
-                    time.sleep(delay)
-                    continue
-                raise
-    return wrapped
\ No newline at end of file
+    Works for sync and async functions (async callers back off without blocking the
+    event loop). Policy and classification live in app/resilience.py.
+    """
+    return db_guard(func)
@@ -0,0 +1,136 @@
+# app/dedup.py  (near-duplicate chunk collapse: MinHash signatures + LSH banding at index build)
+#
+# Scheme data repeats the same boilerplate across central and state variants. With DEDUP_ENABLED=1
+# the index keeps one canonical chunk per near-duplicate cluster (estimated Jaccard of word
+# DEDUP_SHINGLE-grams >= DEDUP_THRESHOLD, same source type only); the canonical chunk's metadata
+# gains a "variants" list with the ids and scheme metadata of the chunks it stands for. The DB is
+# untouched: unified_chunks keeps every row, only the in-memory index (and its embedding) shrinks.
+import os
+import re
+import json
+import time
+import zlib
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "0").lower() in ("1", "true", "yes")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))
+DEDUP_SHINGLE = int(os.getenv("DEDUP_SHINGLE", "5"))          # words per shingle
+DEDUP_MAX_VARIANTS = int(os.getenv("DEDUP_MAX_VARIANTS", "50"))  # variant refs kept on the canonical chunk
+VARIANT_KEYS = ("scheme_name", "level", "state", "category")
+
+_PRIME = np.uint64((1 << 61) - 1)
+_WORD = re.compile(r"\w+")
+
+last_report: Dict[str, Any] = {}
+
+# ---------- 1. MinHash ----------
+def _shingle_hashes(text: str, k: int) -> np.ndarray:
+    words = _WORD.findall(text.lower())
+    grams = [" ".join(words[i:i + k]) for i in range(max(len(words) - k + 1, 1))]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+def signatures(texts: Sequence[str], num_perm: int = DEDUP_NUM_PERM, k: int = DEDUP_SHINGLE, seed: int = 1) -> np.ndarray:
+    """(n, num_perm) MinHash signatures; permutations are (a*h + b) mod 2^61-1 over 32-bit shingle hashes."""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    out = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for i, t in enumerate(texts):
+        # a*h + b < 2^64 for 32-bit h, a, b: no wrap-around before the modulus
+        out[i] = ((_shingle_hashes(t, k)[:, None] * a + b) % _PRIME).min(axis=0)
+    return out
+
+# ---------- 2. LSH banding + clustering ----------
+def rows_per_band(threshold: float, num_perm: int) -> int:
+    """Rows per band: the largest r whose LSH threshold (1/b)^(1/r) is still <= `threshold`.
+    Candidates are verified on the full signature, so erring towards more candidates only costs time."""
+    best = 1
+    for r in range(1, num_perm + 1):
+        if num_perm % r == 0 and (r / num_perm) ** (1.0 / r) <= threshold:
+            best = r
+    return best
+
+def _find(parent: np.ndarray, i: int) -> int:
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+def clusters(texts: Sequence[str], groups: Optional[np.ndarray] = None,
+             threshold: float = DEDUP_THRESHOLD, num_perm: int = DEDUP_NUM_PERM) -> np.ndarray:
+    """Cluster label per text (the label is the smallest member index). Only texts with equal
+    `groups` codes (e.g. source type) can share a cluster."""
+    n = len(texts)
+    parent = np.arange(n)
+    if n < 2:
+        return parent
+    sig = signatures(texts, num_perm)
+    groups = np.zeros(n, dtype=np.uint64) if groups is None else np.asarray(groups, dtype=np.uint64)
+    r = rows_per_band(threshold, num_perm)
+    for start in range(0, num_perm, r):
+        block = np.ascontiguousarray(np.column_stack([groups, sig[:, start:start + r]]))
+        _, inv = np.unique(block.view(np.dtype((np.void, block.shape[1] * 8))).ravel(), return_inverse=True)
+        order = np.argsort(inv, kind="stable")
+        labels = inv[order]
+        first = np.r_[True, labels[1:] != labels[:-1]]
+        heads = order[np.maximum.accumulate(np.where(first, np.arange(n), 0))]
+        members = ~first
+        a, b = order[members], heads[members]
+        if not len(a):
+            continue
+        ok = (sig[a] == sig[b]).mean(axis=1) >= threshold
+        for x, y in zip(a[ok], b[ok]):
+            rx, ry = _find(parent, int(x)), _find(parent, int(y))
+            if rx != ry:
+                parent[max(rx, ry)] = min(rx, ry)
+    return np.fromiter((_find(parent, i) for i in range(n)), dtype=np.int64, count=n)
+
+# ---------- 3. collapse a DocStore ----------
+def collapse(docs, threshold: Optional[float] = None):
+    """(collapsed DocStore, report). The canonical chunk is the cluster's highest-quality member, lowest id on ties."""
+    from .docstore import DocStore
+    t0 = time.perf_counter()
+    threshold = DEDUP_THRESHOLD if threshold is None else threshold
+    n = len(docs)
+    labels = clusters(docs.contents, docs.columns["source"], threshold)
+    # canonical per cluster: sort by (label, -quality, id) and take the first row of each label
+    order = np.lexsort((docs.ids, -docs.quality, labels))
+    first = np.r_[True, labels[order][1:] != labels[order][:-1]]
+    canonical_of = np.empty(n, dtype=np.int64)
+    canonical_of[order] = order[np.maximum.accumulate(np.where(first, np.arange(n), 0))]
+    keep = np.sort(order[first])
+
+    variants: Dict[int, List[int]] = {}
+    for i in np.flatnonzero(canonical_of != np.arange(n)):
+        variants.setdefault(int(canonical_of[i]), []).append(int(i))
+    metadata: Dict[int, str] = {}
+    for c, rows in variants.items():
+        meta = docs.metadata(c)
+        refs = []
+        for i in rows[:DEDUP_MAX_VARIANTS]:
+            m = docs.metadata(i)
+            refs.append({"id": int(docs.ids[i]), "title": docs.value("title", i),
+                         **{key: m[key] for key in VARIANT_KEYS if m.get(key) is not None}})
+        meta["variants"] = refs
+        meta["variant_count"] = len(rows)
+        metadata[c] = json.dumps(meta)
+
+    out = DocStore.from_rows(({**docs[i], **({"metadata": metadata[i]} if i in metadata else {})} for i in keep))
+    out.quality = docs.quality[keep]
+    report = {"chunks_in": n, "chunks_out": len(out), "clusters": len(variants),
+              "collapsed": n - len(out), "dedup_ratio": round(1 - len(out) / n, 4) if n else 0.0,
+              "largest_cluster": max((len(v) + 1 for v in variants.values()), default=1),
+              "threshold": threshold, "seconds": round(time.perf_counter() - t0, 3)}
+    logger.info(f"Near-duplicate collapse: {n} -> {len(out)} chunks in {report['seconds']}s")
+    return out, report
+
+def stats() -> Dict[str, Any]:
+    return {"enabled": DEDUP_ENABLED, "threshold": DEDUP_THRESHOLD, "num_perm": DEDUP_NUM_PERM,
+            "shingle": DEDUP_SHINGLE, **last_report}
@@ -0,0 +1,169 @@
+# app/docstore.py  (columnar chunk cache: numpy columns + one UTF-8 buffer instead of a dict per chunk)
+import json
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+
+# chunk_metadata keys promoted to interned columns (used by ranking and by the API responses)
+META_COLUMNS = ("scheme_name", "field", "level", "category")
+
+def _parse_metadata(raw) -> Dict[str, Any]:
+    if isinstance(raw, dict):
+        return raw
+    if isinstance(raw, str) and raw:
+        try:
+            parsed = json.loads(raw)
+            return parsed if isinstance(parsed, dict) else {}
+        except Exception:
+            return {}
+    return {}
+
+class _Interner:
+    def __init__(self):
+        self.table: Dict[Any, int] = {}
+        self.codes: List[int] = []
+
+    def add(self, value) -> None:
+        self.codes.append(self.table.setdefault(value, len(self.table)))
+
+    def finish(self) -> Tuple[np.ndarray, List[Any]]:
+        return np.asarray(self.codes, dtype=np.int32), list(self.table)
+
+class _BlobBuilder:
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.lengths: List[int] = []
+
+    def add(self, value: Optional[str]) -> None:
+        b = (value or "").encode("utf-8")
+        self.parts.append(b)
+        self.lengths.append(len(b))
+
+    def finish(self) -> Tuple[np.ndarray, np.ndarray]:
+        offsets = np.zeros(len(self.lengths) + 1, dtype=np.int64)
+        np.cumsum(self.lengths, out=offsets[1:])
+        buf = np.frombuffer(b"".join(self.parts), dtype=np.uint8)
+        self.parts, self.lengths = [], []
+        return offsets, buf
+
+class ContentColumn(Sequence):
+    """Sequence[str] view over a (offsets, buffer) pair; strings are decoded on access."""
+
+    def __init__(self, offsets: np.ndarray, buf: np.ndarray):
+        self._off = offsets
+        self._buf = buf
+
+    def __len__(self) -> int:
+        return len(self._off) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        return self._buf[self._off[i]:self._off[i + 1]].tobytes().decode("utf-8")
+
+    def byte_lengths(self) -> np.ndarray:
+        return np.diff(self._off)
+
+class DocStore(Sequence):
+    """Array-backed replacement for the list of chunk dicts.
+
+    Indexing returns a freshly built dict (id/source/title/content/metadata), so only the
+    rows that are actually returned get materialised; ranking works on the columns.
+    """
+
+    def __init__(self, ids: np.ndarray, columns: Dict[str, np.ndarray], tables: Dict[str, List[Any]],
+                 content_offsets: np.ndarray, content_buf: np.ndarray,
+                 metadata_offsets: np.ndarray, metadata_buf: np.ndarray, quality: np.ndarray):
+        self.ids = ids
+        self.columns = columns          # name -> int32 codes into tables[name]
+        self.tables = tables            # name -> list of distinct values
+        self.contents = ContentColumn(content_offsets, content_buf)
+        self.raw_metadata = ContentColumn(metadata_offsets, metadata_buf)
+        self.quality = quality          # precomputed content quality score per chunk
+        self._lookup = {name: {v: c for c, v in enumerate(t)} for name, t in tables.items()}
+
+    # ---- construction ----
+    @classmethod
+    def from_rows(cls, rows: Iterable[Mapping[str, Any]],
+                  quality_fn: Optional[Callable[[str], float]] = None) -> "DocStore":
+        ids: List[int] = []
+        interners = {name: _Interner() for name in ("source", "title", *META_COLUMNS)}
+        content, metadata = _BlobBuilder(), _BlobBuilder()
+        quality: List[float] = []
+        for row in rows:
+            ids.append(row["id"])
+            interners["source"].add(row["source"])
+            interners["title"].add(row["title"])
+            raw = row.get("metadata")
+            if isinstance(raw, dict):
+                raw = json.dumps(raw)
+            meta = _parse_metadata(raw)
+            for name in META_COLUMNS:
+                value = meta.get(name)
+                interners[name].add(value if value is None or isinstance(value, str) else str(value))
+            content.add(row["content"])
+            metadata.add(raw)
+            quality.append(quality_fn(row["content"]) if quality_fn else 1.0)
+        columns, tables = {}, {}
+        for name, interner in interners.items():
+            columns[name], tables[name] = interner.finish()
+        return cls(np.asarray(ids, dtype=np.int64), columns, tables, *content.finish(), *metadata.finish(),
+                   np.asarray(quality, dtype=np.float32))
+
+    @classmethod
+    def empty(cls) -> "DocStore":
+        return cls.from_rows([])
+
+    # ---- access ----
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        raw = self.raw_metadata[i]
+        return {"id": int(self.ids[i]),
+                "source": self.value("source", i),
+                "title": self.value("title", i),
+                "content": self.contents[i],
+                "metadata": raw or None}
+
+    def value(self, column: str, i: int):
+        return self.tables[column][self.columns[column][i]]
+
+    def code(self, column: str, value) -> int:
+        """Code of `value` in `column`, or -1 if no chunk has it."""
+        return self._lookup[column].get(value, -1)
+
+    def table_mask(self, column: str, predicate: Callable[[Any], bool]) -> np.ndarray:
+        """Boolean per distinct value; index it with column codes to get a per-chunk mask."""
+        return np.fromiter((bool(predicate(v)) for v in self.tables[column]), dtype=bool,
+                           count=len(self.tables[column]))
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        return _parse_metadata(self.raw_metadata[i])
+
+    # ---- serialisation (used by app/shared_index.py) ----
+    def sections(self) -> List[Tuple[str, np.ndarray]]:
+        out = [("ids", self.ids), ("quality", self.quality),
+               ("content_offsets", self.contents._off), ("content", self.contents._buf),
+               ("metadata_offsets", self.raw_metadata._off), ("metadata", self.raw_metadata._buf)]
+        out += [(f"col_{name}", codes) for name, codes in self.columns.items()]
+        return out
+
+    @classmethod
+    def from_sections(cls, sections: Dict[str, np.ndarray], tables: Dict[str, List[Any]]) -> "DocStore":
+        columns = {name: sections[f"col_{name}"] for name in tables}
+        return cls(sections["ids"], columns, tables, sections["content_offsets"], sections["content"],
+                   sections["metadata_offsets"], sections["metadata"], sections["quality"])
+
+    def nbytes(self) -> int:
+        """Approximate resident size: arrays plus the interned value tables."""
+        arrays = sum(a.nbytes for _, a in self.sections())
+        tables = sum(len(str(v)) + 49 for t in self.tables.values() for v in t)
+        return arrays + tables
@@ -0,0 +1,121 @@
+# app/embed_executor.py  (corpus embedding: length-bucketed batches sized from a memory budget)
+#
+# The corpus is tokenised once into a flat int32 buffer and sorted by token length, so each
+# batch pads to the length of its own texts, not the longest text in the corpus. Batch size per
+# padded length is chosen so the estimated activation memory stays within EMBED_MEMORY_BUDGET_MB.
+# The estimate is then calibrated against RSS: after each batch, if the observed RSS high-water
+# (above the start of the run) exceeds the largest estimate run so far, later batches are scaled
+# down by that ratio. Calibration only shrinks batches; the budget is a ceiling, not a target.
+# Pooled vectors go straight into a preallocated (n, 384) matrix; there is no per-batch gc.collect().
+import os
+import sys
+import time
+import logging
+from typing import Any, Dict, Optional, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "adaptive").lower()         # adaptive | fixed (batches of 16 + gc)
+EMBED_MEMORY_BUDGET_MB = float(os.getenv("EMBED_MEMORY_BUDGET_MB", "128"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "256"))
+EMBED_MAX_LENGTH = 128
+EMBED_TOKENIZE_CHUNK = 1024            # texts per tokenizer call while measuring lengths
+# MiniLM-L6: 384 hidden, 12 heads, 1536 FFN
+_HIDDEN, _HEADS, _FFN = 384, 12, 1536
+_RSS_NOISE = 8 * 2**20                 # RSS growth below this is not used for calibration
+
+last_run: Dict[str, Any] = {}
+
+def estimate_bytes(batch: int, length: int) -> int:
+    """fp32 activations alive at once for one encoder layer: hidden/QKV/FFN per token + attention scores."""
+    return 4 * batch * (length * (4 * _HIDDEN + _FFN) + _HEADS * length * length)
+
+def current_rss() -> int:
+    """Resident set size in bytes (Linux /proc; elsewhere the process high-water from getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def _tokenize(texts: Sequence[str], tok):
+    """(flat int32 token ids, int64 offsets, int32 lengths) for all texts, truncated to EMBED_MAX_LENGTH."""
+    parts, lengths = [], []
+    for i in range(0, len(texts), EMBED_TOKENIZE_CHUNK):
+        ids = tok(list(texts[i:i + EMBED_TOKENIZE_CHUNK]), truncation=True, max_length=EMBED_MAX_LENGTH,
+                   return_attention_mask=False, return_token_type_ids=False)["input_ids"]
+        lengths.extend(len(x) for x in ids)
+        parts.append(np.fromiter((t for x in ids for t in x), dtype=np.int32))
+    lengths = np.asarray(lengths, dtype=np.int32)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return np.concatenate(parts) if parts else np.empty(0, np.int32), offsets, lengths
+
+def batch_size_for(length: int, budget: float, scale: float, max_batch: int = EMBED_MAX_BATCH) -> int:
+    return int(min(max(budget // (estimate_bytes(1, length) * scale), 1), max_batch))
+
+def embed_corpus(texts: Sequence[str], budget_mb: Optional[float] = None, max_batch: int = EMBED_MAX_BATCH,
+                 sess=None, tok=None) -> np.ndarray:
+    """(len(texts), 384) float32 mean-pooled embeddings, same as search._embed() row for row.
+    `sess` / `tok` default to app.search's; the offline builder passes one session per worker process."""
+    if sess is None or tok is None:
+        from .search import _sess, _tok
+        sess, tok = sess or _sess, tok or _tok
+    input_name = sess.get_inputs()[0].name
+    t0 = time.perf_counter()
+    n = len(texts)
+    out = np.empty((n, _HIDDEN), dtype=np.float32)
+    if not n:
+        return out
+    budget = (EMBED_MEMORY_BUDGET_MB if budget_mb is None else budget_mb) * 2**20
+    flat, offsets, lengths = _tokenize(texts, tok)
+    order = np.argsort(lengths, kind="stable")
+    pad_id = tok.pad_token_id or 0
+
+    # np.empty pages fault in on first write, and rows are written in length order, scattered over
+    # the matrix: fault them all in now so the RSS growth after the baseline is activation memory,
+    # not the output filling up (flat/offsets were written by _tokenize and are resident already)
+    out.fill(0.0)
+    baseline = peak = current_rss()
+    scale, est_high = 1.0, 0
+    batches, padded, sizes = 0, 0, []
+    i = 0
+    while i < n:
+        # longest text in the batch sets the padded length; sorted order means it is the last one
+        bs = batch_size_for(int(lengths[order[min(i + max_batch, n) - 1]]), budget, scale, max_batch)
+        idx = order[i:i + bs]
+        L = int(lengths[idx[-1]])
+        bs = len(idx)
+        input_ids = np.full((bs, L), pad_id, dtype=np.int64)
+        lens = lengths[idx]
+        for row, j in enumerate(idx):
+            input_ids[row, :lens[row]] = flat[offsets[j]:offsets[j + 1]]
+        mask = (np.arange(L)[None, :] < lens[:, None]).astype(np.int64)
+        hidden = sess.run(None, {input_name: input_ids, "attention_mask": mask})[0]
+        maskf = mask.astype(np.float32)
+        out[idx] = np.einsum("bld,bl->bd", hidden, maskf) / maskf.sum(axis=1, keepdims=True)
+        del hidden
+
+        rss = current_rss()
+        peak = max(peak, rss)
+        est_high = max(est_high, estimate_bytes(bs, L))
+        if peak - baseline > _RSS_NOISE:
+            scale = float(np.clip(max(scale, (peak - baseline) / est_high), 1.0, 8.0))
+        batches, padded, i = batches + 1, padded + bs * L, i + bs
+        sizes.append(bs)
+
+    elapsed = time.perf_counter() - t0
+    last_run.clear()
+    last_run.update({"texts": n, "batches": batches, "batch_min": min(sizes), "batch_max": max(sizes),
+                     "tokens": int(lengths.sum()), "padding_ratio": round(float(1 - lengths.sum() / padded), 3),
+                     "budget_mb": round(budget / 2**20, 1), "scale": round(scale, 2),
+                     "rss_growth_mb": round((peak - baseline) / 2**20, 1), "seconds": round(elapsed, 3),
+                     "texts_per_s": round(n / elapsed, 1) if elapsed else 0.0})
+    logger.info(f"Embedded {n} chunks in {batches} batches ({elapsed:.1f}s, RSS +{last_run['rss_growth_mb']} MB)")
+    return out
+
+def stats() -> Dict[str, Any]:
+    return {"mode": EMBED_BATCHING, "budget_mb": EMBED_MEMORY_BUDGET_MB, "max_batch": EMBED_MAX_BATCH, **last_run}
@@ -0,0 +1,66 @@
+# app/fixtures.py  (schema + fixture seeding for the local SQLite backend)
+import json
+import logging
+from pathlib import Path
+from typing import Iterable, Dict, Any, List
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from .models import UserProfile, SchemeRecommendation
+
+logger = logging.getLogger(__name__)
+
+# Mirrors the TiDB table minus the vector column, which the app never reads.
+UNIFIED_CHUNKS_DDL = """
+    CREATE TABLE IF NOT EXISTS unified_chunks (
+        id INTEGER PRIMARY KEY,
+        source_type VARCHAR(32) NOT NULL,
+        title VARCHAR(255),
+        content TEXT NOT NULL,
+        chunk_metadata TEXT
+    )
+"""
+_INSERT_CHUNK = text("""
+    INSERT INTO unified_chunks (id, source_type, title, content, chunk_metadata)
+    VALUES (:id, :source_type, :title, :content, :chunk_metadata)
+""")
+
+def load_fixture_rows(path: Path) -> List[Dict[str, Any]]:
+    """Read unified_chunks rows from a JSONL file (or a single JSON list)."""
+    path = Path(path)
+    raw = path.read_text(encoding="utf-8")
+    if raw.lstrip().startswith("["):
+        rows = json.loads(raw)
+    else:
+        rows = [json.loads(line) for line in raw.splitlines() if line.strip()]
+    for row in rows:
+        if isinstance(row.get("chunk_metadata"), dict):
+            row["chunk_metadata"] = json.dumps(row["chunk_metadata"])
+        row.setdefault("chunk_metadata", None)
+        row.setdefault("title", None)
+    return rows
+
+def insert_chunks(conn, rows: Iterable[Dict[str, Any]], batch_size: int = 1000) -> int:
+    batch, total = [], 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            conn.execute(_INSERT_CHUNK, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.execute(_INSERT_CHUNK, batch)
+        total += len(batch)
+    return total
+
+def seed_database(engine: Engine, fixtures_path: str | None = None) -> None:
+    """Create the tables the app needs and load fixtures if unified_chunks is empty."""
+    with engine.begin() as conn:
+        conn.execute(text(UNIFIED_CHUNKS_DDL))
+        UserProfile.__table__.create(conn, checkfirst=True)
+        SchemeRecommendation.__table__.create(conn, checkfirst=True)
+        if not fixtures_path:
+            return
+        if conn.execute(text("SELECT COUNT(*) FROM unified_chunks")).scalar():
+            return
+        n = insert_chunks(conn, load_fixture_rows(Path(fixtures_path)))
+        logger.info(f"Seeded unified_chunks with {n} fixture rows from {fixtures_path}")
@@ -0,0 +1,129 @@
+# app/hierarchy.py  (two-stage retrieval: scheme/section centroids first, then only those chunks)
+#
+# With SEARCH_HIERARCHICAL=1 the index gains a second level. Chunks are grouped by scheme_name, or by
+# title for chunks without one (constitution articles / PDF sections). Each group gets a centroid: the
+# renormalised mean of its unit chunk vectors. A query is scored against the centroids, the
+# HIER_TOP_GROUPS best groups are kept (more if they hold fewer than k*3 chunks), and only their chunks
+# go through the usual cosine / quality / profile-boost ranking. The final top-k keeps at most
+# HIER_MAX_PER_GROUP chunks per group (0 = no cap) and backfills from the rest if that leaves it short.
+# The structure is built once per index snapshot (the DocStore object) and shared by all requests.
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEARCH_HIERARCHICAL = os.getenv("SEARCH_HIERARCHICAL", "0").lower() in ("1", "true", "yes")
+HIER_TOP_GROUPS = int(os.getenv("HIER_TOP_GROUPS", "16"))
+HIER_MAX_PER_GROUP = int(os.getenv("HIER_MAX_PER_GROUP", "2"))
+_BLOCK = 8192                     # rows normalised at a time while summing centroids
+
+def enabled() -> bool:
+    return SEARCH_HIERARCHICAL
+
+def group_codes(docs) -> Tuple[np.ndarray, List[Any]]:
+    """(group per chunk, group names): scheme_name where set, else the chunk title."""
+    scheme, title = docs.columns["scheme_name"], docs.columns["title"]
+    unnamed = docs.table_mask("scheme_name", lambda v: v is None or v == "")[scheme]
+    raw = np.where(unnamed, len(docs.tables["scheme_name"]) + title.astype(np.int64), scheme)
+    used, groups = np.unique(raw, return_inverse=True)
+    n_scheme = len(docs.tables["scheme_name"])
+    names = [docs.tables["scheme_name"][c] if c < n_scheme else docs.tables["title"][c - n_scheme] for c in used]
+    return groups.astype(np.int32), names
+
+class Hierarchy:
+    def __init__(self, docs, mat: np.ndarray, norms: np.ndarray):
+        t0 = time.perf_counter()
+        self.docs = docs              # identity of the snapshot this was built for
+        self.groups, self.names = group_codes(docs)
+        g = len(self.names)
+        self.members = np.argsort(self.groups, kind="stable").astype(np.int64)
+        self.sizes = np.bincount(self.groups, minlength=g)
+        self.offsets = np.zeros(g + 1, dtype=np.int64)
+        np.cumsum(self.sizes, out=self.offsets[1:])
+
+        # members are group-contiguous, so each block reduces to per-group partial sums
+        sums = np.zeros((g, mat.shape[1]), dtype=np.float32)
+        safe = np.where(norms > 0, norms, 1.0).astype(np.float32)
+        for start in range(0, len(self.members), _BLOCK):
+            rows = self.members[start:start + _BLOCK]
+            unit = np.asarray(mat[rows]) / safe[rows, None]
+            labels = self.groups[rows]
+            heads = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+            sums[labels[heads]] += np.add.reduceat(unit, heads, axis=0)
+        lengths = np.linalg.norm(sums, axis=1, keepdims=True)
+        self.centroids = sums / np.where(lengths > 0, lengths, 1.0)
+        self.build_s = round(time.perf_counter() - t0, 4)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def select(self, q_vec: np.ndarray, top_groups: int, min_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(candidate chunk rows, chosen group ids): the best `top_groups` groups, widened to >= min_rows chunks."""
+        q_norm = np.linalg.norm(q_vec)
+        sims = self.centroids @ (q_vec / q_norm if q_norm else q_vec)
+        m = min(top_groups, len(sims))
+        chosen = np.argpartition(-sims, m - 1)[:m] if m < len(sims) else np.arange(len(sims))
+        if self.sizes[chosen].sum() < min_rows and m < len(sims):
+            ranked = np.argsort(-sims, kind="stable")
+            m = max(m, int(np.searchsorted(np.cumsum(self.sizes[ranked]), min_rows)) + 1)
+            chosen = ranked[:m]
+        rows = np.concatenate([self.members[self.offsets[c]:self.offsets[c + 1]] for c in chosen])
+        return rows, chosen
+
+def diversify(ranked: np.ndarray, groups: np.ndarray, k: int, cap: int) -> np.ndarray:
+    """First k of `ranked` (best first; `groups` is parallel to it) with at most `cap` per group.
+    Items over the cap backfill, in rank order, if fewer than k remain."""
+    if cap <= 0:
+        return ranked[:k]
+    taken: Dict[int, int] = {}
+    keep, spill = [], []
+    for item, g in zip(ranked, groups.tolist()):
+        if taken.get(g, 0) < cap:
+            taken[g] = taken.get(g, 0) + 1
+            keep.append(item)
+            if len(keep) == k:
+                break
+        else:
+            spill.append(item)
+    keep += spill[:k - len(keep)]
+    return np.asarray(keep, dtype=ranked.dtype)
+
+# ---------- current snapshot ----------
+_lock = threading.Lock()
+_current: Optional[Hierarchy] = None
+_work = {"queries": 0, "rows_scored": 0, "groups_scored": 0, "rows_total": 0}
+
+def for_index(docs, mat: np.ndarray, norms: np.ndarray) -> Hierarchy:
+    global _current
+    h = _current
+    if h is not None and h.docs is docs:
+        return h
+    with _lock:
+        if _current is None or _current.docs is not docs:
+            _current = Hierarchy(docs, mat, norms)
+            logger.info(f"Hierarchical index: {len(_current)} groups over {len(docs)} chunks in {_current.build_s}s")
+        return _current
+
+def candidate_rows(q_vec: np.ndarray, k: int, docs, mat: np.ndarray, norms: np.ndarray) -> Tuple[Hierarchy, np.ndarray]:
+    h = for_index(docs, mat, norms)
+    rows, chosen = h.select(q_vec, HIER_TOP_GROUPS, k * 3)
+    _work["queries"] += 1
+    _work["rows_scored"] += len(rows)
+    _work["groups_scored"] += len(h)
+    _work["rows_total"] += len(docs)
+    return h, rows
+
+def stats() -> Dict[str, Any]:
+    h, q = _current, _work["queries"]
+    out: Dict[str, Any] = {"enabled": SEARCH_HIERARCHICAL, "top_groups": HIER_TOP_GROUPS,
+                           "max_per_group": HIER_MAX_PER_GROUP, "queries": q}
+    if h is not None:
+        out.update(groups=len(h), chunks=len(h.docs), largest_group=int(h.sizes.max(initial=0)), build_s=h.build_s)
+    if q:
+        out.update(mean_rows_scored=round(_work["rows_scored"] / q, 1),
+                   mean_work_ratio=round((_work["rows_scored"] + _work["groups_scored"]) / _work["rows_total"], 4))
+    return out
@@ -0,0 +1,308 @@
+# app/index_build.py  (offline index build: streamed rows, one ONNX session per worker process, resumable)
+#
+#   python -m app.index_build --workers 4                  # publish to SHARED_INDEX_DIR
+#   python -m app.index_build --workers 4 --out /srv/idx   # then INDEX_ARTIFACT_DIR=/srv/idx for the API
+#   python -m app.index_build --workers 4 --resume         # continue an interrupted build
+#
+# unified_chunks is streamed in id order with a server-side cursor and cut into parts of
+# INDEX_BUILD_PART_SIZE chunks. Parts fan out to a spawn pool; each worker owns one InferenceSession
+# limited to cores // workers intra-op threads and, on Linux, pinned to its own cores. Finished parts
+# are written to <out>/build-work/part-<first id>-<last id>.npz (ids, content CRCs, vectors), so an
+# interrupted build resumes from the parts already on disk. The final step reloads the chunk columns
+# (_load_docs, so DEDUP_ENABLED applies), re-embeds any chunk whose content changed or that has no
+# part, and publishes a versioned index file (app/shared_index.py format) with the model fingerprint.
+import os
+import sys
+import json
+import time
+import zlib
+import hashlib
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = Path(__file__).parent.parent / "minilm_onnx"        # same model app/search.py serves with
+INDEX_BUILD_PART_SIZE = int(os.getenv("INDEX_BUILD_PART_SIZE", "2048"))
+INDEX_BUILD_WORKERS = int(os.getenv("INDEX_BUILD_WORKERS", str(os.cpu_count() or 1)))
+WORK_DIR_NAME = "build-work"
+
+def model_fingerprint(model_dir: Path = MODEL_DIR) -> str:
+    """Size + SHA-1 of the first and last MiB of model.onnx, plus the tokenizer vocab: cheap, and changes with the weights."""
+    h = hashlib.sha1()
+    for name in ("model.onnx", "tokenizer.json"):
+        path = model_dir / name
+        if not path.exists():
+            continue
+        size = path.stat().st_size
+        h.update(f"{name}:{size}".encode())
+        with open(path, "rb") as f:
+            h.update(f.read(1 << 20))
+            f.seek(max(size - (1 << 20), 0))
+            h.update(f.read(1 << 20))
+    return h.hexdigest()[:16]
+
+def _crc(contents) -> np.ndarray:
+    return np.fromiter((zlib.crc32(c.encode("utf-8")) for c in contents), dtype=np.uint32, count=len(contents))
+
+# ---------- 1. workers ----------
+_worker: Dict[str, Any] = {}
+
+def _init_worker(threads: int, slot, cores: List[int]) -> None:
+    """Runs once per spawned worker: pin to a core slice, then load the model with that many threads."""
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    with slot.get_lock():
+        index = slot.value
+        slot.value += 1
+    if hasattr(os, "sched_setaffinity") and len(cores) >= threads * (index + 1):
+        os.sched_setaffinity(0, cores[threads * index:threads * (index + 1)])
+    import onnxruntime as ort
+    from transformers import AutoTokenizer
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = threads
+    opts.inter_op_num_threads = 1
+    opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    _worker["sess"] = ort.InferenceSession(str(MODEL_DIR / "model.onnx"), opts, providers=["CPUExecutionProvider"])
+    _worker["tok"] = AutoTokenizer.from_pretrained(str(MODEL_DIR))
+
+def embed_part(contents: List[str]) -> np.ndarray:
+    from .embed_executor import embed_corpus
+    return embed_corpus(contents, sess=_worker["sess"], tok=_worker["tok"])
+
+# ---------- 2. streaming + parts ----------
+def stream_chunks(engine: Engine, part_size: int) -> Iterator[Tuple[np.ndarray, List[str]]]:
+    """(ids, contents) parts in id order over one server-side cursor (SSCursor on MySQL/TiDB)."""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=part_size).execute(
+            text("SELECT id, content FROM unified_chunks ORDER BY id"))
+        for rows in result.partitions(part_size):
+            yield np.fromiter((r.id for r in rows), dtype=np.int64, count=len(rows)), [r.content for r in rows]
+
+def _part_path(work: Path, ids: np.ndarray) -> Path:
+    return work / f"part-{int(ids[0])}-{int(ids[-1])}.npz"
+
+def _save_part(work: Path, ids: np.ndarray, contents: List[str], vecs: np.ndarray) -> None:
+    path = _part_path(work, ids)
+    tmp = path.with_name(path.name + ".tmp")           # not matched by part-*.npz until renamed
+    with open(tmp, "wb") as f:
+        np.savez(f, ids=ids, crc=_crc(contents), vecs=vecs.astype(np.float32))
+    os.replace(tmp, path)
+
+def done_ranges(work: Path) -> List[Tuple[int, int]]:
+    out = []
+    for p in work.glob("part-*.npz"):
+        try:
+            _, first, last = p.stem.split("-")
+            out.append((int(first), int(last)))
+        except ValueError:
+            continue
+    return sorted(out)
+
+def _covered(ranges: List[Tuple[int, int]], ids: np.ndarray) -> np.ndarray:
+    """Per id: inside a finished part's [first, last] range."""
+    if not ranges:
+        return np.zeros(len(ids), dtype=bool)
+    firsts = np.array([r[0] for r in ranges])
+    lasts = np.array([r[1] for r in ranges])
+    pos = np.searchsorted(firsts, ids, side="right") - 1
+    return (pos >= 0) & (ids <= lasts[np.maximum(pos, 0)])
+
+def _prepare_work(out: Path, resume: bool) -> Path:
+    work = out / WORK_DIR_NAME
+    manifest = {"model": model_fingerprint(), "dim": 384}
+    if work.exists() and resume:
+        try:
+            old = json.loads((work / "manifest.json").read_text())
+        except (OSError, ValueError):
+            old = None
+        if old == manifest:
+            return work
+        logger.warning("Build directory was made with a different model; starting over")
+    if work.exists():
+        for p in work.iterdir():
+            p.unlink()
+    work.mkdir(parents=True, exist_ok=True)
+    (work / "manifest.json").write_text(json.dumps(manifest))
+    return work
+
+class Progress:
+    """One line on stderr (rewritten in place on a terminal, logged every ~10% otherwise)."""
+
+    def __init__(self, total: int, already: int):
+        self.total, self.done, self.t0 = total, already, time.perf_counter()
+        self.start_done = already
+        self.tty = sys.stderr.isatty()
+        self._next_log = 0.1
+
+    def update(self, n: int) -> None:
+        self.done += n
+        elapsed = time.perf_counter() - self.t0
+        rate = (self.done - self.start_done) / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else 0.0
+        line = f"embedded {self.done}/{self.total} chunks  {rate:.0f}/s  eta {eta:.0f}s"
+        if self.tty:
+            print("\r" + line, end="", file=sys.stderr, flush=True)
+        elif self.total and self.done / self.total >= self._next_log:
+            logger.info(line)
+            self._next_log += 0.1
+
+    def close(self) -> None:
+        if self.tty:
+            print(file=sys.stderr)
+
+# ---------- 3. build ----------
+def embed_all(engine: Engine, work: Path, workers: int, part_size: int,
+              only: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Embed every chunk (or every id in sorted `only`) not already in a finished part; returns counts and timings."""
+    if only is None:
+        with engine.connect() as conn:
+            total = conn.execute(text("SELECT COUNT(*) FROM unified_chunks")).scalar() or 0
+    else:
+        total = len(only)
+    ranges = done_ranges(work)
+    resumed = sum(len(np.load(work / f"part-{a}-{b}.npz")["ids"]) for a, b in ranges)
+    progress = Progress(total, resumed)
+    t0 = time.perf_counter()
+    embedded = 0
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    threads = max(len(cores) // max(workers, 1), 1)
+
+    def todo():
+        for ids, contents in stream_chunks(engine, part_size):
+            keep = ~_covered(ranges, ids)
+            if only is not None:
+                keep &= np.isin(ids, only, assume_unique=True)
+            if keep.all():
+                yield ids, contents
+            elif keep.any():
+                yield ids[keep], [c for c, k in zip(contents, keep) if k]
+
+    try:
+        if workers <= 0:
+            from .search import _embed_corpus
+            for ids, contents in todo():
+                _save_part(work, ids, contents, _embed_corpus(contents))
+                embedded += len(ids)
+                progress.update(len(ids))
+        else:
+            # spawn: ONNX Runtime sessions do not survive fork reliably
+            ctx = multiprocessing.get_context("spawn")
+            slot = ctx.Value("i", 0)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                     initargs=(threads, slot, cores)) as pool:
+                inflight: Dict[Any, Tuple[np.ndarray, List[str]]] = {}
+
+                def drain(block_until: int) -> None:
+                    nonlocal embedded
+                    while len(inflight) > block_until:
+                        finished, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+                        for fut in finished:
+                            ids, contents = inflight.pop(fut)
+                            _save_part(work, ids, contents, fut.result())
+                            embedded += len(ids)
+                            progress.update(len(ids))
+
+                for ids, contents in todo():
+                    inflight[pool.submit(embed_part, contents)] = (ids, contents)
+                    drain(2 * workers - 1)     # bounded: at most two parts per worker held in memory
+                drain(0)
+    finally:
+        progress.close()
+    elapsed = time.perf_counter() - t0
+    return {"chunks": total, "resumed": resumed, "embedded": embedded, "workers": workers,
+            "threads_per_worker": threads, "embed_s": round(elapsed, 3),
+            "chunks_per_s": round(embedded / elapsed, 1) if elapsed else 0.0}
+
+def load_docs(engine: Engine):
+    from sqlalchemy.orm import Session
+    from .search import _load_docs
+    with Session(engine) as db:
+        return _load_docs(db)
+
+def assemble(engine: Engine, work: Path, docs=None):
+    """(docs, mat, norms, stale) from the parts; chunks missing from them or changed since are embedded here."""
+    from .search import _embed_corpus
+    docs = load_docs(engine) if docs is None else docs
+    parts = [np.load(p) for p in sorted(work.glob("part-*.npz"))]
+    if parts:
+        ids = np.concatenate([p["ids"] for p in parts])
+        crcs = np.concatenate([p["crc"] for p in parts])
+        vecs = np.concatenate([p["vecs"] for p in parts])
+        order = np.argsort(ids, kind="stable")
+        ids, crcs, vecs = ids[order], crcs[order], vecs[order]
+    else:
+        ids, crcs, vecs = np.empty(0, np.int64), np.empty(0, np.uint32), np.empty((0, 384), np.float32)
+    mat = np.empty((len(docs), 384), dtype=np.float32)
+    found = np.zeros(len(docs), dtype=bool)
+    if len(ids):
+        pos = np.minimum(np.searchsorted(ids, docs.ids), len(ids) - 1)
+        found = (ids[pos] == docs.ids) & (crcs[pos] == _crc(docs.contents))
+        mat[found] = vecs[pos[found]]
+    stale = np.flatnonzero(~found)
+    if len(stale):
+        mat[stale] = _embed_corpus([docs.contents[i] for i in stale])
+    norms = np.linalg.norm(mat, axis=1).astype(np.float32)
+    return docs, mat, norms, len(stale)
+
+def build(engine: Engine, out: Path, workers: int = INDEX_BUILD_WORKERS, part_size: int = INDEX_BUILD_PART_SIZE,
+          resume: bool = False, keep_parts: bool = False) -> Dict[str, Any]:
+    from . import shared_index, dedup
+    from .search import corpus_fingerprint
+    t0 = time.perf_counter()
+    out = Path(out)
+    with engine.connect() as conn:
+        corpus = corpus_fingerprint(conn)      # taken first: rows changed mid-build make the index stale
+    work = _prepare_work(out, resume)
+    # with DEDUP_ENABLED only the canonical chunks are indexed, so collapse first and embed just those
+    docs = load_docs(engine) if dedup.DEDUP_ENABLED else None
+    report = embed_all(engine, work, workers, part_size, None if docs is None else np.sort(docs.ids))
+    t1 = time.perf_counter()
+    docs, mat, norms, stale = assemble(engine, work, docs)
+    meta = {"model": model_fingerprint(), "corpus": corpus, "built_at": time.time(), "chunks": report["chunks"],
+            "dedup": dedup.last_report if dedup.DEDUP_ENABLED else None}
+    generation = shared_index.publish(docs, mat, norms, directory=out, meta=meta)
+    if not keep_parts:
+        for p in work.iterdir():
+            p.unlink()
+        work.rmdir()
+    report.update(indexed=len(docs), re_embedded_at_assemble=stale, assemble_s=round(time.perf_counter() - t1, 3),
+                  elapsed_s=round(time.perf_counter() - t0, 3), generation=generation, out=str(out))
+    logger.info(f"Index build: {report}")
+    return report
+
+# ---------- 4. loading (API side) ----------
+def load_artifact(directory: Path):
+    """The current index in `directory` if it was built with the model this process serves, else None."""
+    from . import shared_index
+    try:
+        idx = shared_index.attach(directory=Path(directory))
+    except (FileNotFoundError, ValueError) as e:
+        logger.warning(f"No usable index artifact in {directory}: {e}")
+        return None
+    built_with = idx.header.get("meta", {}).get("model")
+    if built_with != model_fingerprint():
+        logger.warning(f"Index artifact {idx.path} was built with model {built_with}, serving "
+                       f"{model_fingerprint()}; building in-process instead")
+        return None
+    return idx
+
+if __name__ == "__main__":
+    from .shared_index import SHARED_INDEX_DIR
+    parser = argparse.ArgumentParser(description="Build the embedding index offline and publish it")
+    parser.add_argument("--workers", type=int, default=INDEX_BUILD_WORKERS, help="0 = embed in-process")
+    parser.add_argument("--part-size", type=int, default=INDEX_BUILD_PART_SIZE)
+    parser.add_argument("--out", type=Path, default=SHARED_INDEX_DIR, help="index directory (default SHARED_INDEX_DIR)")
+    parser.add_argument("--resume", action="store_true", help="keep finished parts from an interrupted build")
+    parser.add_argument("--keep-parts", action="store_true")
+    args = parser.parse_args()
+    # progress and per-phase logs go to stderr; stdout carries only the JSON report
+    logging.basicConfig(level=logging.INFO)
+    from .database import engine
+    print(json.dumps(build(engine, args.out, args.workers, args.part_size, args.resume, args.keep_parts)))
@@ -1,18 +1,35 @@
 import os
+import time
 import logging
+from typing import Iterator
 from dotenv import load_dotenv
 from groq import Groq
+from .resilience import llm_guard, CircuitOpen
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# ---- Backend selection ----
+# groq -> Groq API (or any OpenAI-compatible server at GROQ_BASE_URL, e.g. bench/fake_llm.py)
+# stub -> in-process canned answer after STUB_LLM_LATENCY_MS, no network
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq").lower()
+LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-oss-120b")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+STUB_LLM_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "0"))
+
 # Initialize Groq client
-client = Groq(api_key=os.getenv("GROQ_API_KEY","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"))
-def answer(question: str, context: str) -> str:
-    print(context)
-    prompt = (
+client = Groq(api_key=os.getenv("GROQ_API_KEY","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"),
+              base_url=GROQ_BASE_URL, max_retries=0) if LLM_BACKEND == "groq" else None  # retries: llm_guard
+
+def _stub_answer(prompt: str) -> str:
+    if STUB_LLM_LATENCY_MS > 0:
+        time.sleep(STUB_LLM_LATENCY_MS / 1000.0)
+    return f"[stub answer] prompt of {len(prompt)} characters received."
+
+def _build_prompt(question: str, context: str) -> str:
+    return (
     "You are Neethi Saarathi, a helpful Indian assistant guiding users about laws, rights, "
     "and government schemes. "
     "Always answer clearly in plain, simple language. "
@@ -28,20 +45,31 @@ def answer(question: str, context: str) -> str:
     "Make sure the answer is clear, user-friendly, and well-structured.\n\n"
     f"Context:\n{context}\n\n"
     f"User Query: {question}\n"
-)   
+)
+
+def _messages(prompt: str) -> list:
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant that provides accurate information based on the given context."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+def answer(question: str, context: str) -> str:
+    logger.debug("LLM context: %s", context)
+    prompt = _build_prompt(question, context)
+    if LLM_BACKEND == "stub":
+        return _stub_answer(prompt)
     try:
-        completion = client.chat.completions.create(
-            model="openai/gpt-oss-120b",  # Using the exact model from your documentation
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that provides accurate information based on the given context."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+        # jittered retries, per-attempt timeout and circuit breaker (app/resilience.py)
+        completion = llm_guard.call(
+            client.chat.completions.create,
+            model=LLM_MODEL,  # defaults to the exact model from your documentation
+            messages=_messages(prompt),
             max_tokens=4096,
             temperature=0.1
         )
@@ -54,9 +82,36 @@ def answer(question: str, context: str) -> str:
             logger.error(error_msg)
             return error_msg
             
+    except CircuitOpen:
+        raise  # shed as 503 + Retry-After by the routes
     except Exception as e:
         error_msg = f"Error calling Groq API: {str(e)}"
         logger.error(error_msg)
         import traceback
         logger.error(traceback.format_exc())
-        return error_msg
\ No newline at end of file
+        return error_msg
+
+def answer_stream(question: str, context: str) -> Iterator[str]:
+    """Same prompt as answer(), yielding text deltas as the model produces them."""
+    logger.debug("LLM context: %s", context)
+    prompt = _build_prompt(question, context)
+    if LLM_BACKEND == "stub":
+        for word in _stub_answer(prompt).split(" "):
+            yield word + " "
+        return
+    try:
+        stream = llm_guard.call(
+            client.chat.completions.create,
+            model=LLM_MODEL,
+            messages=_messages(prompt),
+            max_tokens=4096,
+            temperature=0.1,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        error_msg = f"Error calling Groq API: {str(e)}"
+        logger.error(error_msg)
+        yield error_msg
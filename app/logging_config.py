@@ -1,20 +1,119 @@
-import logging
+import os
 import sys
+import copy
+import json
+import atexit
+import queue
+import random
+import logging
+import logging.handlers
+
+# LOG_ASYNC=1        handlers run on a background QueueListener thread (default)
+# LOG_FORMAT=json    one JSON object per line (default "text")
+# LOG_LEVEL=INFO     root level
+# LOG_LEVELS=app.search=WARNING,sqlalchemy.engine=INFO     per-logger levels
+# LOG_SAMPLE=app.agent=0.1,app.search=0.05                 keep this fraction of INFO/DEBUG records
+# LOG_MAX_CHARS=2000  truncate long messages (prompt contexts, chunk contents)
+LOG_ASYNC = os.getenv("LOG_ASYNC", "1").lower() in ("1", "true", "yes")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_CHARS = int(os.getenv("LOG_MAX_CHARS", "2000"))
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+_atexit_registered = False
+
+def _parse_map(spec: str) -> dict:
+    out = {}
+    for part in spec.split(","):
+        name, sep, value = part.partition("=")
+        if sep and name.strip():
+            out[name.strip()] = value.strip()
+    return out
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of INFO/DEBUG records per logger prefix; WARNING and above always pass."""
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        # longest prefix first so "app.search" wins over "app"
+        self.rates = sorted(((name, float(r)) for name, r in rates.items()), key=lambda x: -len(x[0]))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + "."):
+                return rate >= 1.0 or random.random() < rate
+        return True
+
+class TruncatingQueueHandler(logging.handlers.QueueHandler):
+    """Renders %-args once on the caller thread, truncates INFO/DEBUG payloads, then enqueues.
+
+    The traceback is rendered into exc_text rather than folded into msg (as QueueHandler.prepare does),
+    so the listener's formatter still sees it separately: text appends it, JSON puts it in "exc".
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        msg = record.getMessage()
+        if LOG_MAX_CHARS and record.levelno < logging.WARNING and len(msg) > LOG_MAX_CHARS:
+            msg = msg[:LOG_MAX_CHARS] + f"... [{len(msg) - LOG_MAX_CHARS} chars truncated]"
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+        # traceback objects hold frames (and their locals) alive while queued: keep only the text
+        record.message, record.msg, record.args, record.exc_info = msg, msg, None, None
+        return record
+
+_exc_formatter = logging.Formatter()
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {"ts": self.formatTime(record), "level": record.levelname, "logger": record.name,
+               "msg": record.getMessage(), "thread": record.threadName}
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, ensure_ascii=False)
+
+def _stop_listener() -> None:
+    """Stop the queue listener if one is running; safe to call repeatedly (QueueListener.stop is not)."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
 
 def setup_logging():
+    global _listener, _atexit_registered
     # Create a handler that can handle Unicode
     handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
     # Set encoding to UTF-8 for the handler
     try:
         handler.stream.reconfigure(encoding='utf-8')
     except:
         pass  # Some streams may not support reconfigure
-    
+
+    root_handler = handler
+    if LOG_ASYNC:
+        _stop_listener()
+        q = queue.SimpleQueue()
+        root_handler = TruncatingQueueHandler(q)           # full layout is applied by `handler`
+        _listener = logging.handlers.QueueListener(q, handler, respect_handler_level=False)
+        _listener.start()
+        if not _atexit_registered:
+            atexit.register(_stop_listener)
+            _atexit_registered = True
+    root_handler.addFilter(SamplingFilter(_parse_map(os.getenv("LOG_SAMPLE", ""))))
+
     # Configure root logger
     logging.basicConfig(
-        level=logging.INFO,
-        handlers=[handler],
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
\ No newline at end of file
+        level=LOG_LEVEL,
+        handlers=[root_handler],
+        format=TEXT_FORMAT,
+        force=True
+    )
+    for name, level in _parse_map(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level.upper())
@@ -5,10 +5,15 @@ from fastapi.staticfiles import StaticFiles
 from .routes import router
 from .logging_config import setup_logging
 from .questionnaire import router as questionnaire_router
+from .admin import router as admin_router
+from .admission import Overloaded, overloaded_response
+from . import prewarm
+from .profiling import ProfilingMiddleware
+from .responses import ORJSONResponse, CompressionMiddleware
 
 # Setup logging
 setup_logging()
-app = FastAPI(title="NeethiSaarathi")
+app = FastAPI(title="NeethiSaarathi", default_response_class=ORJSONResponse)
 
 # ✅ COMPREHENSIVE CORS CONFIGURATION
 app.add_middleware(
@@ -19,9 +24,14 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
     expose_headers=["*"]  # Expose all headers
 )
+# gzip/brotli for single-shot bodies >= COMPRESS_MIN_BYTES; streamed NDJSON/forms pass through
+app.add_middleware(CompressionMiddleware)
+# opt-in per-request profiling (X-Profile: 1 + admin token, or PROFILE_SAMPLE_RATE); see app/profiling.py
+app.add_middleware(ProfilingMiddleware)
 
 app.include_router(router, prefix="/api")
 app.include_router(questionnaire_router, prefix="/api")
+app.include_router(admin_router, prefix="/api")
 app.mount("/", StaticFiles(directory="app/static", html=True), name="static")
 
 # ✅ ADD EXPLICIT OPTIONS HANDLER AT APPLICATION LEVEL
@@ -34,6 +44,16 @@ async def options_api_handler(path: str):
         "Access-Control-Allow-Credentials": "true"
     })
 
+@app.on_event("startup")
+async def start_prewarm():
+    # DB pool, index, ONNX shapes and recent traffic; /api/ready is 503 until done
+    prewarm.start_background()
+
+@app.exception_handler(Overloaded)
+async def overloaded_exception_handler(request: Request, exc: Overloaded):
+    # LLM gate full or a dependency's circuit breaker open (e.g. raised by get_db)
+    return overloaded_response(exc)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     import logging
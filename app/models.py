@@ -1,6 +1,6 @@
 from sqlalchemy.orm import declarative_base
 from sqlalchemy import Column, Integer, String, Text
-from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, Boolean, BigInteger, Index
 from datetime import datetime
 
 Base = declarative_base()
@@ -72,4 +72,30 @@ class UserProfile(Base):
             "health_needs": self.health_needs,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+class SchemeRecommendation(Base):
+    """Top-N schemes per profile, precomputed offline by `python -m app.recommendations`."""
+    __tablename__ = "scheme_recommendations"
+    __table_args__ = (Index("ix_scheme_recommendations_lookup", "session_id", "run_id", "rank"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String(255), nullable=False)
+    run_id = Column(BigInteger, nullable=False)      # sweep that wrote the row (ms timestamp)
+    rank = Column(Integer, nullable=False)
+    chunk_id = Column(Integer, nullable=False)
+    scheme_name = Column(String(255))
+    title = Column(String(255))
+    category = Column(String(100))
+    level = Column(String(50))
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "rank": self.rank,
+            "chunk_id": self.chunk_id,
+            "scheme_name": self.scheme_name,
+            "title": self.title,
+            "category": self.category,
+            "level": self.level
+        }
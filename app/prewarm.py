@@ -0,0 +1,204 @@
+# app/prewarm.py  (startup pre-warm: DB pool, index, ONNX shapes, and a replay of recent traffic)
+#
+# Runs in a background thread on startup (opt-in: PREWARM_ON_STARTUP=1) or via POST /api/admin/prewarm.
+# GET /api/ready answers 503 until a run has completed the REQUIRED_STEPS, so a load balancer / k8s
+# readiness probe keeps traffic away from a cold or broken worker. The startup run retries every
+# PREWARM_RETRY_S until then; failed best-effort steps are listed but do not block readiness.
+# Off by default: every worker embeds the index, opens the full DB pool and replays traffic at
+# startup, which on a large corpus is minutes of CPU per worker before it serves anything.
+import os
+import json
+import time
+import logging
+import threading
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ON_STARTUP = os.getenv("PREWARM_ON_STARTUP", "0").lower() in ("1", "true", "yes")
+PREWARM_RETRY_S = float(os.getenv("PREWARM_RETRY_S", "30"))
+PREWARM_TRAFFIC_LOG = os.getenv("PREWARM_TRAFFIC_LOG", "requests.jsonl")   # JSONL: q/question/query [+ session_id | profile]
+PREWARM_TAIL = int(os.getenv("PREWARM_TAIL", "10000"))                     # most recent records considered
+PREWARM_QUERIES = int(os.getenv("PREWARM_QUERIES", "50"))                  # (query, segment) pairs replayed
+PREWARM_DB_CONNECTIONS = int(os.getenv("PREWARM_DB_CONNECTIONS", "0"))     # 0 = the pool's configured size
+PREWARM_SEQ_LENS = [int(x) for x in os.getenv("PREWARM_SEQ_LENS", "8,16,32,64,128").split(",") if x.strip()]
+PREWARM_BATCH_SIZES = [int(x) for x in os.getenv("PREWARM_BATCH_SIZES", "1,16").split(",") if x.strip()]
+REQUIRED_STEPS = ("db_pool", "index")      # a worker cannot answer without these; the rest only cost latency
+
+_lock = threading.Lock()
+_ready = threading.Event()
+state: Dict[str, Any] = {"status": "pending", "runs": 0}
+
+def ready() -> bool:
+    return _ready.is_set()
+
+# ---------- 1. traffic log ----------
+def recent_traffic(path: Path, tail: int = PREWARM_TAIL) -> List[Dict[str, Any]]:
+    """Last `tail` parseable records of a requests.jsonl-style log."""
+    if not path.exists():
+        return []
+    records: deque = deque(maxlen=tail)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            q = rec.get("q") or rec.get("question") or rec.get("query")
+            if not q:
+                q = " ".join(p for p in (rec.get("title"), rec.get("body")) if p)
+            if q and q.strip():
+                records.append({"q": q.strip(), "session_id": rec.get("session_id"), "profile": rec.get("profile")})
+    return list(records)
+
+def top_pairs(db, records: List[Dict[str, Any]], n: int = PREWARM_QUERIES) -> List[Tuple[str, Optional[Dict[str, Any]], int]]:
+    """Most frequent (query, profile segment) pairs, with one representative profile per segment."""
+    from .models import UserProfile
+    from .segment_cache import segment_of, normalize_query
+    sessions = {r["session_id"] for r in records if r["session_id"] and not r["profile"]}
+    profiles: Dict[str, Dict[str, Any]] = {}
+    ids = sorted(sessions)
+    for i in range(0, len(ids), 500):
+        for p in db.query(UserProfile).filter(UserProfile.session_id.in_(ids[i:i + 500])):
+            profiles[p.session_id] = p.to_dict()
+    counts: Counter = Counter()
+    example: Dict[tuple, Tuple[str, Optional[Dict[str, Any]]]] = {}
+    for r in records:
+        profile = r["profile"] or profiles.get(r["session_id"])
+        key = (normalize_query(r["q"]), segment_of(profile))
+        counts[key] += 1
+        example.setdefault(key, (r["q"], profile))
+    return [(*example[key], c) for key, c in counts.most_common(n)]
+
+# ---------- 2. steps ----------
+def warm_db_pool(n: int = PREWARM_DB_CONNECTIONS) -> int:
+    """Open n pooled connections at once (so they are all established), then return them to the pool."""
+    from sqlalchemy import text
+    from .database import engine
+    size = getattr(engine.pool, "size", None)
+    n = n or (size() if callable(size) else 1)
+    conns = []
+    try:
+        for _ in range(n):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            conns.append(conn)
+    finally:
+        for conn in conns:
+            conn.close()
+    return len(conns)
+
+def warm_model() -> List[List[int]]:
+    """One dummy inference per (batch, padded length) bucket; first runs allocate kernels and arenas."""
+    from . import search, rerank, classifier
+    shapes = []
+    for b in PREWARM_BATCH_SIZES:
+        for L in PREWARM_SEQ_LENS:
+            search._embed(["warm " * max(L - 2, 1)] * b)
+            shapes.append([b, L])
+    if rerank.enabled():
+        rerank.score("warm up", ["warm up"] * rerank.RERANK_BATCH, budget_ms=None)
+    classifier.warm()
+    return shapes
+
+def warm_index(db) -> int:
+    from . import search, hierarchy
+    if search.INDEX_MODE == "sharded":
+        from . import sharding
+        sharding.cluster().start()
+        return sum(c.info.get("chunks", 0) for c in sharding.cluster().clients)
+    search._ensure_cache(db)
+    if hierarchy.enabled():
+        hierarchy.for_index(search._cached_docs, search._cached_mat, search._cached_norms)
+    return len(search._cached_docs)
+
+def warm_suggest(db) -> int:
+    from . import suggest
+    return len(suggest.current(db))
+
+def replay(db, pairs) -> int:
+    from .search import retrieve
+    from .rerank import context_k
+    done = 0
+    for q, profile, _ in pairs:
+        for k in sorted({context_k(3), context_k(5)}):   # the k values /query and /agent use
+            try:
+                retrieve(q, k=k, db=db, user_profile=profile)
+                done += 1
+            except Exception as e:
+                logger.warning(f"Pre-warm replay failed for {q[:60]!r}: {e}")
+    return done
+
+# ---------- 3. run ----------
+def run(traffic_log: Optional[str] = None) -> Dict[str, Any]:
+    """Run every step once, timing each; marks the worker ready if every REQUIRED_STEPS step succeeded."""
+    from .database import SessionLocal
+    if not _lock.acquire(blocking=False):
+        return dict(state, message="pre-warm already running")
+    try:
+        state.update(status="warming", started_at=time.time(), steps={}, failed=[])
+        t0 = time.perf_counter()
+        steps: Dict[str, Any] = state["steps"]
+
+        def step(name, fn, *args):
+            t = time.perf_counter()
+            try:
+                steps[name] = {"result": fn(*args)}
+            except Exception as e:
+                logger.error(f"Pre-warm step {name} failed: {e}")
+                steps[name] = {"error": f"{type(e).__name__}: {e}"}
+                state["failed"].append(name)
+            steps[name]["s"] = round(time.perf_counter() - t, 3)
+
+        step("db_pool", warm_db_pool)
+        try:
+            with SessionLocal() as db:
+                step("index", warm_index, db)
+                step("suggest", warm_suggest, db)
+                step("model", warm_model)
+                pairs = []
+                t = time.perf_counter()
+                try:
+                    pairs = top_pairs(db, recent_traffic(Path(traffic_log or PREWARM_TRAFFIC_LOG)))
+                except Exception as e:
+                    logger.error(f"Pre-warm traffic log failed: {e}")
+                steps["traffic"] = {"result": len(pairs), "s": round(time.perf_counter() - t, 3)}
+                step("replay", replay, db, pairs)
+        except Exception as e:           # no session at all: every DB-backed step counts as failed
+            logger.error(f"Pre-warm session failed: {e}")
+            state["failed"] += [name for name in REQUIRED_STEPS if name not in steps]
+        ok = not set(REQUIRED_STEPS) & set(state["failed"])
+        state.update(status="ready" if ok else "failed", duration_s=round(time.perf_counter() - t0, 3),
+                     finished_at=time.time(), runs=state["runs"] + 1)
+        if ok:
+            _ready.set()
+        logger.info(f"Pre-warm {state['status']} in {state['duration_s']}s: "
+                    + ", ".join(f"{k}={v['s']}s" for k, v in steps.items())
+                    + (f"; failed: {', '.join(state['failed'])}" if state["failed"] else ""))
+        return dict(state)
+    finally:
+        _lock.release()
+
+def _warm_until_ready() -> None:
+    while True:
+        run()
+        if ready():
+            return
+        logger.warning(f"Pre-warm required steps failed; retrying in {PREWARM_RETRY_S}s")
+        time.sleep(PREWARM_RETRY_S)
+
+def start_background() -> None:
+    """Startup hook: warm in a daemon thread so the server accepts probes meanwhile."""
+    if not PREWARM_ON_STARTUP:
+        state["status"] = "skipped"
+        _ready.set()
+        return
+    threading.Thread(target=_warm_until_ready, name="prewarm", daemon=True).start()
+
+def status() -> Dict[str, Any]:
+    return dict(state, ready=ready())
@@ -0,0 +1,107 @@
+# app/profile_vectors.py  (profile embedding stored at profile save, combined with the pure-query vector)
+#
+# Text mode appends the profile's search terms to the query before embedding, so every profile
+# produces a different string (no shared embedding cache entry) and the terms use up part of the
+# 128-token window. Vector mode embeds the terms once per profile save and combines:
+#     q = (n_q * query_vec + n_p * profile_vec) / (n_q + n_p)
+# i.e. the mean-pool over the concatenated tokens, computed per part (PROFILE_VECTOR_WEIGHT=auto),
+# or a fixed weight on the unit vectors. bench/profile_vectors_eval.py checks ranking parity; text
+# stays the default until that shows parity on the production model and corpus.
+# A vector depends only on the terms, so it lives in an in-memory LRU keyed by them (shared by all
+# profiles with the same terms); nothing is persisted, a worker that misses embeds the terms once.
+import os
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROFILE_VECTOR_MODE = os.getenv("PROFILE_VECTOR_MODE", "text").lower()     # text | vector (opt-in)
+PROFILE_VECTOR_WEIGHT = os.getenv("PROFILE_VECTOR_WEIGHT", "auto")         # auto | 0..1
+PROFILE_VECTOR_CACHE_SIZE = int(os.getenv("PROFILE_VECTOR_CACHE_SIZE", "4096"))
+
+ProfileVec = Tuple[np.ndarray, int]   # (raw mean-pooled vector, token count incl. special tokens)
+
+def enabled() -> bool:
+    return PROFILE_VECTOR_MODE == "vector"
+
+# ---------- 1. vectors, keyed by the profile's search terms ----------
+_lock = threading.Lock()
+_vectors: "OrderedDict[str, ProfileVec]" = OrderedDict()
+
+@lru_cache(maxsize=4096)
+def token_count(text: str) -> int:
+    from .search import _tok
+    return len(_tok(text, truncation=True, max_length=128)["input_ids"])
+
+def _remember(terms: str, pv: ProfileVec) -> ProfileVec:
+    with _lock:
+        _vectors[terms] = pv
+        _vectors.move_to_end(terms)
+        while len(_vectors) > PROFILE_VECTOR_CACHE_SIZE:
+            _vectors.popitem(last=False)
+    return pv
+
+def _cached(terms: str) -> Optional[ProfileVec]:
+    with _lock:
+        pv = _vectors.get(terms)
+        if pv is not None:
+            _vectors.move_to_end(terms)
+        return pv
+
+def _compute(terms_list: Sequence[str]) -> List[ProfileVec]:
+    from .search import _embed
+    vecs = _embed(list(terms_list))
+    return [_remember(t, (v, token_count(t))) for t, v in zip(terms_list, vecs)]
+
+def vector_for(profile: Optional[Dict[str, Any]]) -> Optional[ProfileVec]:
+    """Memory, else embed. None for a profile without search terms."""
+    from .search import _profile_to_search_terms
+    terms = _profile_to_search_terms(profile)
+    if not terms:
+        return None
+    return _cached(terms) or _compute([terms])[0]
+
+def warm(profile: Dict[str, Any]) -> None:
+    """Embed a just-saved profile's terms so its first query does not (POST /user/profile, vector mode)."""
+    if enabled():
+        vector_for(profile)
+
+# ---------- 2. combining ----------
+def _unit(v: np.ndarray) -> np.ndarray:
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+def combine(q_vec: np.ndarray, q_tokens: int, pv: ProfileVec) -> np.ndarray:
+    p_vec, p_tokens = pv
+    if PROFILE_VECTOR_WEIGHT == "auto":
+        out = (q_tokens * q_vec + p_tokens * p_vec) / float(q_tokens + p_tokens)
+    else:
+        w = float(PROFILE_VECTOR_WEIGHT)
+        out = (1 - w) * _unit(q_vec) + w * _unit(p_vec)
+    return out.astype(np.float32)
+
+def personalize(base_query: str, profile: Optional[Dict[str, Any]]) -> np.ndarray:
+    """Query vector for this profile: cached pure-query embedding combined with the profile vector."""
+    from .search import _embed_query
+    q_vec = _embed_query(base_query)
+    pv = vector_for(profile)
+    return q_vec if pv is None else combine(q_vec, token_count(base_query), pv)
+
+def personalize_batch(base_query: str, profiles: Sequence[Optional[Dict[str, Any]]]) -> List[np.ndarray]:
+    """personalize() for many profiles; uncached profile terms are embedded in one batch."""
+    from .search import _embed_query, _profile_to_search_terms
+    terms = [_profile_to_search_terms(p) for p in profiles]
+    missing = sorted({t for t in terms if t and _cached(t) is None})
+    if missing:
+        _compute(missing)
+    q_vec, q_tokens = _embed_query(base_query), token_count(base_query)
+    return [combine(q_vec, q_tokens, _cached(t) or _compute([t])[0]) if t else q_vec for t in terms]
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        cached = len(_vectors)
+    return {"mode": PROFILE_VECTOR_MODE, "weight": PROFILE_VECTOR_WEIGHT, "cached_profiles": cached}
@@ -0,0 +1,218 @@
+# app/profiling.py  (opt-in per-request sampling profiler with speedscope output)
+#
+# A request is profiled when it carries X-Profile: 1 (or ?profile=1) together with a valid
+# X-Admin-Token, or at random with probability PROFILE_SAMPLE_RATE. While it runs, a sampler
+# thread snapshots the stacks of every busy thread (the event loop plus the worker threads that
+# retrieve(), the DB and the LLM call run on) every PROFILE_INTERVAL_MS. For explicit requests only,
+# tracemalloc records the allocation peak; it traces the whole process, so every concurrent request
+# pays for it while it is on, which random sampling in production must not do. Profiles are kept in memory (and in PROFILE_DIR if set) and served as
+# speedscope JSON from /api/admin/profiles/{id}; open them at https://www.speedscope.app.
+# Under concurrent load the samples include other requests' work on the same threads.
+import os
+import sys
+import json
+import time
+import random
+import logging
+import threading
+import tracemalloc
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))      # background capture, 0 = off
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "")                              # also write <id>.speedscope.json here
+PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "1").lower() in ("1", "true", "yes")
+PROFILE_MAX_DEPTH = 128
+
+# stacks whose innermost frames are one of these are parked threads, not work
+_IDLE = {("selectors.py", "select"), ("queue.py", "get"), ("thread.py", "_worker"), ("handlers.py", "dequeue"),
+         ("threading.py", "_wait_for_tstate_lock"), ("_base.py", "result")}
+
+Frame = Tuple[str, str, int]   # (function, file, first line)
+
+def _idle(frame) -> bool:
+    for _ in range(3):
+        if frame is None:
+            return False
+        if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE:
+            return True
+        frame = frame.f_back
+    return False
+
+class Sampler:
+    """Wall-clock stack sampler over all busy threads; one speedscope 'sampled' profile per thread."""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.frames: Dict[Frame, int] = {}
+        self.threads: Dict[int, Dict[str, Any]] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self.t0 = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> float:
+        self._stop.set()
+        self._thread.join()
+        return time.perf_counter() - self.t0
+
+    def _frame_id(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        fid = self.frames.get(key)
+        if fid is None:
+            fid = self.frames[key] = len(self.frames)
+        return fid
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval_s):
+            now = time.perf_counter()
+            weight, last = (now - last) * 1000.0, now
+            for tid, frame in sys._current_frames().items():
+                if tid == me or _idle(frame):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                    stack.append(self._frame_id(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                t = self.threads.get(tid)
+                if t is None:
+                    if tid not in names:
+                        names.update((th.ident, th.name) for th in threading.enumerate())
+                    t = self.threads[tid] = {"name": names.get(tid, str(tid)), "samples": [], "weights": []}
+                t["samples"].append(stack)
+                t["weights"].append(round(weight, 3))
+
+    def speedscope(self, name: str, duration_ms: float) -> Dict[str, Any]:
+        frames = [None] * len(self.frames)
+        for (fn, path, line), i in self.frames.items():
+            frames[i] = {"name": fn, "file": path, "line": line}
+        profiles = [{"type": "sampled", "name": f"{t['name']} ({len(t['samples'])} samples)", "unit": "milliseconds",
+                     "startValue": 0, "endValue": round(duration_ms, 3), "samples": t["samples"], "weights": t["weights"]}
+                    for t in sorted(self.threads.values(), key=lambda t: -len(t["samples"]))]
+        return {"$schema": "https://www.speedscope.app/file-format-schema.json", "name": name,
+                "exporter": "neethi-profiler", "activeProfileIndex": 0,
+                "shared": {"frames": frames}, "profiles": profiles}
+
+# ---------- store ----------
+_lock = threading.Lock()                 # one profiled request at a time (tracemalloc is process-wide)
+_profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+counters = {"profiled": 0, "skipped_busy": 0}
+
+def _keep(pid: str, meta: Dict[str, Any], doc: Dict[str, Any]) -> None:
+    _profiles[pid] = {"meta": meta, "speedscope": doc}
+    while len(_profiles) > PROFILE_KEEP:
+        _profiles.popitem(last=False)
+
+def _write(pid: str, doc: Dict[str, Any]) -> None:
+    if PROFILE_DIR:
+        try:
+            Path(PROFILE_DIR).mkdir(parents=True, exist_ok=True)
+            (Path(PROFILE_DIR) / f"{pid}.speedscope.json").write_text(json.dumps(doc), encoding="utf-8")
+        except OSError as e:
+            logger.error(f"Writing profile {pid} failed: {e}")
+
+def list_profiles() -> List[Dict[str, Any]]:
+    return [dict(p["meta"]) for p in reversed(_profiles.values())]
+
+def get_profile(pid: str) -> Optional[Dict[str, Any]]:
+    p = _profiles.get(pid)
+    return p["speedscope"] if p else None
+
+def stats() -> Dict[str, Any]:
+    return {"sample_rate": PROFILE_SAMPLE_RATE, "interval_ms": PROFILE_INTERVAL_MS, "kept": len(_profiles), **counters}
+
+# ---------- middleware ----------
+def _wants_profile(scope) -> Optional[str]:
+    """"explicit" (admin asked for it), "sampled" (PROFILE_SAMPLE_RATE) or None."""
+    qs = scope.get("query_string", b"")
+    flag = b"profile=1" in qs and b"profile=1" in qs.split(b"&")
+    token = None
+    for name, value in scope.get("headers") or ():
+        if name == b"x-profile":
+            flag = flag or value == b"1"
+        elif name == b"x-admin-token":
+            token = value
+    if flag:
+        from .admin import is_admin
+        return "explicit" if is_admin(token.decode("latin-1") if token else None) else None
+    return "sampled" if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE else None
+
+def _allocations() -> Tuple[int, List[Dict[str, Any]]]:
+    """(peak bytes, top allocation sites), then stop tracing. Snapshot and statistics are slow: worker thread."""
+    try:
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)])
+        top = [{"site": str(s.traceback[0]), "kib": round(s.size / 1024, 1), "count": s.count}
+               for s in snapshot.statistics("lineno")[:10]]
+        return peak, top
+    finally:
+        tracemalloc.stop()
+
+class ProfilingMiddleware:
+    """Pure ASGI: when a request is not profiled this is one header lookup (plus one random() if sampling)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        mode = _wants_profile(scope) if scope["type"] == "http" else None
+        if mode is None:
+            return await self.app(scope, receive, send)
+        if not _lock.acquire(blocking=False):
+            counters["skipped_busy"] += 1
+            return await self.app(scope, receive, send)
+        pid = f"{int(time.time() * 1000)}-{random.getrandbits(24):06x}"
+        status = {}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-profile-id", pid.encode())])
+            await send(message)
+
+        sampler = Sampler(PROFILE_INTERVAL_MS / 1000.0)
+        tracing = sampling = False
+        try:
+            try:
+                if mode == "explicit" and PROFILE_TRACEMALLOC and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    tracing = True
+                sampler.start()
+                sampling = True
+                await self.app(scope, receive, send_with_id)
+            finally:
+                # stop only what was started; a failure here must not leak tracing or the lock
+                duration = sampler.stop() if sampling else 0.0
+                peak, top = None, []
+                if tracing:
+                    peak, top = await run_in_threadpool(_allocations)
+                if sampling:
+                    name = f"{scope.get('method')} {scope.get('path')}"
+                    meta = {"id": pid, "request": name, "status": status.get("code"),
+                            "duration_ms": round(duration * 1000, 1),
+                            "samples": sum(len(t["samples"]) for t in sampler.threads.values()),
+                            "threads": len(sampler.threads),
+                            "alloc_peak_kib": round(peak / 1024, 1) if peak is not None else None,
+                            "top_allocations": top, "at": time.time()}
+                    speedscope = await run_in_threadpool(sampler.speedscope, name, duration * 1000)
+                    _keep(pid, meta, speedscope)
+                    if PROFILE_DIR:
+                        await run_in_threadpool(_write, pid, speedscope)
+                    counters["profiled"] += 1
+                    logger.info(f"Profiled {name} in {meta['duration_ms']} ms as {pid}")
+        finally:
+            _lock.release()
@@ -1,11 +1,12 @@
 # questionnaire.py - MODIFY TO REMOVE DUPLICATE ROUTES
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import BaseModel
 from typing import Dict, List, Union, Optional
 from .database import get_db
 from .models import UserProfile
+from .responses import conditional, etag_for
 import logging
 import uuid
 
@@ -17,16 +18,20 @@ router = APIRouter()
 # KEEP ONLY UNIQUE FUNCTIONALITY OR DELETE THIS FILE ENTIRELY
 
 # If you want to keep this file for organization, remove the duplicate routes:
+QUESTIONNAIRE_CATEGORIES = {
+    "categories": [
+        "personal_info",
+        "education",
+        "employment",
+        "agriculture",
+        "business",
+        "health"
+    ]
+}
+# static per deploy: the tag changes only when the list above does
+CATEGORIES_ETAG = etag_for("categories", QUESTIONNAIRE_CATEGORIES)
+
 @router.get("/questionnaire/categories")
-async def get_questionnaire_categories():
+async def get_questionnaire_categories(request: Request):
     """Get available questionnaire categories - UNIQUE FUNCTIONALITY"""
-    return {
-        "categories": [
-            "personal_info",
-            "education",
-            "employment",
-            "agriculture",
-            "business",
-            "health"
-        ]
-    }
\ No newline at end of file
+    return conditional(request, CATEGORIES_ETAG, lambda: QUESTIONNAIRE_CATEGORIES, cache_control="public, max-age=3600")
\ No newline at end of file
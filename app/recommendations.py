@@ -0,0 +1,165 @@
+# app/recommendations.py  (offline eligibility sweep: top-N schemes for every stored profile)
+#
+#   python -m app.recommendations --workers 4 --top-n 5
+#
+# Profiles are streamed in id order, collapsed to ranking-relevant segments (app/segment_cache.py),
+# and only one representative per segment is ranked. Workers attach to the shared mmap index
+# (app/shared_index.py), so the corpus is embedded once no matter how many processes run.
+import os
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from .models import UserProfile, SchemeRecommendation
+from .segment_cache import segment_of
+
+logger = logging.getLogger(__name__)
+
+RECOMMEND_QUERY = os.getenv("RECOMMEND_QUERY", "schemes for me")
+RECOMMEND_TOP_N = int(os.getenv("RECOMMEND_TOP_N", "5"))
+RECOMMEND_PAGE_SIZE = int(os.getenv("RECOMMEND_PAGE_SIZE", "1000"))
+RECOMMEND_BATCH = int(os.getenv("RECOMMEND_BATCH", "32"))       # segments per worker task / ONNX call
+CANDIDATES_PER_SCHEME = 4                                      # chunks retrieved per wanted scheme
+
+# ---------- 1. profile paging ----------
+def iter_profiles(db: Session, page_size: int = RECOMMEND_PAGE_SIZE) -> Iterator[UserProfile]:
+    """Keyset pagination on the primary key: constant cost per page, no OFFSET scans."""
+    last_id = 0
+    while True:
+        page = db.execute(select(UserProfile).where(UserProfile.id > last_id)
+                          .order_by(UserProfile.id).limit(page_size)).scalars().all()
+        if not page:
+            return
+        yield from page
+        last_id = page[-1].id
+        db.expunge_all()
+
+def group_by_segment(db: Session, page_size: int = RECOMMEND_PAGE_SIZE) -> Tuple[Dict[tuple, Dict[str, Any]], Dict[tuple, List[str]], int]:
+    """(segment -> representative profile, segment -> session ids, profiles seen)."""
+    representative: Dict[tuple, Dict[str, Any]] = {}
+    members: Dict[tuple, List[str]] = {}
+    seen = 0
+    for p in iter_profiles(db, page_size):
+        profile = p.to_dict()
+        seg = segment_of(profile)
+        representative.setdefault(seg, profile)
+        members.setdefault(seg, []).append(p.session_id)
+        seen += 1
+    return representative, members, seen
+
+# ---------- 2. ranking (runs in the workers) ----------
+def top_schemes(chunks: List[Dict[str, Any]], top_n: int) -> List[Dict[str, Any]]:
+    """Keep scheme chunks only, one per scheme, in retrieval order."""
+    from .docstore import _parse_metadata
+    out, seen = [], set()
+    for c in chunks:
+        if c.get("source") != "scheme":
+            continue
+        meta = _parse_metadata(c.get("metadata"))
+        name = meta.get("scheme_name") or c.get("title")
+        if name in seen:
+            continue
+        seen.add(name)
+        out.append({"chunk_id": c["id"], "scheme_name": name, "title": c.get("title"),
+                    "category": meta.get("category"), "level": meta.get("level")})
+        if len(out) == top_n:
+            break
+    return out
+
+_worker_db: Optional[Session] = None
+
+def _init_worker() -> None:
+    global _worker_db
+    from . import search
+    from .database import SessionLocal
+    search.INDEX_MODE = "shared"
+    _worker_db = SessionLocal()
+    search._ensure_cache(_worker_db)
+
+def rank_segments(profiles: List[Dict[str, Any]], query: str, top_n: int) -> List[List[Dict[str, Any]]]:
+    from .search import retrieve_batch
+    results = retrieve_batch(query, profiles, k=top_n * CANDIDATES_PER_SCHEME, db=_worker_db)
+    return [top_schemes(chunks, top_n) for chunks in results]
+
+# ---------- 3. sweep ----------
+def _write(db: Session, run_id: int, session_ids: List[str], recs: List[Dict[str, Any]]) -> int:
+    rows = [{"session_id": sid, "run_id": run_id, "rank": rank, **rec}
+            for sid in session_ids for rank, rec in enumerate(recs, start=1)]
+    if rows:
+        db.execute(insert(SchemeRecommendation), rows)
+    return len(rows)
+
+def sweep(db: Session, workers: int = 0, top_n: int = RECOMMEND_TOP_N, query: str = RECOMMEND_QUERY,
+          batch: int = RECOMMEND_BATCH, page_size: int = RECOMMEND_PAGE_SIZE) -> Dict[str, Any]:
+    """Recompute recommendations for all profiles; old runs are deleted once the new one is written."""
+    global _worker_db
+    from . import search
+    t0 = time.perf_counter()
+    run_id = int(time.time() * 1000)
+    SchemeRecommendation.__table__.create(db.get_bind(), checkfirst=True)
+
+    # publish (or attach to) the shared index before the workers start, so they only attach
+    search.INDEX_MODE = "shared"
+    search._ensure_cache(db)
+    t_index = time.perf_counter()
+
+    representative, members, n_profiles = group_by_segment(db, page_size)
+    segments = list(representative)
+    batches = [segments[i:i + batch] for i in range(0, len(segments), batch)]
+    t_group = time.perf_counter()
+
+    written = 0
+    if workers > 0:
+        # spawn: ONNX Runtime sessions do not survive fork reliably
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+            futures = {pool.submit(rank_segments, [representative[s] for s in b], query, top_n): b for b in batches}
+            for fut in as_completed(futures):
+                for seg, recs in zip(futures[fut], fut.result()):
+                    written += _write(db, run_id, members[seg], recs)
+                db.commit()
+    else:
+        _worker_db = db
+        for b in batches:
+            for seg, recs in zip(b, rank_segments([representative[s] for s in b], query, top_n)):
+                written += _write(db, run_id, members[seg], recs)
+            db.commit()
+
+    db.execute(delete(SchemeRecommendation).where(SchemeRecommendation.run_id != run_id))
+    db.commit()
+    elapsed = time.perf_counter() - t0
+    report = {"run_id": run_id, "profiles": n_profiles, "segments": len(segments), "rows": written,
+              "workers": workers, "index_s": round(t_index - t0, 3), "group_s": round(t_group - t_index, 3),
+              "rank_s": round(time.perf_counter() - t_group, 3), "elapsed_s": round(elapsed, 3),
+              "profiles_per_s": round(n_profiles / elapsed, 1) if elapsed else 0.0,
+              "index_generation": search.index_generation()}
+    logger.info(f"Recommendation sweep: {report}")
+    return report
+
+def lookup(db: Session, session_id: str) -> List[SchemeRecommendation]:
+    """Latest run's rows for one session, all of them whatever --top-n that run used.
+
+    Both the MAX(run_id) subquery and the rows are range scans on the (session_id, run_id, rank) index.
+    """
+    latest = (select(func.max(SchemeRecommendation.run_id))
+              .where(SchemeRecommendation.session_id == session_id).scalar_subquery())
+    return db.execute(select(SchemeRecommendation)
+                      .where(SchemeRecommendation.session_id == session_id, SchemeRecommendation.run_id == latest)
+                      .order_by(SchemeRecommendation.rank)).scalars().all()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute top-N scheme recommendations for all profiles")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="0 = rank in-process")
+    parser.add_argument("--top-n", type=int, default=RECOMMEND_TOP_N)
+    parser.add_argument("--query", default=RECOMMEND_QUERY)
+    parser.add_argument("--batch", type=int, default=RECOMMEND_BATCH)
+    parser.add_argument("--page-size", type=int, default=RECOMMEND_PAGE_SIZE)
+    args = parser.parse_args()
+    from .database import SessionLocal
+    with SessionLocal() as session:
+        print(json.dumps(sweep(session, args.workers, args.top_n, args.query, args.batch, args.page_size)))
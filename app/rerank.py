@@ -0,0 +1,116 @@
+# app/rerank.py  (optional ONNX cross-encoder re-ranking of retrieve() candidates, CPU, time-budgeted)
+#
+# Export + quantize a small MiniLM cross-encoder once:
+#   optimum-cli export onnx --model cross-encoder/ms-marco-MiniLM-L-6-v2 minilm_cross_encoder_onnx
+#   python -m app.rerank quantize
+# then run with RERANK_ENABLED=1.
+import os
+import sys
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0").lower() in ("1", "true", "yes")
+RERANK_MODEL_DIR = Path(os.getenv("RERANK_MODEL_DIR") or Path(__file__).parent.parent / "minilm_cross_encoder_onnx")
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_BATCH = int(os.getenv("RERANK_BATCH", "8"))
+RERANK_MAX_CANDIDATES = int(os.getenv("RERANK_MAX_CANDIDATES", "30"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+RERANK_CONTEXT_K = int(os.getenv("RERANK_CONTEXT_K", "3"))   # chunks sent to the LLM when re-ranking
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", "2"))
+
+_lock = threading.Lock()
+_sess = None
+_tok = None
+_load_failed = False
+_batch_ms_ema: Optional[float] = None   # observed cost of one batch, used to stop before the budget
+stats = {"reranked": 0, "fallback_budget": 0, "fallback_error": 0}
+
+def _model_path() -> Path:
+    for name in ("model_quantized.onnx", "model_int8.onnx", "model.onnx"):
+        if (RERANK_MODEL_DIR / name).exists():
+            return RERANK_MODEL_DIR / name
+    raise FileNotFoundError(f"No cross-encoder ONNX model in {RERANK_MODEL_DIR}")
+
+def _load() -> bool:
+    global _sess, _tok, _load_failed
+    if _sess is not None or _load_failed:
+        return _sess is not None
+    with _lock:
+        if _sess is not None or _load_failed:
+            return _sess is not None
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+            opts = ort.SessionOptions()
+            opts.intra_op_num_threads = RERANK_THREADS
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            path = _model_path()
+            _sess = ort.InferenceSession(str(path), opts, providers=["CPUExecutionProvider"])
+            _tok = AutoTokenizer.from_pretrained(str(RERANK_MODEL_DIR))
+            logger.info(f"Loaded cross-encoder re-ranker from {path}")
+        except Exception as e:
+            _load_failed = True
+            logger.error(f"Cross-encoder re-ranker disabled: {e}")
+    return _sess is not None
+
+def enabled() -> bool:
+    return RERANK_ENABLED and _load()
+
+def context_k(default: int) -> int:
+    """How many chunks callers should put in the LLM context (fewer once re-ranking is on)."""
+    return min(default, RERANK_CONTEXT_K) if enabled() else default
+
+def _score_batch(query: str, passages: List[str]) -> np.ndarray:
+    encoded = _tok([query] * len(passages), passages, padding=True, truncation="only_second",
+                   max_length=RERANK_MAX_LENGTH, return_tensors="np")
+    feeds = {i.name: encoded[i.name].astype(np.int64) for i in _sess.get_inputs() if i.name in encoded}
+    logits = _sess.run(None, feeds)[0]
+    return logits.reshape(len(passages), -1)[:, -1].astype(np.float32)
+
+def score(query: str, passages: List[str], budget_ms: float | None = None) -> Optional[np.ndarray]:
+    """Relevance logits for each passage, or None if the model is unavailable or the budget ran out.
+
+    Batches stop early when the remaining budget is smaller than the observed cost of one
+    batch, so a slow request falls back to heuristic ordering instead of blowing its latency.
+    """
+    global _batch_ms_ema
+    if not passages or not enabled():
+        return None
+    budget_ms = RERANK_BUDGET_MS if budget_ms is None else budget_ms
+    deadline = time.perf_counter() + budget_ms / 1000.0
+    out = np.empty(len(passages), dtype=np.float32)
+    try:
+        for start in range(0, len(passages), RERANK_BATCH):
+            remaining_ms = (deadline - time.perf_counter()) * 1000.0
+            if remaining_ms <= 0 or (_batch_ms_ema is not None and _batch_ms_ema > remaining_ms):
+                stats["fallback_budget"] += 1
+                return None
+            t0 = time.perf_counter()
+            out[start:start + RERANK_BATCH] = _score_batch(query, passages[start:start + RERANK_BATCH])
+            took = (time.perf_counter() - t0) * 1000.0
+            _batch_ms_ema = took if _batch_ms_ema is None else 0.8 * _batch_ms_ema + 0.2 * took
+    except Exception as e:
+        stats["fallback_error"] += 1
+        logger.error(f"Cross-encoder scoring failed, using heuristic order: {e}")
+        return None
+    stats["reranked"] += 1
+    return out
+
+def quantize(model_dir: Path = RERANK_MODEL_DIR) -> Path:
+    """Dynamic int8 quantization of model.onnx -> model_quantized.onnx."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    src, dst = model_dir / "model.onnx", model_dir / "model_quantized.onnx"
+    quantize_dynamic(str(src), str(dst), weight_type=QuantType.QInt8)
+    return dst
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "quantize":
+        print(f"Wrote {quantize()}")
+    else:
+        sys.exit("usage: python -m app.rerank quantize")
@@ -0,0 +1,366 @@
+# app/resilience.py  (retry with jittered backoff, deadlines, hedged reads and circuit breakers for TiDB / LLM)
+import os
+import math
+import time
+import random
+import asyncio
+import inspect
+import logging
+import functools
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+import numpy as np
+from .admission import Overloaded
+
+logger = logging.getLogger(__name__)
+
+DB_RETRY_ATTEMPTS = int(os.getenv("DB_RETRY_ATTEMPTS", "3"))
+DB_RETRY_BASE_MS = float(os.getenv("DB_RETRY_BASE_MS", "100"))
+DB_RETRY_MAX_MS = float(os.getenv("DB_RETRY_MAX_MS", "2000"))
+DB_DEADLINE_S = float(os.getenv("DB_DEADLINE_S", "10"))
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "3"))
+LLM_RETRY_BASE_MS = float(os.getenv("LLM_RETRY_BASE_MS", "500"))
+LLM_RETRY_MAX_MS = float(os.getenv("LLM_RETRY_MAX_MS", "8000"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))        # per attempt
+LLM_DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "60"))      # all attempts + backoff
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))     # consecutive transient failures to open
+BREAKER_RESET_S = float(os.getenv("BREAKER_RESET_S", "30"))    # open -> half-open after this long
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1").lower() in ("1", "true", "yes")
+HEDGE_MIN_MS = float(os.getenv("HEDGE_MIN_MS", "50"))
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))    # hedge once a read is slower than this quantile
+HEDGE_POOL_SIZE = int(os.getenv("HEDGE_POOL_SIZE", "8"))
+
+class CircuitOpen(Overloaded):
+    """Raised without calling the dependency while its breaker is open (-> 503 + Retry-After)."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(503, f"{name} is temporarily unavailable", retry_after)
+        self.name = name
+
+# ---------- 1. error classification ----------
+# MySQL/TiDB codes worth retrying: lock wait / deadlock, lost or refused connections,
+# TiDB write conflicts and region/TiKV unavailability.
+RETRYABLE_DB_CODES = {1205, 1213, 2002, 2003, 2006, 2013, 2055, 8022, 8028, 9001, 9002, 9005, 9007}
+
+def _db_error_code(e: BaseException) -> Optional[int]:
+    args = getattr(getattr(e, "orig", None), "args", ())
+    return args[0] if args and isinstance(args[0], int) else None
+
+def is_transient_db_error(e: BaseException) -> bool:
+    from sqlalchemy import exc
+    if isinstance(e, (exc.DisconnectionError, exc.TimeoutError)):
+        return True
+    if isinstance(e, (exc.OperationalError, exc.InterfaceError)):
+        code = _db_error_code(e)
+        if code is not None:
+            return code in RETRYABLE_DB_CODES
+        return "database is locked" in str(e)   # SQLite backend
+    return isinstance(e, (ConnectionError, TimeoutError))
+
+def is_transient_llm_error(e: BaseException) -> bool:
+    import groq
+    if isinstance(e, (groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError,
+                      ConnectionError, TimeoutError)):
+        return True                          # APITimeoutError is an APIConnectionError
+    status = getattr(e, "status_code", None)
+    return status is not None and (status in (408, 409, 429) or status >= 500)
+
+def _retry_after_hint(e: BaseException) -> float:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+# ---------- 2. circuit breaker ----------
+class CircuitBreaker:
+    """closed -> open after N consecutive transient failures -> half-open (one probe) after a cool-down."""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES, reset_timeout_s: float = BREAKER_RESET_S):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.counters = defaultdict(int)
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "open":
+                wait_s = self._opened_at + self.reset_timeout_s - time.monotonic()
+                if wait_s > 0:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpen(self.name, max(1, math.ceil(wait_s)))
+                self.state, self._probing = "half_open", False
+            if self.state == "half_open":
+                if self._probing:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpen(self.name, 1)
+                self._probing = True
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuit {self.name} closed")
+            self.state, self._failures, self._probing = "closed", 0, False
+
+    def release(self) -> None:
+        """The call ended without an outcome (cancelled, or a deadline on non-dependency work): free the probe slot."""
+        with self._lock:
+            self._probing = False
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self.counters["failures"] += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(f"Circuit {self.name} opened after {self._failures} consecutive failures")
+                    self.counters["opened"] += 1
+                self.state, self._opened_at, self._probing = "open", time.monotonic(), False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = max(0.0, self._opened_at + self.reset_timeout_s - time.monotonic()) if self.state == "open" else 0.0
+            return {"state": self.state, "consecutive_failures": self._failures,
+                    "retry_in_s": round(retry_in, 1), **self.counters}
+
+# ---------- 3. retry with jittered exponential backoff + deadline ----------
+class Guard:
+    """Retry policy + breaker for one dependency; use as guard.call(fn, ...), await guard.acall(...) or @guard.
+
+    Only errors the classifier calls transient are retried or counted against the breaker;
+    anything else proves the dependency answered, so it resets the breaker and is re-raised.
+    `timeout_kw` names a keyword the callee accepts for a per-attempt timeout, which is capped
+    by what is left of the deadline.
+    """
+
+    def __init__(self, name: str, breaker: Optional[CircuitBreaker], classify: Callable[[BaseException], bool],
+                 attempts: int, base_ms: float, max_ms: float, deadline_s: float,
+                 attempt_timeout_s: Optional[float] = None, timeout_kw: Optional[str] = None):
+        self.name = name
+        self.breaker = breaker
+        self.classify = classify
+        self.attempts = max(1, attempts)
+        self.base_s = base_ms / 1000.0
+        self.max_s = max_ms / 1000.0
+        self.deadline_s = deadline_s
+        self.attempt_timeout_s = attempt_timeout_s
+        self.timeout_kw = timeout_kw
+        self.counters = defaultdict(int)
+
+    def _before(self, deadline: float, kwargs: Dict[str, Any]) -> None:
+        if self.breaker:
+            self.breaker.before_call()
+        if self.timeout_kw:
+            remaining = deadline - time.monotonic()
+            kwargs[self.timeout_kw] = max(0.001, min(self.attempt_timeout_s or remaining, remaining))
+        self.counters["calls"] += 1
+
+    def _after_error(self, e: Exception, attempt: int, deadline: float) -> Optional[float]:
+        """Seconds to back off before the next attempt, or None to re-raise."""
+        if isinstance(e, CircuitOpen):
+            return None
+        transient = self.classify(e)
+        if self.breaker:
+            self.breaker.on_failure() if transient else self.breaker.on_success()
+        if not transient:
+            return None
+        self.counters["transient_errors"] += 1
+        delay = max(random.uniform(0, min(self.max_s, self.base_s * 2 ** attempt)), _retry_after_hint(e))
+        if attempt + 1 >= self.attempts or time.monotonic() + delay >= deadline:
+            self.counters["gave_up"] += 1
+            return None
+        self.counters["retries"] += 1
+        logger.warning(f"{self.name}: transient error on attempt {attempt + 1}, retrying in {delay:.2f}s: {e}")
+        return delay
+
+    def _after_success(self) -> None:
+        if self.breaker:
+            self.breaker.on_success()
+
+    def _release(self) -> None:
+        if self.breaker:
+            self.breaker.release()
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        deadline = time.monotonic() + self.deadline_s
+        for attempt in range(self.attempts):
+            self._before(deadline, kwargs)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._after_error(e, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # interrupted before an outcome: no verdict on the dependency, but a half-open probe must be freed
+                self._release()
+                raise
+            self._after_success()
+            return result
+
+    async def acall(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Same as call() for coroutine functions; backs off with asyncio.sleep, never blocking the loop.
+
+        Running out of deadline raises TimeoutError without a retry and without counting against the
+        breaker: the coroutine may be slow for reasons other than the dependency.
+        """
+        deadline = time.monotonic() + self.deadline_s
+        for attempt in range(self.attempts):
+            self._before(deadline, kwargs)
+            try:
+                result = await asyncio.wait_for(fn(*args, **kwargs), max(0.001, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                self._release()
+                self.counters["deadline_exceeded"] += 1
+                raise TimeoutError(f"{self.name}: deadline of {self.deadline_s}s exceeded") from None
+            except Exception as e:
+                delay = self._after_error(e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:          # CancelledError: the client went away mid-call
+                self._release()
+                raise
+            self._after_success()
+            return result
+
+    def __call__(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def awrapped(*args, **kwargs):
+                return await self.acall(func, *args, **kwargs)
+            return awrapped
+
+        @functools.wraps(func)
+        def wrapped(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        return wrapped
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"attempts": self.attempts, "deadline_s": self.deadline_s, **self.counters}
+
+# ---------- 4. hedged reads ----------
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_hedge_pool_lock = threading.Lock()
+_hedge_idle = threading.BoundedSemaphore(HEDGE_POOL_SIZE)   # pool workers not running (or owed) a task
+
+def _pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_POOL_SIZE, thread_name_prefix="hedge")
+        return _hedge_pool
+
+def _submit_if_idle(fn: Callable[..., Any], *args, **kwargs):
+    """Future for fn on an idle pool worker, or None: work is never queued behind a busy pool."""
+    if not _hedge_idle.acquire(blocking=False):
+        return None
+
+    def run():
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _hedge_idle.release()
+    try:
+        return _pool().submit(run)
+    except BaseException:
+        _hedge_idle.release()
+        raise
+
+class Hedger:
+    """Send a second copy of an idempotent read once the first is slower than the recent p95.
+
+    The callee must be safe to run twice concurrently (e.g. open its own DB session);
+    the slower copy is left to finish in the background and its result is dropped.
+
+    The pool (HEDGE_POOL_SIZE) is spare capacity, not a limit on reads: a call that finds no idle
+    worker runs on the caller's thread and is not hedged, and a hedge is only sent to an idle
+    worker, so a slow DB never gets extra copies queued up behind the ones already waiting.
+    """
+
+    def __init__(self, name: str, min_ms: float = HEDGE_MIN_MS, quantile: float = HEDGE_QUANTILE):
+        self.name = name
+        self.min_s = min_ms / 1000.0
+        self.quantile = quantile
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=512)
+        self.counters = defaultdict(int)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _record(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def delay_s(self) -> float:
+        with self._lock:
+            latencies = np.asarray(self._latencies)
+        if len(latencies) < 20:
+            return max(self.min_s, 0.2)
+        return max(self.min_s, float(np.quantile(latencies, self.quantile)))
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if not HEDGE_ENABLED:
+            return fn(*args, **kwargs)
+        t0 = time.monotonic()
+        self._count("calls")
+        # the caller only waits on a pool worker when another idle worker could take the hedge
+        primary = _submit_if_idle(fn, *args, **kwargs)
+        if primary is None:
+            self._count("inline")
+            result = fn(*args, **kwargs)
+            self._record(time.monotonic() - t0)
+            return result
+        done, _ = wait([primary], timeout=self.delay_s())
+        if not done:
+            hedge = _submit_if_idle(fn, *args, **kwargs)
+            if hedge is None:
+                self._count("hedge_skipped_busy")
+            else:
+                self._count("hedged")
+                pending, error = {primary, hedge}, None
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        if f.exception() is None:
+                            if f is hedge:
+                                self._count("hedge_won")
+                            self._record(time.monotonic() - t0)
+                            return f.result()
+                        error = f.exception()
+                raise error
+        result = primary.result()
+        self._record(time.monotonic() - t0)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return {"enabled": HEDGE_ENABLED, "delay_ms": round(self.delay_s() * 1000.0, 1), **counters}
+
+# ---------- 5. shared instances ----------
+db_breaker = CircuitBreaker("database")
+llm_breaker = CircuitBreaker("llm")
+db_guard = Guard("database", db_breaker, is_transient_db_error,
+                 DB_RETRY_ATTEMPTS, DB_RETRY_BASE_MS, DB_RETRY_MAX_MS, DB_DEADLINE_S)
+llm_guard = Guard("llm", llm_breaker, is_transient_llm_error,
+                  LLM_RETRY_ATTEMPTS, LLM_RETRY_BASE_MS, LLM_RETRY_MAX_MS, LLM_DEADLINE_S,
+                  attempt_timeout_s=LLM_TIMEOUT_S, timeout_kw="timeout")
+profile_reads = Hedger("profile_read")
+
+def stats() -> Dict[str, Any]:
+    return {"breakers": {b.name: b.snapshot() for b in (db_breaker, llm_breaker)},
+            "retries": {g.name: g.snapshot() for g in (db_guard, llm_guard)},
+            "hedging": {profile_reads.name: profile_reads.snapshot()}}
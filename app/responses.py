@@ -0,0 +1,136 @@
+# app/responses.py  (orjson responses, negotiated gzip/brotli compression, ETag helpers)
+#
+# ORJSONResponse is the app's default response class. Endpoints on the hot path return it
+# directly: FastAPI then skips jsonable_encoder, which costs far more than the encoding itself
+# (bench/serialization.py). brotli is optional; without it only gzip is offered. A compressed
+# response is a different representation, so its ETag gets a per-encoding suffix ("abc-gzip");
+# if_none_match strips it again, so handlers only ever compare their own identity tags.
+import os
+import gzip
+import hashlib
+import logging
+from typing import Any, Callable, Dict, Optional
+import orjson
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "1").lower() in ("1", "true", "yes")
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "5"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+# ---------- compression ----------
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """'br' or 'gzip' per Accept-Encoding q-values (br preferred on ties), None if neither is acceptable."""
+    offered = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+    star = offered.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    scored = [(offered.get(c, star), -i, c) for i, c in enumerate(candidates)]
+    q, _, best = max(scored)
+    return best if q > 0 else None
+
+ENCODINGS = ("br", "gzip")
+
+def etag_with_encoding(etag: str, encoding: str) -> str:
+    """'"abc"' -> '"abc-gzip"' (a weak W/ prefix is kept); non-quoted values are left alone."""
+    return etag[:-1] + f'-{encoding}"' if etag.endswith('"') else etag
+
+def strip_encoding(etag: str) -> str:
+    for encoding in ENCODINGS:
+        if etag.endswith(f'-{encoding}"'):
+            return etag[:-len(encoding) - 2] + '"'
+    return etag
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+class CompressionMiddleware:
+    """Compresses single-message responses >= COMPRESS_MIN_BYTES; streamed bodies (NDJSON answers,
+    static files, forms) pass through untouched so their first bytes are not held back."""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESS_ENABLED:
+            return await self.app(scope, receive, send)
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        sent_tags = request_headers.get("if-none-match", "")
+        start: Dict[str, Any] = {}
+
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+                return
+            if not start:
+                return await send(message)
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            etag = headers.get("etag")
+            compressible = headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            if compressible:
+                headers.add_vary_header("Accept-Encoding")
+            if (compressible and not message.get("more_body", False) and len(body) >= self.minimum_size
+                    and "content-encoding" not in headers):
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                if etag:
+                    headers["ETag"] = etag_with_encoding(etag, encoding)
+                message = {"type": "http.response.body", "body": body}
+            elif start["status"] == 304 and etag:
+                # revalidating a compressed copy: answer with the tag the client holds
+                held = etag_with_encoding(etag, encoding)
+                if held.removeprefix("W/") in (t.strip().removeprefix("W/") for t in sent_tags.split(",")):
+                    headers["ETag"] = held
+                headers.add_vary_header("Accept-Encoding")
+            await send(dict(start))
+            start.clear()
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+# ---------- ETags ----------
+def etag_for(*parts: Any) -> str:
+    return '"' + hashlib.sha1("\x1f".join(map(str, parts)).encode("utf-8")).hexdigest()[:20] + '"'
+
+def if_none_match(request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [strip_encoding(t.strip().removeprefix("W/")) for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+def conditional(request, etag: str, build: Callable[[], Any], cache_control: str = "private, no-cache") -> Response:
+    """304 if the client already has `etag`, else the JSON from build() with ETag + Cache-Control."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(build(), headers=headers)
@@ -1,15 +1,25 @@
-from fastapi import APIRouter, Depends, Body, HTTPException, Query
+from fastapi import APIRouter, Depends, Body, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import BaseModel
 from typing import Optional
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
 from .agent import run_agent
 from .database import get_db
-from .search import retrieve as _retrieve
-from .llm import answer
+from .search import retrieve as _retrieve, served_from_cache
+from .rerank import context_k
+from .llm import answer, answer_stream
 from .db_retry import retry_db
 from .models import UserProfile
+from .admission import llm_gate, priority_for, Overloaded, LLM_SHED_MODE, overloaded_response, degraded_answer, SlotStream
+from .singleflight import llm_flight, fingerprint, normalize_text
+from .resilience import profile_reads
+from . import recommendations, conversation, profile_vectors, prewarm, suggest
+from .actions import form_store, iter_form
+from .responses import ORJSONResponse, conditional, etag_for
+import json
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,6 +31,16 @@ router = APIRouter()
 async def options_handler(path: str):
     return JSONResponse(status_code=200, content={"message": "OK"})
 
+@router.get("/ready")
+async def readiness():
+    """Readiness probe: 503 until a pre-warm run has completed its required steps."""
+    status = prewarm.status()
+    failed = status.get("failed", [])        # best-effort steps once ready; required ones while not
+    if status["ready"]:
+        return {"ready": True, "duration_s": status.get("duration_s"), "failed": failed}
+    return JSONResponse(status_code=503, content={"ready": False, "status": status["status"], "failed": failed},
+                        headers={"Retry-After": "5"})
+
 class QueryRequest(BaseModel):
     q: str
     session_id: Optional[str] = None
@@ -50,57 +70,86 @@ class ProfileRequest(BaseModel):
     pension_status: Optional[bool] = None
     health_needs: Optional[bool] = None
 
+def _load_profile(bind, session_id: str) -> Optional[UserProfile]:
+    # own session per call: the hedged copy runs concurrently with the first
+    with Session(bind=bind, expire_on_commit=False) as s:
+        return s.query(UserProfile).filter(UserProfile.session_id == session_id).first()
+
+@retry_db
+def read_profile(db: Session, session_id: str) -> Optional[UserProfile]:
+    """Profile lookup for read-only endpoints: retried, and hedged when slower than the recent p95."""
+    return profile_reads.call(_load_profile, db.get_bind(), session_id)
+
+def _query_context(request: QueryRequest, db: Session):
+    """(chunks, LLM context personalised if a profile exists, whether retrieval was a cache hit)."""
+    q = request.q
+    
+    # Get user profile for search personalization
+    user_profile = None
+    profile = None
+    if request.session_id:
+        profile = read_profile(db, request.session_id)
+        if profile:
+            user_profile = profile.to_dict()
+            logger.info(f"Using profile-enhanced search for session: {request.session_id}")
+    
+    # Use profile-enhanced search
+    hits = safe_retrieve(q, k=context_k(3), db=db, user_profile=user_profile)
+    cached = served_from_cache()
+    context = "\n\n---\n\n".join([h["content"] for h in hits]) if hits else ""
+    
+    # ADD PERSONALIZATION CONTEXT for LLM
+    if profile:
+        profile_context = f"""
+        USER PROFILE FOR PERSONALIZATION:
+        - State: {profile.state}
+        - Gender: {profile.gender}
+        - Social Category: {profile.social_category}
+        - Annual Income: {profile.annual_income}
+        - Has Disability: {profile.has_disability}
+        - Occupation: {profile.occupation}
+        - Education Level: {profile.education_level}
+        - Field of Study: {profile.field_of_study}
+        - Grades: {profile.grades}
+        - Land Ownership: {profile.land_ownership}
+        - Land Size: {profile.land_size}
+        - Crop Type: {profile.crop_type}
+        - Business Type: {profile.business_type}
+        - Business Needs: {profile.business_needs}
+        - Highest Education: {profile.highest_education}
+        - Employment Seeking: {profile.employment_seeking}
+        - Pension Status: {profile.pension_status}
+        - Health Needs: {profile.health_needs}
+        """
+        context = profile_context + "\n\n" + context
+    return hits, context, cached
+
+def _admitted_answer(session_id: Optional[str], q: str, context: str, cached: bool = False) -> str:
+    with llm_gate.slot(session_id, priority_for(len(context), cached)):
+        return answer(q, context)
+
 @router.post("/query")
 def query(request: QueryRequest, db: Session = Depends(get_db)):
     try:
         q = request.q
-        
-        # Get user profile for search personalization
-        user_profile = None
-        if request.session_id:
-            profile = db.query(UserProfile).filter(UserProfile.session_id == request.session_id).first()
-            if profile:
-                user_profile = profile.to_dict()
-                logger.info(f"Using profile-enhanced search for session: {request.session_id}")
-        
-        # Use profile-enhanced search
-        hits = safe_retrieve(q, k=3, db=db, user_profile=user_profile)
-        context = "\n\n---\n\n".join([h["content"] for h in hits]) if hits else ""
-        
-        # ADD PERSONALIZATION CONTEXT for LLM
-        if request.session_id:
-            profile = db.query(UserProfile).filter(UserProfile.session_id == request.session_id).first()
-            if profile:
-                profile_context = f"""
-                USER PROFILE FOR PERSONALIZATION:
-                - State: {profile.state}
-                - Gender: {profile.gender}
-                - Social Category: {profile.social_category}
-                - Annual Income: {profile.annual_income}
-                - Has Disability: {profile.has_disability}
-                - Occupation: {profile.occupation}
-                - Education Level: {profile.education_level}
-                - Field of Study: {profile.field_of_study}
-                - Grades: {profile.grades}
-                - Land Ownership: {profile.land_ownership}
-                - Land Size: {profile.land_size}
-                - Crop Type: {profile.crop_type}
-                - Business Type: {profile.business_type}
-                - Business Needs: {profile.business_needs}
-                - Highest Education: {profile.highest_education}
-                - Employment Seeking: {profile.employment_seeking}
-                - Pension Status: {profile.pension_status}
-                - Health Needs: {profile.health_needs}
-                """
-                context = profile_context + "\n\n" + context
-
-        reply = answer(q, context)
+        hits, context, cached = _query_context(request, db)
 
-        return {
-            "answer": reply,
+        response = {
             "sources": [h["source"] for h in hits],
             "matches": [{"id": h["id"], "title": h["title"]} for h in hits],
         }
+        try:
+            # identical concurrent prompts share one completion (and one admission slot)
+            key = fingerprint("query", normalize_text(q), context)
+            reply = llm_flight.do(key, _admitted_answer, request.session_id, q, context, cached)
+        except Overloaded as e:
+            if LLM_SHED_MODE != "degrade":
+                return overloaded_response(e)
+            return ORJSONResponse({"answer": degraded_answer(hits), "degraded": True, **response})
+
+        return ORJSONResponse({"answer": reply, **response})
+    except Overloaded as e:
+        return overloaded_response(e)
     except SQLAlchemyError as e:
         logger.error(f"Database error in query: {e}")
         raise HTTPException(status_code=500, detail="Database connection error")
@@ -108,8 +157,67 @@ def query(request: QueryRequest, db: Session = Depends(get_db)):
         logger.error(f"Error in query: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@retry_db
+def _open_answer_stream(session_id: Optional[str], q: str, context: str, cached: bool = False) -> SlotStream:
+    # take the slot on the request thread so a shed request still gets a 429/503 status; SlotStream
+    # gives it back even if the client drops before the first delta is pulled
+    return SlotStream(llm_gate, session_id, priority_for(len(context), cached), lambda: answer_stream(q, context))
+
+@router.get("/suggest")
+async def suggest_names(
+    q: str = Query(..., max_length=100, description="What the user has typed so far"),
+    limit: int = Query(suggest.SUGGEST_LIMIT, ge=1, le=20)
+):
+    """Scheme / title autocomplete from the in-memory prefix index (no embedding, no LLM, no DB session)."""
+    t0 = time.perf_counter()
+    idx = suggest.ready()
+    if idx is None:
+        # cold or stale index: the rebuild reads the corpus, keep it off the event loop
+        idx = await run_in_threadpool(suggest.refresh)
+    suggestions = idx.lookup(q, limit)
+    return ORJSONResponse({"q": q, "suggestions": suggestions,
+                           "took_ms": round((time.perf_counter() - t0) * 1000, 3)},
+                          headers={"Cache-Control": "public, max-age=60"})
+
+@router.post("/query/stream")
+def query_stream(request: QueryRequest, db: Session = Depends(get_db)):
+    """Like /query, streamed as NDJSON: one line with sources/matches, then {"delta": ...} lines."""
+    try:
+        hits, context, cached = _query_context(request, db)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in query stream: {e}")
+        raise HTTPException(status_code=500, detail="Database connection error")
+    head = {"sources": [h["source"] for h in hits],
+            "matches": [{"id": h["id"], "title": h["title"]} for h in hits]}
+    try:
+        key = fingerprint("query", normalize_text(request.q), context)
+        deltas = llm_flight.stream(key, _open_answer_stream, request.session_id, request.q, context, cached)
+    except Overloaded as e:
+        if LLM_SHED_MODE != "degrade":
+            return overloaded_response(e)
+        deltas, head["degraded"] = iter([degraded_answer(hits)]), True
+
+    def body():
+        yield json.dumps(head) + "\n"
+        for delta in deltas:
+            yield json.dumps({"delta": delta}) + "\n"
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@router.get("/forms/{digest}")
+def download_form(digest: str, request: Request):
+    """Form template by content hash; immutable, so clients and proxies may cache it forever."""
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    body = form_store.get(digest)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Form not found")
+    headers["Content-Disposition"] = f'attachment; filename="scheme_form_{digest[:12]}.json"'
+    headers["Content-Length"] = str(len(body))
+    return StreamingResponse(iter_form(body), media_type="application/json", headers=headers)
+
 def safe_retrieve(*args, **kwargs):
+    # DB retries wrap only the corpus query inside retrieve() (search._load_docs), not embedding/ranking
     return _retrieve(*args, **kwargs)
 
 @router.post("/agent")
@@ -118,7 +226,8 @@ async def agent_endpoint(body: AgentRequest, db: Session = Depends(get_db)):
         # ADD PERSONALIZATION TO AGENT
         user_context = ""
         if body.session_id:
-            profile = db.query(UserProfile).filter(UserProfile.session_id == body.session_id).first()
+            # retries back off with time.sleep and the hedge waits on a future: keep both off the event loop
+            profile = await run_in_threadpool(read_profile, db, body.session_id)
             if profile:
                 user_context = f"""
                 USER PROFILE:
@@ -134,9 +243,11 @@ async def agent_endpoint(body: AgentRequest, db: Session = Depends(get_db)):
                 """
         
         # Pass user context to the agent
-        result = await run_agent(body.question, db, user_context)
-        return result
+        result = await run_agent(body.question, db, user_context, session_id=body.session_id)
+        return ORJSONResponse(result)
         
+    except Overloaded as e:
+        return overloaded_response(e)
     except SQLAlchemyError as e:
         logger.error(f"Database error in agent: {e}")
         raise HTTPException(status_code=500, detail="Database connection error")
@@ -146,7 +257,7 @@ async def agent_endpoint(body: AgentRequest, db: Session = Depends(get_db)):
 
 # ADD THESE PROFILE MANAGEMENT ENDPOINTS
 @router.post("/user/profile")
-async def save_user_profile(
+def save_user_profile(           # sync: the profile-vector write embeds with ONNX, keep it in the threadpool
     request: ProfileRequest,
     db: Session = Depends(get_db)
 ):
@@ -168,6 +279,10 @@ async def save_user_profile(
         
         db.commit()
         db.refresh(profile)
+        try:
+            profile_vectors.warm(profile.to_dict())
+        except Exception as e:   # retrieval falls back to embedding the terms on demand
+            logger.error(f"Error embedding profile vector: {e}")
         
         return {
             "success": True,
@@ -205,12 +320,13 @@ async def save_user_profile(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/user/profile")
-async def get_user_profile(
+def get_user_profile(
+    request: Request,
     session_id: str = Query(..., description="User session ID"),
     db: Session = Depends(get_db)
 ):
     try:
-        profile = db.query(UserProfile).filter(UserProfile.session_id == session_id).first()
+        profile = read_profile(db, session_id)
         
         if not profile:
             return {
@@ -219,37 +335,39 @@ async def get_user_profile(
                 "profile": None
             }
         
-        return {
-            "success": True,
-            "profile": {
-                "session_id": profile.session_id,
-                "state": profile.state,
-                "gender": profile.gender,
-                "social_category": profile.social_category,
-                "annual_income": profile.annual_income,
-                "has_disability": profile.has_disability,
-                "occupation": profile.occupation,
-                "education_level": profile.education_level,
-                "field_of_study": profile.field_of_study,
-                "grades": profile.grades,
-                "land_ownership": profile.land_ownership,
-                "land_size": profile.land_size,
-                "crop_type": profile.crop_type,
-                "business_type": profile.business_type,
-                "business_needs": profile.business_needs,
-                "highest_education": profile.highest_education,
-                "employment_seeking": profile.employment_seeking,
-                "pension_status": profile.pension_status,
-                "health_needs": profile.health_needs,
-                "created_at": profile.created_at.isoformat() if profile.created_at else None,
-                "updated_at": profile.updated_at.isoformat() if profile.updated_at else None
-            }
-        }
+        # keyed on the content: updated_at has second precision, two saves within a second share it
+        data = profile.to_dict()
+        etag = etag_for("profile", data)
+        return conditional(request, etag, lambda: {"success": True, "profile": data})
         
     except SQLAlchemyError as e:
         logger.error(f"Database error fetching profile: {e}")
         raise HTTPException(status_code=500, detail="Database connection error")
 
+@router.get("/user/recommendations")
+def get_user_recommendations(
+    session_id: str = Query(..., description="User session ID"),
+    db: Session = Depends(get_db)
+):
+    """Top schemes precomputed by the offline sweep (python -m app.recommendations)."""
+    try:
+        rows = recommendations.lookup(db, session_id)
+        if not rows:
+            return {
+                "success": False,
+                "message": "No recommendations computed for this profile yet",
+                "recommendations": []
+            }
+        return ORJSONResponse({
+            "success": True,
+            "computed_at": rows[0].computed_at.isoformat() if rows[0].computed_at else None,
+            "recommendations": [r.to_dict() for r in rows]
+        })
+        
+    except SQLAlchemyError as e:
+        logger.error(f"Database error fetching recommendations: {e}")
+        raise HTTPException(status_code=500, detail="Database connection error")
+
 @router.get("/user/profile/exists")
 async def check_profile_exists(
     session_id: str = Query(..., description="User session ID"),
@@ -268,7 +386,7 @@ async def check_profile_exists(
         raise HTTPException(status_code=500, detail="Database connection error")
 
 @router.delete("/user/profile")
-async def delete_user_profile(
+def delete_user_profile(
     session_id: str = Query(..., description="User session ID to delete"),
     db: Session = Depends(get_db)
 ):
@@ -283,6 +401,7 @@ async def delete_user_profile(
         
         db.delete(profile)
         db.commit()
+        conversation.store.forget(session_id)
         
         return {
             "success": True,
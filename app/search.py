@@ -1,15 +1,21 @@
 # app/search.py  (ONNX-based, < 350 MB RAM, batch-size safe)
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 import numpy as np
 from numpy.linalg import norm
+import os
 import json
+import time
 import logging
 import threading
+from functools import lru_cache
 from pathlib import Path
 import onnxruntime as ort
 from transformers import AutoTokenizer
+from .docstore import DocStore
+from . import rerank, segment_cache, singleflight, profile_vectors, dedup, hierarchy
+from .resilience import db_guard
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +39,19 @@ def _embed(texts: list[str]) -> np.ndarray:
     pooled = (outputs * mask[:, :, np.newaxis]).sum(axis=1) / mask.sum(axis=1, keepdims=True)
     return pooled.astype(np.float32)
 
+@lru_cache(maxsize=2048)
+def _embed_query(text: str) -> np.ndarray:
+    """Cached single-query embedding; also lets the classifier reuse the vector retrieve() computed."""
+    vec = _embed([text])[0]
+    vec.setflags(write=False)
+    return vec
+
+def query_vector(query: str, user_profile: Optional[Dict] = None) -> np.ndarray:
+    """The vector retrieve() ranks with for this query and profile (cache hit right after retrieve)."""
+    if user_profile and profile_vectors.enabled():
+        return profile_vectors.personalize(_base_query(query), user_profile)
+    return _embed_query(_enhance_query_for_search(query, user_profile))
+
 # ---------- 2.  your existing helpers ----------
 def _profile_to_search_terms(profile: Optional[Dict]) -> str:
     if not profile:
@@ -73,10 +92,15 @@ def _calculate_content_quality_score(content: str) -> float:
             boost *= mult
     return length_score * penalty * boost
 
-def _enhance_query_for_search(original_query: str, user_profile: Optional[Dict]) -> str:
+def _base_query(original_query: str) -> str:
     enhanced = original_query.lower()
     if "schemes for me" in enhanced:
         enhanced += " specific eligibility criteria benefits application process required documents contact information"
+    return enhanced
+
+def _enhance_query_for_search(original_query: str, user_profile: Optional[Dict]) -> str:
+    """Query text with the profile terms appended (PROFILE_VECTOR_MODE=text)."""
+    enhanced = _base_query(original_query)
     profile_terms = _profile_to_search_terms(user_profile)
     if profile_terms:
         enhanced += " " + profile_terms
@@ -90,44 +114,176 @@ def _cosine_sim_matrix(q: np.ndarray, mat: np.ndarray, mat_norms: np.ndarray) ->
     return dots / (mat_norms * q_norm)
 
 # ---------- 3.  cache + mini-batch embedding ----------
+# local   -> each process embeds the corpus into its own arrays (default)
+# shared  -> one process publishes the index to an mmap file, workers attach zero-copy
+# sharded -> the corpus is partitioned across shard processes/nodes (app/sharding.py)
+INDEX_MODE = os.getenv("INDEX_MODE", "local").lower()
+# local mode: load a prebuilt index (python -m app.index_build --out DIR) instead of embedding at startup
+INDEX_ARTIFACT_DIR = os.getenv("INDEX_ARTIFACT_DIR", "")
+
 _cache_lock = threading.Lock()
-_cached_docs: List[Dict[str, Any]] = []
+_cached_docs: DocStore = DocStore.empty()
 _cached_mat: Optional[np.ndarray] = None
 _cached_norms: Optional[np.ndarray] = None
 _cache_ready = False
+_cache_generation = 0
+_shared_index = None          # keeps the attached mapping alive (shared mode, or a local-mode INDEX_ARTIFACT_DIR)
+_shared_checked_at = 0.0
+_retrieval = threading.local()   # per worker thread: was the last retrieve() a segment-cache hit
+
+def _load_docs(db: Session, where: str = "", params: Optional[Dict[str, Any]] = None) -> DocStore:
+    """All chunks, or one partition of them (`where` is used by the shard workers in app/sharding.py)."""
+    rows = db.execute(text(f"""
+        SELECT id, source_type as source, title, content, chunk_metadata 
+        FROM unified_chunks
+        {"WHERE " + where if where else ""}
+    """), params or {})
+    # rows go straight into the columnar store; no per-chunk dicts are kept
+    docs = DocStore.from_rows(({"id": r.id, "source": r.source, "title": r.title,
+                                "content": r.content, "metadata": r.chunk_metadata} for r in rows),
+                              quality_fn=_calculate_content_quality_score)
+    if dedup.DEDUP_ENABLED and len(docs):
+        # near-duplicates collapse to one canonical chunk before anything is embedded (app/dedup.py)
+        full_bytes = docs.nbytes()
+        docs, report = dedup.collapse(docs)
+        report["bytes_saved"] = full_bytes - docs.nbytes() + report["collapsed"] * 384 * 4
+        dedup.last_report = report
+    return docs
+
+def _embed_corpus(texts: Sequence[str]) -> np.ndarray:
+    if not texts:
+        return np.empty((0, 384), dtype=np.float32)
+    from . import embed_executor
+    if embed_executor.EMBED_BATCHING != "fixed":
+        # length-bucketed batches sized from EMBED_MEMORY_BUDGET_MB (app/embed_executor.py)
+        return embed_executor.embed_corpus(texts)
+    # ---- embed in tiny batches (≤ 16) + gc ----
+    import gc
+    batch_size = 16
+    all_embs = []
+    for i in range(0, len(texts), batch_size):
+        batch = texts[i:i + batch_size]
+        all_embs.append(_embed(batch))
+        gc.collect()          # free ONNX intermediate tensors
+    return np.vstack(all_embs)
+
+def _load_docs_guarded(db: Session) -> DocStore:
+    """_load_docs behind the DB retry policy / breaker; only the query is guarded, never the embedding."""
+    def load():
+        try:
+            return _load_docs(db)
+        except Exception:
+            db.rollback()       # a failed statement leaves the session unusable for the retry
+            raise
+    return db_guard.call(load)
+
+def _build_index(db: Session):
+    docs = _load_docs_guarded(db)
+    embs = _embed_corpus(docs.contents)
+    norms = np.linalg.norm(embs, axis=1).astype(np.float32)
+    return docs, embs, norms
+
+def corpus_fingerprint(db) -> str:
+    """Row count, max id and total content length of unified_chunks, plus DEDUP_ENABLED: one aggregate query."""
+    count, max_id, length = db.execute(text("SELECT COUNT(*), MAX(id), SUM(LENGTH(content)) FROM unified_chunks")).one()
+    return f"{count}:{max_id}:{length}:{int(dedup.DEDUP_ENABLED)}"
+
+def index_fingerprint(db) -> Dict[str, str]:
+    """What a published index must have been built from to be served as is (app/shared_index.py meta)."""
+    from .index_build import model_fingerprint
+    return {"model": model_fingerprint(), "corpus": corpus_fingerprint(db)}
 
 def _build_cache(db: Session) -> None:
-    global _cached_docs, _cached_mat, _cached_norms, _cache_ready
+    global _cached_docs, _cached_mat, _cached_norms, _cache_ready, _cache_generation
+    global _shared_index, _shared_checked_at
     with _cache_lock:
         if _cache_ready:
             return
-        rows = db.execute(text("""
-            SELECT id, source_type as source, title, content, chunk_metadata 
-            FROM unified_chunks
-        """)).fetchall()
-        docs = [{"id": r.id, "source": r.source, "title": r.title,
-                 "content": r.content, "metadata": r.chunk_metadata} for r in rows]
-        if not docs:
-            _cached_docs, _cached_mat, _cached_norms, _cache_ready = [], np.empty((0, 384), dtype=np.float32), np.empty(0, dtype=np.float32), True
+        if INDEX_MODE == "shared":
+            from . import shared_index
+            idx = shared_index.attach_or_build(lambda: _build_index(db), fingerprint=index_fingerprint(db))
+            _shared_index, _shared_checked_at = idx, time.monotonic()
+            _cached_docs, _cached_mat, _cached_norms = idx.docs, idx.mat, idx.norms
+            _cache_generation, _cache_ready = idx.generation, True
             return
 
-        # ---- embed in tiny batches (≤ 16) + gc ----
-        import gc
-        batch_size = 16
-        all_embs = []
-        texts = [d["content"] for d in docs]
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            all_embs.append(_embed(batch))
-            gc.collect()          # free ONNX intermediate tensors
-        embs = np.vstack(all_embs)
-        norms = np.linalg.norm(embs, axis=1)
-
+        idx = None
+        if INDEX_ARTIFACT_DIR:
+            from .index_build import load_artifact
+            idx = load_artifact(INDEX_ARTIFACT_DIR)      # None if missing or built with another model
+        if idx is not None:
+            _shared_index = idx
+            docs, embs, norms = idx.docs, idx.mat, idx.norms
+        else:
+            docs, embs, norms = _build_index(db)
         _cached_docs, _cached_mat, _cached_norms, _cache_ready = docs, embs, norms, True
+        _cache_generation += 1
+
+def _maybe_swap_shared() -> None:
+    """Hot-swap to a newer published generation (checked at most every SHARED_INDEX_POLL_S)."""
+    global _cached_docs, _cached_mat, _cached_norms, _cache_generation, _shared_index, _shared_checked_at
+    from . import shared_index
+    now = time.monotonic()
+    if now - _shared_checked_at < shared_index.POLL_S:
+        return
+    _shared_checked_at = now
+    gen = shared_index.current_generation()
+    if gen is None or gen == _cache_generation:
+        return
+    with _cache_lock:
+        if gen == _cache_generation:
+            return
+        idx = shared_index.attach(gen)
+        # one tuple assignment per name; in-flight queries keep the arrays they already read
+        _shared_index = idx
+        _cached_docs, _cached_mat, _cached_norms, _cache_generation = idx.docs, idx.mat, idx.norms, idx.generation
+        logger.info(f"Attached shared index generation {gen} ({len(idx.docs)} chunks)")
 
 def _ensure_cache(db: Session) -> None:
     if not _cache_ready:
         _build_cache(db)
+    elif INDEX_MODE == "shared":
+        _maybe_swap_shared()
+
+def index_generation() -> int:
+    """Generation of the index currently served (bumps on every rebuild / shared swap)."""
+    return _cache_generation
+
+_id_order: tuple = (None, None)   # (generation, argsort of docs.ids)
+
+def _rows_for_ids(ids: Sequence[int]):
+    """(docs, mat, rows) for the given chunk ids in input order; ids not in the current index are skipped."""
+    global _id_order
+    with _cache_lock:
+        docs, mat, generation = _cached_docs, _cached_mat, _cache_generation
+    if mat is None or not len(ids):
+        return docs, mat, np.empty(0, dtype=np.int64)
+    if _id_order[0] != generation:
+        _id_order = (generation, np.argsort(docs.ids, kind="stable"))
+    order = _id_order[1]
+    sorted_ids = docs.ids[order]
+    ids = np.asarray(ids, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return docs, mat, order[pos[sorted_ids[pos] == ids]]
+
+def chunk_vectors(ids: Sequence[int]) -> np.ndarray:
+    """Index embeddings of the given chunk ids (ids not in the current index are skipped)."""
+    _, mat, rows = _rows_for_ids(ids)
+    if mat is None:
+        return np.empty((0, 384), dtype=np.float32)
+    return np.asarray(mat[rows])
+
+def chunks_by_id(ids: Sequence[int]) -> List[Dict[str, Any]]:
+    """Chunk dicts for the given ids, in the given order, from the in-memory index (no DB)."""
+    docs, _, rows = _rows_for_ids(ids)
+    return [docs[i] for i in rows]
+
+def invalidate_cache() -> None:
+    """Drop the in-memory index so the next retrieve() rebuilds it from the DB."""
+    global _cached_docs, _cached_mat, _cached_norms, _cache_ready, _shared_index
+    with _cache_lock:
+        _cached_docs, _cached_mat, _cached_norms, _cache_ready = DocStore.empty(), None, None, False
+        _shared_index = None
 
 # ---------- 4.  retrieve (signature identical) ----------
 def retrieve(query: str,
@@ -140,48 +296,150 @@ def retrieve(query: str,
         raise ValueError("Query cannot be empty")
     if k <= 0:
         raise ValueError("k must be positive")
+    _retrieval.cached = False
+    if INDEX_MODE == "sharded":
+        from . import sharding
+        return sharding.retrieve(query, k, user_profile)
 
     _ensure_cache(db)
-    if _cached_mat is None or _cached_mat.shape[0] == 0:
+    with _cache_lock:
+        # consistent snapshot: a shared-index swap may replace all three at once
+        docs, mat, mat_norms, generation = _cached_docs, _cached_mat, _cached_norms, _cache_generation
+    if mat is None or mat.shape[0] == 0:
         return []
 
-    enhanced_query = _enhance_query_for_search(query, user_profile)
-    logger.info(f"Enhanced query: '{enhanced_query}'")
+    segment = segment_cache.segment_of(user_profile)
+    if segment_cache.SEGMENT_CACHE_ENABLED:
+        rows = segment_cache.cache.get(segment, query, k, generation)
+        if rows is not None:
+            _retrieval.cached = True
+            return [docs[i] for i in rows]
+
+    # identical concurrent queries from the same segment rank identically: compute once
+    key = singleflight.fingerprint(generation, segment, segment_cache.normalize_query(query), k)
+    final_rows, fallback = singleflight.retrieval_flight.do(key, _rank, query, k, user_profile, docs, mat, mat_norms)
+    if segment_cache.SEGMENT_CACHE_ENABLED and not fallback:
+        # an over-budget re-rank is heuristic order: serve it, but let the next request re-rank
+        segment_cache.cache.put(segment, query, k, generation, final_rows)
+    return [docs[i] for i in final_rows]
+
+def served_from_cache() -> bool:
+    """Whether this thread's last retrieve() was answered by the segment cache (admission priority)."""
+    return getattr(_retrieval, "cached", False)
+
+def retrieve_near(query: str,
+                  q_vec: np.ndarray,
+                  k: int = 5,
+                  db: Session | None = None,
+                  user_profile: Optional[Dict] = None) -> List[Dict[str, Any]]:
+    """retrieve() ranked with a caller-supplied query vector (e.g. blended with earlier turns).
+
+    The query text is still used by the cross-encoder. Bypasses the segment cache: the vector is per-conversation.
+    """
+    if db is None:
+        raise ValueError("Database session required")
+    if k <= 0:
+        raise ValueError("k must be positive")
+    if INDEX_MODE == "sharded":
+        from . import sharding
+        return sharding.retrieve(query, k, user_profile, q_vec=q_vec)
+
+    _ensure_cache(db)
+    with _cache_lock:
+        docs, mat, mat_norms = _cached_docs, _cached_mat, _cached_norms
+    if mat is None or mat.shape[0] == 0:
+        return []
+    return [docs[i] for i in _rank_rows(query, k, user_profile, docs, mat, mat_norms, q_vec=q_vec)]
 
-    q_vec = _embed([enhanced_query])[0]
-    sims = _cosine_sim_matrix(q_vec, _cached_mat, _cached_norms)
+def _candidates(q_vec: np.ndarray, k: int, user_profile: Optional[Dict],
+                docs: DocStore, mat: np.ndarray, mat_norms: np.ndarray,
+                rows: Optional[np.ndarray] = None):
+    """Top k*3 rows by cosine (among `rows` if given), with their sims, profile boosts and heuristic final scores."""
+    if rows is None:
+        sims = _cosine_sim_matrix(q_vec, mat, mat_norms)
+    else:
+        sims = _cosine_sim_matrix(q_vec, mat[rows], mat_norms[rows])
 
     top_k_candidates = min(len(sims), k * 3)
-    top_idx = np.argsort(sims)[-top_k_candidates:][::-1]
-
-    scored_results = []
-    for i in top_idx:
-        chunk = _cached_docs[i]
-        similarity_score = sims[i]
-        quality_score = _calculate_content_quality_score(chunk['content'])
-
-        # profile boost (your original logic)
-        profile_boost = 1.0
-        if user_profile:
-            metadata = chunk.get('metadata', {})
-            if isinstance(metadata, str):
-                try:
-                    metadata = json.loads(metadata)
-                except Exception:
-                    metadata = {}
-            if user_profile.get('state') and metadata.get('level') == 'State':
-                profile_boost *= 1.3
-            if user_profile.get('occupation') == 'student' and 'education' in str(metadata.get('category', '')).lower():
-                profile_boost *= 2.0
-
-        final_score = similarity_score * quality_score * profile_boost
-        scored_results.append({'chunk': chunk, 'final_score': final_score})
-
-    scored_results.sort(key=lambda x: x['final_score'], reverse=True)
-    final_results = [res['chunk'] for res in scored_results[:k]]
-
-    logger.info(f"Top {min(3, len(final_results))} results:")
-    for i, res in enumerate(final_results[:3]):
-        logger.info(f"  {i+1}. Score: {scored_results[i]['final_score']:.3f} - {res['content'][:100]}...")
-    return final_results
+    top_local = np.argsort(sims)[-top_k_candidates:][::-1]
+    top_sims = sims[top_local]
+    top_idx = top_local if rows is None else rows[top_local]
+
+    # ---- re-rank on the columns; only the final k rows become dicts ----
+    quality = docs.quality[top_idx]
+    profile_boost = np.ones(len(top_idx), dtype=np.float32)
+    if user_profile:
+        if user_profile.get('state'):
+            profile_boost[docs.columns['level'][top_idx] == docs.code('level', 'State')] *= 1.3
+        if user_profile.get('occupation') == 'student':
+            edu = docs.table_mask('category', lambda c: 'education' in str(c if c is not None else '').lower())
+            profile_boost[edu[docs.columns['category'][top_idx]]] *= 2.0
+
+    final_scores = top_sims * quality * profile_boost
+    return top_idx, top_sims, profile_boost, final_scores
+
+def _cross_encoder_scores(query: str, contents: Sequence[str], profile_boost: np.ndarray) -> Optional[np.ndarray]:
+    ce = rerank.score(query, list(contents))
+    if ce is None:
+        return None
+    return (1.0 / (1.0 + np.exp(-ce))) * profile_boost[:len(contents)]
+
+def retrieve_batch(query: str,
+                   profiles: Sequence[Optional[Dict]],
+                   k: int = 5,
+                   db: Session | None = None) -> List[List[Dict[str, Any]]]:
+    """retrieve() for one query under many profiles, embedding all enhanced queries in one ONNX call.
+
+    Bypasses the segment cache and single-flight: meant for offline sweeps, not the request path.
+    """
+    if db is None:
+        raise ValueError("Database session required")
+    _ensure_cache(db)
+    with _cache_lock:
+        docs, mat, mat_norms = _cached_docs, _cached_mat, _cached_norms
+    if mat is None or mat.shape[0] == 0 or not profiles:
+        return [[] for _ in profiles]
+    if profile_vectors.enabled():
+        q_vecs = profile_vectors.personalize_batch(_base_query(query), profiles)
+    else:
+        q_vecs = _embed([_enhance_query_for_search(query, p) for p in profiles])
+    return [[docs[i] for i in _rank_rows(query, k, p, docs, mat, mat_norms, q_vec=v)]
+            for p, v in zip(profiles, q_vecs)]
+
+def _rank_rows(query: str, k: int, user_profile: Optional[Dict],
+               docs: DocStore, mat: np.ndarray, mat_norms: np.ndarray,
+               q_vec: Optional[np.ndarray] = None) -> np.ndarray:
+    return _rank(query, k, user_profile, docs, mat, mat_norms, q_vec)[0]
+
+def _rank(query: str, k: int, user_profile: Optional[Dict],
+          docs: DocStore, mat: np.ndarray, mat_norms: np.ndarray,
+          q_vec: Optional[np.ndarray] = None):
+    """(final rows, fallback): fallback is True when the cross-encoder was on but did not score them."""
+    fallback = False
+    if q_vec is None:
+        q_vec = query_vector(query, user_profile)
+    tree = rows = None
+    if hierarchy.enabled():
+        # stage 1: best scheme/section centroids; stage 2 below scores only their chunks (app/hierarchy.py)
+        tree, rows = hierarchy.candidate_rows(q_vec, k, docs, mat, mat_norms)
+    top_idx, _, profile_boost, final_scores = _candidates(q_vec, k, user_profile, docs, mat, mat_norms, rows)
+    if rerank.enabled():
+        # cross-encoder replaces the quality heuristic; None means over budget -> keep heuristic
+        n = min(len(top_idx), max(k, rerank.RERANK_MAX_CANDIDATES))
+        ce_scores = _cross_encoder_scores(query, [docs.contents[i] for i in top_idx[:n]], profile_boost)
+        if ce_scores is not None:
+            top_idx, final_scores = top_idx[:n], ce_scores
+        else:
+            fallback = True
+    order = np.argsort(-final_scores, kind="stable")
+    if tree is not None:
+        order = hierarchy.diversify(order, tree.groups[top_idx[order]], k, hierarchy.HIER_MAX_PER_GROUP)
+    order = order[:k]
+    final_rows = top_idx[order]
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Top {min(3, len(final_rows))} results:")
+        for i, row in enumerate(final_rows[:3]):
+            logger.debug(f"  {i+1}. Score: {final_scores[order[i]]:.3f} - {docs.contents[row][:100]}...")
+    return final_rows, fallback
 
@@ -0,0 +1,127 @@
+# app/segment_cache.py  (retrieve() results cached per profile segment, invalidated by index generation)
+import os
+import threading
+import logging
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_CACHE_ENABLED = os.getenv("SEGMENT_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+SEGMENT_CACHE_SIZE = int(os.getenv("SEGMENT_CACHE_SIZE", "4096"))
+SEGMENT_STATS_MAX = int(os.getenv("SEGMENT_STATS_MAX", "256"))     # segments with their own hit/miss counters
+SEGMENT_WARM_QUERIES = [q for q in os.getenv("SEGMENT_WARM_QUERIES", "schemes for me").split("|") if q.strip()]
+
+Segment = Tuple[str, bool, bool]
+OTHER_SEGMENTS: Segment = ("(other segments)", False, False)     # counters for segments past SEGMENT_STATS_MAX
+
+def segment_of(profile: Optional[Dict[str, Any]]) -> Segment:
+    """Project a profile onto exactly what retrieve() ranks with.
+
+    The profile reaches ranking only through the appended search terms and two boosts
+    (any state -> State-level boost, occupation == 'student' -> education boost), so two
+    profiles with the same projection always get the same results for the same query.
+    """
+    from .search import _profile_to_search_terms
+    if not profile:
+        return ("", False, False)
+    return (_profile_to_search_terms(profile), bool(profile.get("state")), profile.get("occupation") == "student")
+
+def segment_label(segment: Segment) -> str:
+    return segment[0] or "(no profile)"
+
+def normalize_query(query: str) -> str:
+    # the embedding tokenizer is uncased and whitespace-split, so this is ranking-neutral
+    return " ".join(query.lower().split())
+
+class SegmentCache:
+    """LRU of (segment, query, k) -> row positions in the DocStore of one index generation."""
+
+    def __init__(self, maxsize: int = SEGMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, List[int]]" = OrderedDict()
+        self._generation: Optional[int] = None
+        self._stats: Dict[Segment, List[int]] = {}                  # segment -> [hits, misses], bounded
+
+    def _count(self, segment: Segment, hit: bool) -> None:
+        counts = self._stats.get(segment)
+        if counts is None:
+            if len(self._stats) >= SEGMENT_STATS_MAX:
+                segment = OTHER_SEGMENTS
+            counts = self._stats.setdefault(segment, [0, 0])
+        counts[0 if hit else 1] += 1
+
+    def _check_generation(self, generation: int) -> None:
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, segment: Segment, query: str, k: int, generation: int) -> Optional[List[int]]:
+        key = (segment, normalize_query(query), k)
+        with self._lock:
+            self._check_generation(generation)
+            rows = self._entries.get(key)
+            if rows is None:
+                self._count(segment, hit=False)
+                return None
+            self._entries.move_to_end(key)
+            self._count(segment, hit=True)
+            return rows
+
+    def put(self, segment: Segment, query: str, k: int, generation: int, rows: Sequence[int]) -> None:
+        """Callers must not put degraded results (e.g. a re-rank that fell back to heuristic order)."""
+        key = (segment, normalize_query(query), k)
+        with self._lock:
+            self._check_generation(generation)
+            self._entries[key] = [int(r) for r in rows]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            per_segment = []
+            for seg, (hits, misses) in self._stats.items():
+                per_segment.append({"segment": segment_label(seg), "hits": hits, "misses": misses,
+                                    "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0})
+            per_segment.sort(key=lambda s: s["hits"] + s["misses"], reverse=True)
+            hits, misses = sum(c[0] for c in self._stats.values()), sum(c[1] for c in self._stats.values())
+            return {"enabled": SEGMENT_CACHE_ENABLED, "generation": self._generation,
+                    "entries": len(self._entries), "maxsize": self.maxsize,
+                    "hits": hits, "misses": misses,
+                    "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                    "segments": per_segment}
+
+cache = SegmentCache()
+
+def popular_segments(db, top_n: int = 20) -> List[Tuple[Dict[str, Any], int]]:
+    """Most common segments among stored profiles, with one representative profile each."""
+    from .models import UserProfile
+    counts: Counter = Counter()
+    representative: Dict[Segment, Dict[str, Any]] = {}
+    for p in db.query(UserProfile).yield_per(1000):
+        profile = p.to_dict()
+        seg = segment_of(profile)
+        counts[seg] += 1
+        representative.setdefault(seg, profile)
+    return [(representative[seg], n) for seg, n in counts.most_common(top_n)]
+
+def warm(db, queries: Optional[List[str]] = None, top_n: int = 20, k_values: Sequence[int] = (3, 5)) -> Dict[str, Any]:
+    """Precompute results for the popular segments x common queries."""
+    from .search import retrieve
+    queries = queries or SEGMENT_WARM_QUERIES
+    segments = popular_segments(db, top_n) + [(None, 0)]
+    computed = 0
+    for profile, _ in segments:
+        for q in queries:
+            for k in k_values:
+                retrieve(q, k=k, db=db, user_profile=profile)
+                computed += 1
+    logger.info(f"Warmed segment cache: {len(segments)} segments x {len(queries)} queries")
+    return {"segments": [segment_label(segment_of(p)) for p, _ in segments], "queries": queries,
+            "computed": computed}
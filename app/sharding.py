@@ -0,0 +1,359 @@
+# app/sharding.py  (INDEX_MODE=sharded: corpus partitioned across shard processes, scatter-gather retrieve)
+#
+# Local: the first retrieve() spawns SHARD_COUNT shard processes on 127.0.0.1:SHARD_BASE_PORT+i.
+# Other uvicorn workers find the ports taken and simply connect to the same shards; only the worker whose
+# spawned process bound a port stops that shard at exit.
+# Remote: start one shard per node and list them in SHARD_NODES:
+#   python -m app.sharding serve --shard 0 --of 2 --host 0.0.0.0 --port 7700     (node A)
+#   python -m app.sharding serve --shard 1 --of 2 --host 0.0.0.0 --port 7700     (node B)
+#   INDEX_MODE=sharded SHARD_NODES=nodeA:7700,nodeB:7700 SHARD_AUTHKEY=... uvicorn app.main:app
+# Messages are pickled over multiprocessing.connection with HMAC auth: keep shards on a private network.
+# Unpickling a request runs code, so the key is a secret: `serve` and SHARD_NODES refuse to run without
+# SHARD_AUTHKEY. Spawned local shards (127.0.0.1 only) share a random key from an owner-only file instead.
+import os
+import time
+import stat
+import secrets
+import tempfile
+import heapq
+import queue
+import atexit
+import logging
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "2"))
+SHARD_BY = os.getenv("SHARD_BY", "id").lower()                # id -> contiguous id ranges, source -> source_type
+SHARD_NODES = [n.strip() for n in os.getenv("SHARD_NODES", "").split(",") if n.strip()]
+SHARD_HOST = os.getenv("SHARD_HOST", "127.0.0.1")
+SHARD_BASE_PORT = int(os.getenv("SHARD_BASE_PORT", "7700"))
+SHARD_AUTHKEY = os.getenv("SHARD_AUTHKEY", "")               # required for `serve` / SHARD_NODES; no default
+SHARD_TIMEOUT_MS = float(os.getenv("SHARD_TIMEOUT_MS", "2000"))
+SHARD_START_TIMEOUT_S = float(os.getenv("SHARD_START_TIMEOUT_S", "600"))
+
+Address = Tuple[str, int]
+
+def _local_key_path() -> str:
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(tempfile.gettempdir(), f"neethi-shards-{uid}-{SHARD_BASE_PORT}.key")
+
+def authkey(local: bool) -> bytes:
+    """SHARD_AUTHKEY, or for spawned loopback shards a random key shared by this user's app workers."""
+    if SHARD_AUTHKEY:
+        return SHARD_AUTHKEY.encode()
+    if not local or SHARD_HOST not in ("127.0.0.1", "localhost", "::1"):
+        raise RuntimeError("SHARD_AUTHKEY must be set for shards reachable beyond localhost "
+                           "(shard RPC unpickles requests; a known key means code execution)")
+    path = _local_key_path()
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        st = os.stat(path)
+        if (hasattr(os, "getuid") and st.st_uid != os.getuid()) or st.st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+            raise RuntimeError(f"{path} is not private to this user; remove it or set SHARD_AUTHKEY")
+        for _ in range(50):              # another worker may be between create and write
+            with open(path, "rb") as f:
+                key = f.read().strip()
+            if key:
+                return key
+            time.sleep(0.1)
+        raise RuntimeError(f"{path} is empty; remove it or set SHARD_AUTHKEY")
+    key = secrets.token_hex(32).encode()
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+# ---------- 1. partitioning ----------
+def partition(db, shard: int, of: int, by: str = SHARD_BY) -> Tuple[str, Dict[str, Any]]:
+    """SQL filter selecting this shard's chunks."""
+    from sqlalchemy import text
+    if by == "source":
+        sources = sorted(r[0] for r in db.execute(text("SELECT DISTINCT source_type FROM unified_chunks")))
+        mine = [s for i, s in enumerate(sources) if i % of == shard] or ["\x00"]
+        names = ", ".join(f":s{i}" for i in range(len(mine)))
+        return f"source_type IN ({names})", {f"s{i}": s for i, s in enumerate(mine)}
+    lo, hi = db.execute(text("SELECT MIN(id), MAX(id) FROM unified_chunks")).one()
+    lo, hi = lo or 0, (hi or 0) + 1
+    step = -(-(hi - lo) // of)
+    return "id >= :lo AND id < :hi", {"lo": lo + shard * step, "hi": lo + (shard + 1) * step}
+
+# ---------- 2. shard server ----------
+class ShardServer:
+    """Owns one partition (DocStore + embedding matrix) and answers candidate searches for it."""
+
+    def __init__(self, shard: int, of: int, by: str = SHARD_BY):
+        self.shard, self.of, self.by = shard, of, by
+        self.generation = 0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> Dict[str, Any]:
+        from .database import SessionLocal
+        from . import search
+        t0 = time.perf_counter()
+        with SessionLocal() as db:
+            where, params = partition(db, self.shard, self.of, self.by)
+            # dedup sees this partition only: with SHARD_BY=id, cross-shard near-duplicates survive
+            docs = search._load_docs(db, where, params)
+        mat = search._embed_corpus(docs.contents)
+        norms = np.linalg.norm(mat, axis=1).astype(np.float32)
+        with self._lock:
+            self.docs, self.mat, self.norms = docs, mat, norms
+            self.generation += 1
+        logger.info(f"Shard {self.shard}/{self.of}: {len(docs)} chunks in {time.perf_counter() - t0:.1f}s")
+        return self.info()
+
+    def info(self) -> Dict[str, Any]:
+        return {"shard": self.shard, "of": self.of, "by": self.by, "chunks": len(self.docs),
+                "generation": self.generation, "bytes": int(self.mat.nbytes) + self.docs.nbytes()}
+
+    def search(self, q_vec: np.ndarray, k: int, user_profile: Optional[Dict]) -> List[tuple]:
+        """This shard's top k*3 by cosine as (sim, heuristic score, boost, chunk dict)."""
+        from .search import _candidates
+        with self._lock:
+            docs, mat, norms = self.docs, self.mat, self.norms
+        if len(docs) == 0:
+            return []
+        top_idx, sims, boost, final = _candidates(q_vec, k, user_profile, docs, mat, norms)
+        return [(float(s), float(f), float(b), docs[i]) for i, s, f, b in zip(top_idx, sims, final, boost)]
+
+    def _dispatch(self, op: str, args: list) -> Any:
+        if op == "search":
+            return self.search(*args)
+        if op == "ping":
+            return self.info()
+        if op == "reload":
+            return self.reload()
+        return ValueError(f"unknown op {op!r}")
+
+    def handle(self, conn) -> None:
+        """One client connection: every request gets exactly one reply, an exception if it failed."""
+        try:
+            while True:
+                try:
+                    op, *args = conn.recv()
+                    reply = self._dispatch(op, args)
+                except (EOFError, OSError):
+                    raise
+                except Exception as e:
+                    # a bad request (or a bug) fails that request only; the client raises it.
+                    # Sent as a RuntimeError so an unpicklable exception cannot break the reply
+                    logger.exception(f"Shard {self.shard}: request failed")
+                    reply = RuntimeError(f"shard {self.shard}: {type(e).__name__}: {e}")
+                conn.send(reply)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def serve(self, address: Address, listener: Optional[Listener] = None, key: Optional[bytes] = None) -> None:
+        with listener or Listener(address, authkey=key or authkey(local=False)) as listener:
+            logger.info(f"Shard {self.shard}/{self.of} listening on {address[0]}:{address[1]}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:   # failed auth handshakes land here
+                    logger.warning(f"Shard {self.shard}: rejected connection: {e}")
+                    continue
+                threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+def _serve_local(shard: int, of: int, by: str, address: Address, key: bytes, bound=None) -> None:
+    # bind before the (slow) corpus load so a second app worker sees the port taken and connects instead;
+    # clients that connect meanwhile wait in the handshake until the shard starts accepting
+    try:
+        listener = Listener(address, authkey=key)
+    except OSError:
+        return
+    if bound is not None:
+        bound.set()           # this shard belongs to the spawning worker (ShardCluster.stop)
+    ShardServer(shard, of, by).serve(address, listener)
+
+# ---------- 3. client side ----------
+class ShardClient:
+    def __init__(self, address: Address, key: bytes):
+        self.address = address
+        self._key = key
+        self._pool: "queue.LifoQueue" = queue.LifoQueue()
+        self._latencies = deque(maxlen=1000)
+        self.healthy = False
+        self.info: Dict[str, Any] = {}
+        self.requests = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    def call(self, msg: tuple, timeout_s: Optional[float]) -> Any:
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = Client(self.address, authkey=self._key)
+        t0 = time.perf_counter()
+        try:
+            conn.send(msg)
+            if timeout_s is not None and not conn.poll(timeout_s):
+                raise TimeoutError(f"shard {self.address[0]}:{self.address[1]} timed out after {timeout_s:.2f}s")
+            result = conn.recv()
+        except BaseException:
+            conn.close()            # a late reply would desync the connection
+            raise
+        self._pool.put(conn)
+        if isinstance(result, Exception):
+            raise result
+        self._latencies.append(time.perf_counter() - t0)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        lat = np.asarray(self._latencies) * 1000.0 if self._latencies else np.zeros(1)
+        p50, p95 = np.percentile(lat, [50, 95])
+        return {"address": f"{self.address[0]}:{self.address[1]}", "healthy": self.healthy,
+                "requests": self.requests, "errors": self.errors, "last_error": self.last_error,
+                "p50_ms": round(float(p50), 2), "p95_ms": round(float(p95), 2), **self.info}
+
+class ShardCluster:
+    def __init__(self, addresses: List[Address], spawn: bool):
+        self._key = authkey(local=spawn)
+        self.clients = [ShardClient(a, self._key) for a in addresses]
+        self._spawn = spawn
+        self._procs: List[Tuple[multiprocessing.Process, Any]] = []     # (process, its "bound the port" event)
+        self._pool = ThreadPoolExecutor(max_workers=max(4, 4 * len(addresses)), thread_name_prefix="scatter")
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._started:
+                return
+            if self._spawn:
+                ctx = multiprocessing.get_context("spawn")
+                for i, c in enumerate(self.clients):
+                    bound = ctx.Event()
+                    p = ctx.Process(target=_serve_local, args=(i, len(self.clients), SHARD_BY, c.address, self._key, bound),
+                                    name=f"shard-{i}", daemon=True)
+                    p.start()
+                    self._procs.append((p, bound))
+                atexit.register(self.stop)
+            deadline = time.monotonic() + SHARD_START_TIMEOUT_S
+            for c in self.clients:
+                while True:
+                    try:
+                        c.info = c.call(("ping",), timeout_s=None)
+                        c.healthy = True
+                        break
+                    except (ConnectionRefusedError, ConnectionResetError, EOFError, OSError):
+                        if self._procs and all(not p.is_alive() for p, _ in self._procs):
+                            raise RuntimeError("shard processes exited during startup; see their logs")
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(f"shard {c.address} did not come up")
+                        time.sleep(0.5)
+            self._started = True
+            logger.info(f"Sharded index ready: {[c.info.get('chunks') for c in self.clients]} chunks per shard")
+
+    def stop(self) -> None:
+        """Stop the shards this process started. A spawned process that found its port taken has
+        already exited; the shard on that port belongs to another worker and keeps serving it."""
+        for p, bound in self._procs:
+            if bound.is_set() and p.is_alive():
+                p.terminate()
+
+    def _ask(self, client: ShardClient, msg: tuple) -> Any:
+        client.requests += 1
+        try:
+            out = client.call(msg, SHARD_TIMEOUT_MS / 1000.0)
+            client.healthy = True
+            return out
+        except Exception as e:
+            client.errors += 1
+            client.healthy = False
+            client.last_error = f"{type(e).__name__}: {e}"
+            logger.warning(f"Shard {client.address} failed: {client.last_error}")
+            return None
+
+    def scatter(self, msg: tuple) -> List[Any]:
+        """Send msg to every shard in parallel; failed or slow shards contribute None."""
+        self.start()
+        return list(self._pool.map(lambda c: self._ask(c, msg), self.clients))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"started": self._started, "by": SHARD_BY, "shards": [c.stats() for c in self.clients]}
+
+_cluster: Optional[ShardCluster] = None
+_cluster_lock = threading.Lock()
+
+def cluster() -> ShardCluster:
+    global _cluster
+    with _cluster_lock:
+        if _cluster is None:
+            if SHARD_NODES:
+                addrs = [(h, int(p)) for h, _, p in (n.rpartition(":") for n in SHARD_NODES)]
+                _cluster = ShardCluster(addrs, spawn=False)
+            else:
+                _cluster = ShardCluster([(SHARD_HOST, SHARD_BASE_PORT + i) for i in range(SHARD_COUNT)], spawn=True)
+        return _cluster
+
+# ---------- 4. retrieve over shards ----------
+def retrieve(query: str, k: int, user_profile: Optional[Dict] = None,
+             q_vec: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """Same ranking as search.retrieve: global top k*3 by cosine (heap merge), then top k by score."""
+    from .search import query_vector, _cross_encoder_scores
+    from . import rerank
+    q_vec = np.asarray(query_vector(query, user_profile) if q_vec is None else q_vec)
+    results = cluster().scatter(("search", q_vec, k, user_profile))
+    merged = [hit for shard_hits in results if shard_hits for hit in shard_hits]
+    if not merged:
+        return []
+    # every shard returned its own top k*3 by cosine, so the global top k*3 is among them
+    cands = heapq.nlargest(k * 3, merged, key=lambda h: h[0])
+    scores = [h[1] for h in cands]
+    if rerank.enabled():
+        n = min(len(cands), max(k, rerank.RERANK_MAX_CANDIDATES))
+        ce_scores = _cross_encoder_scores(query, [h[3]["content"] for h in cands[:n]],
+                                          np.asarray([h[2] for h in cands], dtype=np.float32))
+        if ce_scores is not None:
+            cands, scores = cands[:n], list(ce_scores)
+    best = heapq.nlargest(k, range(len(cands)), key=lambda i: scores[i])
+    return [cands[i][3] for i in best]
+
+def stats() -> Dict[str, Any]:
+    return cluster().stats() if _cluster is not None else {"started": False, "by": SHARD_BY, "shards": []}
+
+def reload() -> List[Any]:
+    """Rebuild every shard from the DB (each swaps atomically when done)."""
+    c = cluster()
+    c.start()
+    return [cl.call(("reload",), timeout_s=None) for cl in c.clients]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded search workers")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    srv = sub.add_parser("serve", help="run one shard")
+    srv.add_argument("--shard", type=int, required=True)
+    srv.add_argument("--of", type=int, required=True)
+    srv.add_argument("--by", choices=["id", "source"], default=SHARD_BY)
+    srv.add_argument("--host", default=SHARD_HOST)
+    srv.add_argument("--port", type=int, default=None)
+    sub.add_parser("status", help="ping the configured shards")
+    sub.add_parser("reload", help="rebuild the configured shards from the DB")
+    args = parser.parse_args()
+    if args.cmd == "serve":
+        logging.basicConfig(level=logging.INFO)
+        key = authkey(local=False)          # refuse before the (slow) corpus load
+        ShardServer(args.shard, args.of, args.by).serve((args.host, args.port or SHARD_BASE_PORT + args.shard), key=key)
+    else:
+        c = cluster()
+        c._spawn = False
+        if args.cmd == "reload":
+            print(reload())
+        else:
+            for cl in c.clients:
+                try:
+                    cl.info, cl.healthy = cl.call(("ping",), timeout_s=SHARD_TIMEOUT_MS / 1000.0), True
+                except Exception as e:
+                    cl.last_error = str(e)
+            print(c.stats())
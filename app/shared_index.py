@@ -0,0 +1,198 @@
+# app/shared_index.py  (one builder publishes the embedding index, uvicorn workers attach zero-copy)
+#
+#   INDEX_MODE=shared uvicorn app.main:app --workers 4
+#   python -m app.shared_index publish     # rebuild from the DB and hot-swap all workers
+#   python -m app.shared_index status
+#
+# File layout (index-<generation>.bin, little-endian, every section 64-byte aligned):
+#   MAGIC | u64 header_len | header JSON | mat f32[n,dim] | norms f32[n] | DocStore sections
+#   (ids, quality, content/metadata offsets + UTF-8 blobs, interned column codes)
+# The header records each section's offset/dtype/shape plus the DocStore value tables, and a
+# `meta` dict: the model and corpus fingerprints (app/search.py index_fingerprint) and build info.
+# attach_or_build rebuilds when the published generation's fingerprint differs from the caller's.
+# CURRENT holds the generation number; it is replaced atomically after the file is complete.
+import os
+import sys
+import json
+import mmap
+import time
+import logging
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+import numpy as np
+from .docstore import DocStore
+
+logger = logging.getLogger(__name__)
+
+def _default_dir() -> Path:
+    shm = Path("/dev/shm")
+    base = shm if shm.is_dir() else Path(tempfile.gettempdir())
+    return base / "neethi-index"
+
+SHARED_INDEX_DIR = Path(os.getenv("SHARED_INDEX_DIR") or _default_dir())
+POLL_S = float(os.getenv("SHARED_INDEX_POLL_S", "2"))
+KEEP_GENERATIONS = int(os.getenv("SHARED_INDEX_KEEP", "2"))
+
+MAGIC = b"NSIDX001"
+ALIGN = 64
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+def _index_path(directory: Path, generation: int) -> Path:
+    return directory / f"index-{generation}.bin"
+
+class SharedIndex:
+    """One attached generation: zero-copy views into a read-only mapping."""
+
+    def __init__(self, path: Path, generation: int):
+        self.path = path
+        self.generation = generation
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a shared index file")
+        hlen = int.from_bytes(self._mm[8:16], "little")
+        self.header = json.loads(self._mm[16:16 + hlen].decode("utf-8"))
+        sections = {}
+        for name, (offset, dtype, shape) in self.header["sections"].items():
+            count = int(np.prod(shape))
+            sections[name] = np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset).reshape(shape)
+        self.mat = sections["mat"]
+        self.norms = sections["norms"]
+        self.docs = DocStore.from_sections(sections, self.header["tables"])
+
+def write_index(path: Path, generation: int, docs: DocStore, mat: np.ndarray, norms: np.ndarray,
+                meta: Optional[dict] = None) -> None:
+    n, dim = mat.shape
+    payload = [("mat", np.ascontiguousarray(mat, dtype=np.float32)),
+               ("norms", np.ascontiguousarray(norms, dtype=np.float32)),
+               *((name, np.ascontiguousarray(a)) for name, a in docs.sections())]
+    header = {"generation": generation, "n": n, "dim": dim, "meta": meta or {}, "tables": docs.tables, "sections": {}}
+    # header size depends on the offsets it records; reserve generously and pad
+    reserve = _align(len(json.dumps(header)) + 96 * len(payload))
+    offset = _align(16 + reserve)
+    for name, data in payload:
+        header["sections"][name] = [offset, data.dtype.str, list(data.shape)]
+        offset = _align(offset + data.nbytes)
+    hjson = json.dumps(header).encode("utf-8")
+    if len(hjson) > reserve:
+        raise RuntimeError("shared index header overflow")
+
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(hjson).to_bytes(8, "little"))
+        f.write(hjson)
+        for name, data in payload:
+            f.seek(header["sections"][name][0])
+            f.write(data.tobytes())
+        f.truncate(max(offset, f.tell()))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def current_generation(directory: Path | None = None) -> Optional[int]:
+    try:
+        return int((Path(directory or SHARED_INDEX_DIR) / "CURRENT").read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def attach(generation: int | None = None, directory: Path | None = None) -> SharedIndex:
+    directory = Path(directory or SHARED_INDEX_DIR)
+    generation = generation if generation is not None else current_generation(directory)
+    if generation is None:
+        raise FileNotFoundError(f"No shared index published in {directory}")
+    return SharedIndex(_index_path(directory, generation), generation)
+
+@contextmanager
+def _build_lock(directory: Path):
+    """Cross-process exclusive lock so only one worker builds/publishes at a time."""
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / "build.lock", "a+b") as f:
+        try:
+            import fcntl
+        except ImportError:  # Windows: run `python -m app.shared_index publish` before the workers
+            yield
+            return
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _publish_locked(directory: Path, docs, mat, norms, meta: Optional[dict] = None) -> int:
+    generation = (current_generation(directory) or 0) + 1
+    write_index(_index_path(directory, generation), generation, docs, mat, norms, meta)
+    tmp = directory / "CURRENT.tmp"
+    tmp.write_text(str(generation))
+    os.replace(tmp, directory / "CURRENT")
+    # older generations stay mapped in workers that have not swapped yet (POSIX keeps unlinked
+    # mappings alive), so keeping the previous one only matters for slow pollers on Windows
+    for old in directory.glob("index-*.bin"):
+        try:
+            if int(old.stem.split("-")[1]) <= generation - KEEP_GENERATIONS:
+                old.unlink()
+        except (ValueError, OSError):
+            pass
+    logger.info(f"Published shared index generation {generation} ({len(docs)} chunks) to {directory}")
+    return generation
+
+def publish(docs: DocStore, mat: np.ndarray, norms: np.ndarray,
+            directory: Path | None = None, meta: Optional[dict] = None) -> int:
+    directory = Path(directory or SHARED_INDEX_DIR)
+    with _build_lock(directory):
+        return _publish_locked(directory, docs, mat, norms, meta)
+
+def _attach_matching(directory: Path, fingerprint: Optional[dict]) -> Optional[SharedIndex]:
+    """The current generation if there is one and its meta matches every key of `fingerprint`."""
+    if current_generation(directory) is None:
+        return None
+    try:
+        idx = attach(directory=directory)
+    except (FileNotFoundError, ValueError) as e:
+        logger.warning(f"Shared index in {directory} is unusable: {e}")
+        return None
+    meta = idx.header.get("meta") or {}
+    stale = {k: meta.get(k) for k, v in (fingerprint or {}).items() if meta.get(k) != v}
+    if stale:
+        logger.warning(f"Shared index generation {idx.generation} was built with {stale}, "
+                       f"serving {fingerprint}; rebuilding")
+        return None
+    return idx
+
+def attach_or_build(build: Callable[[], Tuple[DocStore, np.ndarray, np.ndarray]],
+                    directory: Path | None = None, fingerprint: Optional[dict] = None) -> SharedIndex:
+    """Attach the current generation, or build + publish one if there is none or it was built
+    from another model/corpus than `fingerprint` (e.g. a /dev/shm index left by an older deploy)."""
+    directory = Path(directory or SHARED_INDEX_DIR)
+    idx = _attach_matching(directory, fingerprint)
+    if idx is None:
+        with _build_lock(directory):
+            idx = _attach_matching(directory, fingerprint)     # another worker may have rebuilt it meanwhile
+            if idx is None:
+                meta = dict(fingerprint or {}, built_at=time.time())
+                _publish_locked(directory, *build(), meta=meta)
+                idx = attach(directory=directory)
+    return idx
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if cmd == "publish":
+        from .database import SessionLocal
+        from .search import _build_index, index_fingerprint
+        with SessionLocal() as db:
+            gen = publish(*_build_index(db), meta=dict(index_fingerprint(db), built_at=time.time()))
+        print(f"Published generation {gen} to {SHARED_INDEX_DIR}")
+    elif cmd == "status":
+        gen = current_generation()
+        if gen is None:
+            print(f"No shared index in {SHARED_INDEX_DIR}")
+        else:
+            idx = attach(gen)
+            print(f"generation={gen} chunks={idx.header['n']} dim={idx.header['dim']} "
+                  f"bytes={idx.path.stat().st_size} path={idx.path}")
+    else:
+        sys.exit("usage: python -m app.shared_index [publish|status]")
@@ -0,0 +1,202 @@
+# app/singleflight.py  (concurrent identical retrieval / LLM calls share one in-flight computation)
+import os
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from .admission import Overloaded
+from .resilience import CircuitOpen
+
+logger = logging.getLogger(__name__)
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "1").lower() in ("1", "true", "yes")
+
+def fingerprint(*parts: Any) -> str:
+    """Stable key for a prompt: parts are joined with a separator that cannot occur in text."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(str(p).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+class _Stream:
+    """Append-only buffer of chunks; every reader replays it from the start and then follows."""
+
+    def __init__(self):
+        self.opened = threading.Event()         # set once the leader's open_fn returned or raised
+        self.open_error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+        self._chunks: List[Any] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+
+    def append(self, chunk: Any) -> None:
+        with self._cond:
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+
+    def iterate(self) -> Iterator[Any]:
+        i = 0
+        while True:
+            with self._cond:
+                while i >= len(self._chunks) and not self._done:
+                    self._cond.wait()
+                pending = self._chunks[i:]
+                i = len(self._chunks)
+                finished, error = self._done, self._error
+            yield from pending
+            if finished:
+                if error is not None:
+                    raise error
+                return
+
+class SingleFlight:
+    """Go-style singleflight for worker threads.
+
+    The first caller for a key runs the function; callers arriving while it is in flight
+    block and receive the same result (or exception). Keys are forgotten as soon as the call
+    finishes, so this never serves stale results; it only collapses concurrent duplicates.
+
+    Exceptions of the `private` types belong to the caller that hit them (e.g. a per-session
+    admission rejection), not to the computation: followers are not handed those, they try
+    again with their own arguments and either join the next flight or lead it. Types in `shared`
+    are handed to followers even when they subclass a private type (an open circuit breaker
+    rejects every caller alike, so retrying it once per follower only repeats the rejection).
+    """
+
+    def __init__(self, name: str, private: Tuple[Type[BaseException], ...] = (),
+                 shared: Tuple[Type[BaseException], ...] = ()):
+        self.name = name
+        self.private = private
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Stream] = {}
+        self.counters = defaultdict(int)
+
+    def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if not SINGLEFLIGHT_ENABLED:
+            return fn(*args, **kwargs)
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.counters["executed"] += 1
+                else:
+                    self.counters["coalesced"] += 1
+            if leader:
+                break
+            call.done.wait()
+            if call.error is None:
+                return call.result
+            if not self._is_private(call.error):
+                raise call.error
+            self.counters["follower_retries"] += 1
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            self.counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stream(self, key: str, open_fn: Callable[..., Iterable[Any]], *args, **kwargs) -> Iterator[Any]:
+        """Share one streaming result between concurrent identical requests.
+
+        `open_fn` runs on the caller's thread (so admission errors surface before the response
+        starts) and returns an iterable that a background thread drains into a shared buffer.
+        Late joiners replay what was already produced, and a reader that disconnects does not
+        cut the stream short for the others.
+        """
+        if not SINGLEFLIGHT_ENABLED:
+            return iter(open_fn(*args, **kwargs))
+        while True:
+            with self._lock:
+                shared = self._streams.get(key)
+                leader = shared is None
+                if leader:
+                    shared = self._streams[key] = _Stream()
+                    self.counters["streams_executed"] += 1
+                else:
+                    self.counters["streams_coalesced"] += 1
+            if leader:
+                break
+            # followers wait for the open too, so a failed open surfaces here and not mid-response
+            shared.opened.wait()
+            if shared.open_error is None:
+                return shared.iterate()
+            if not self._is_private(shared.open_error):
+                raise shared.open_error
+            self.counters["follower_retries"] += 1
+        try:
+            source = open_fn(*args, **kwargs)
+        except BaseException as e:
+            shared.open_error = e
+            self._end_stream(key, shared, e)
+            raise
+        finally:
+            shared.opened.set()
+        threading.Thread(target=self._pump, args=(key, shared, source),
+                         name=f"singleflight-{self.name}", daemon=True).start()
+        return shared.iterate()
+
+    def _is_private(self, error: BaseException) -> bool:
+        return isinstance(error, self.private) and not isinstance(error, self.shared)
+
+    def _pump(self, key: str, shared: _Stream, source: Iterable[Any]) -> None:
+        error = None
+        try:
+            for chunk in source:
+                shared.append(chunk)
+        except BaseException as e:
+            error = e
+            logger.error(f"Shared {self.name} stream failed: {e}")
+        self._end_stream(key, shared, error)
+
+    def _end_stream(self, key: str, shared: _Stream, error: Optional[BaseException]) -> None:
+        with self._lock:
+            self._streams.pop(key, None)
+            if error is not None:
+                self.counters["errors"] += 1
+        shared.finish(error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            executed = self.counters["executed"] + self.counters["streams_executed"]
+            coalesced = self.counters["coalesced"] + self.counters["streams_coalesced"]
+            return {"in_flight": len(self._calls), "streams_in_flight": len(self._streams),
+                    "coalesced_ratio": round(coalesced / (executed + coalesced), 4) if executed + coalesced else 0.0,
+                    **self.counters}
+
+retrieval_flight = SingleFlight("retrieval")
+# admission rejections (429 per session, 503 queue full / timed out) are about the caller, not the
+# prompt; an open LLM breaker (CircuitOpen, also an Overloaded) rejects everyone, so the group fails once
+llm_flight = SingleFlight("llm", private=(Overloaded,), shared=(CircuitOpen,))
+
+def stats() -> Dict[str, Any]:
+    return {"enabled": SINGLEFLIGHT_ENABLED, "retrieval": retrieval_flight.stats(), "llm": llm_flight.stats()}
@@ -0,0 +1,237 @@
+# app/suggest.py  (scheme-name autocomplete: sorted prefix arrays over the names in the index)
+#
+# Built once per index generation from the interned DocStore tables (scheme_name, title) plus any
+# "source" key in chunk_metadata; no embedding, no DB round trip per keystroke. Every name is stored
+# under each of its word-start suffixes, in two sorted key arrays:
+#   folded   lowercase, accents stripped, punctuation -> space, "Pradhan Mantri" -> "pm", "Mukhyamantri" -> "cm"
+#   phonetic the folded words reduced to a transliteration-tolerant skeleton (sh/s, w/v, aa/a, doubled
+#            letters and vowels after the first letter dropped), so "yojna", "yojana" and "yojanaa" agree
+# A lookup is a few bisects. Tiers, best first: prefix of the whole name, prefix of a later word, phonetic
+# prefix, then phonetic prefix with one letter dropped or two adjacent letters swapped (typos).
+# Within a tier, names with more chunks come first.
+# Keystrokes are served from the built index without a DB session (ready()); only a missing or stale
+# index sends the request to refresh(), which opens its own session and is meant for a worker thread.
+import os
+import re
+import time
+import bisect
+import logging
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_LIMIT = int(os.getenv("SUGGEST_LIMIT", "8"))
+SUGGEST_MAX_WORDS = int(os.getenv("SUGGEST_MAX_WORDS", "8"))          # word-start suffixes indexed per name
+SUGGEST_REFRESH_S = float(os.getenv("SUGGEST_REFRESH_S", "600"))      # sharded mode: names re-read from the DB
+
+_ALIASES = [(re.compile(r"\bpradhan\s*mantri\b"), "pm"), (re.compile(r"\bmukhya\s*mantri\b"), "cm")]
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_PHONETIC = [("chh", "c"), ("ph", "f"), ("sh", "s"), ("kh", "k"), ("gh", "g"), ("ch", "c"), ("th", "t"),
+             ("dh", "d"), ("bh", "b"), ("jh", "j"), ("ck", "k"), ("w", "v"), ("z", "j"), ("q", "k"), ("x", "ks")]
+_VOWELS = re.compile(r"(?<=.)[aeiou]+")
+_REPEAT = re.compile(r"(.)\1+")
+_HIGH = "\uffff"
+
+# ---------- 1. normalisation ----------
+def fold(text: str, aliases: bool = True) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = _NON_ALNUM.sub(" ", text).strip()
+    if aliases:
+        for pattern, alias in _ALIASES:
+            text = pattern.sub(alias, text)
+    return text
+
+def phonetic_word(word: str) -> str:
+    for a, b in _PHONETIC:
+        word = word.replace(a, b)
+    return _VOWELS.sub("", _REPEAT.sub(r"\1", word))
+
+def phonetic(folded: str) -> str:
+    return " ".join(phonetic_word(w) for w in folded.split())
+
+def _typo_variants(key: str) -> List[str]:
+    """One letter dropped or two adjacent letters swapped; only for keys long enough to stay selective."""
+    if len(key.replace(" ", "")) < 4:
+        return []
+    out = {key[:i] + key[i + 1:] for i in range(1, len(key)) if key[i] != " "}
+    out |= {key[:i] + key[i + 1] + key[i] + key[i + 2:] for i in range(1, len(key) - 1)
+            if key[i] != key[i + 1] and " " not in key[i:i + 2]}
+    return sorted(v for v in out if len(v) >= 3 and v != key)
+
+# ---------- 2. index ----------
+class SuggestIndex:
+    """Distinct names (by folded form) with kind and chunk count, and the two sorted key arrays."""
+
+    def __init__(self, names: List[Tuple[str, str, int]], generation: int = 0):
+        t0 = time.perf_counter()
+        entries: Dict[str, List[Any]] = {}
+        kind_order = {"scheme": 0, "title": 1, "source": 2}
+        for name, kind, count in names:
+            key = fold(name)
+            if not key:
+                continue
+            e = entries.get(key)
+            if e is None:
+                entries[key] = [name, kind, count]
+            else:
+                e[2] += count
+                if kind_order[kind] < kind_order[e[1]]:
+                    e[0], e[1] = name, kind
+        # rank = position in the display order within a tier: more chunks first, then shorter, then alphabetical
+        ordered = sorted(entries.items(), key=lambda kv: (-kv[1][2], len(kv[0]), kv[0]))
+        self.names = [e[0] for _, e in ordered]
+        self.kinds = [e[1] for _, e in ordered]
+        self.counts = np.fromiter((e[2] for _, e in ordered), dtype=np.int32, count=len(ordered))
+        self.generation = generation
+
+        folded, sounds = set(), set()
+        for rank, (key, e) in enumerate(ordered):
+            # the spelled-out form too, so "pradhan man" matches before the alias completes
+            for form in {key, fold(e[0], aliases=False)}:
+                words = form.split()
+                sound = [phonetic_word(w) for w in words]
+                for i in range(min(len(words), SUGGEST_MAX_WORDS)):
+                    folded.add((" ".join(words[i:]), rank, i == 0))
+                    sounds.add((" ".join(sound[i:]), rank))
+        folded, sounds = sorted(folded), sorted(sounds)
+        self.folded_keys = [k for k, _, _ in folded]
+        self.folded_rank = np.fromiter((r for _, r, _ in folded), dtype=np.int32, count=len(folded))
+        self.folded_start = np.fromiter((s for _, _, s in folded), dtype=bool, count=len(folded))
+        self.sound_keys = [k for k, _ in sounds]
+        self.sound_rank = np.fromiter((r for _, r in sounds), dtype=np.int32, count=len(sounds))
+        self.build_s = round(time.perf_counter() - t0, 4)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def _range(keys: List[str], prefix: str) -> Tuple[int, int]:
+        return bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, prefix + _HIGH)
+
+    def lookup(self, query: str, limit: int = SUGGEST_LIMIT) -> List[Dict[str, Any]]:
+        q = fold(query)
+        if not q:
+            return []
+        out: List[Dict[str, Any]] = []
+        seen = set()
+
+        def take(ranks: np.ndarray, tier: str) -> bool:
+            for r in np.unique(ranks):          # unique() sorts, and rank order is display order
+                r = int(r)
+                if r in seen:
+                    continue
+                seen.add(r)
+                out.append({"text": self.names[r], "kind": self.kinds[r], "chunks": int(self.counts[r]), "match": tier})
+                if len(out) >= limit:
+                    return True
+            return False
+
+        lo, hi = self._range(self.folded_keys, q)
+        start = self.folded_start[lo:hi]
+        if take(self.folded_rank[lo:hi][start], "prefix") or take(self.folded_rank[lo:hi][~start], "word"):
+            return out
+        sound = phonetic(q)
+        lo, hi = self._range(self.sound_keys, sound)
+        if take(self.sound_rank[lo:hi], "phonetic"):
+            return out
+        ranges = [self._range(self.sound_keys, v) for v in _typo_variants(sound)]
+        ranks = [self.sound_rank[lo:hi] for lo, hi in ranges if hi > lo]
+        if ranks:
+            take(np.concatenate(ranks), "fuzzy")
+        return out
+
+    def nbytes(self) -> int:
+        keys = sum(len(k) + 49 for k in self.folded_keys) + sum(len(k) + 49 for k in self.sound_keys)
+        arrays = self.folded_rank.nbytes + self.folded_start.nbytes + self.sound_rank.nbytes + self.counts.nbytes
+        return keys + arrays + sum(len(n) + 49 for n in self.names)
+
+def names_from_docs(docs) -> List[Tuple[str, str, int]]:
+    """(name, kind, chunk count) from the DocStore's interned columns and chunk_metadata["source"]."""
+    out: List[Tuple[str, str, int]] = []
+    for column, kind in (("scheme_name", "scheme"), ("title", "title")):
+        counts = np.bincount(docs.columns[column], minlength=len(docs.tables[column]))
+        out += [(v, kind, int(c)) for v, c in zip(docs.tables[column], counts) if isinstance(v, str) and v and c]
+    sources: Dict[str, int] = {}
+    for i in range(len(docs)):
+        raw = docs.raw_metadata[i]
+        if raw and '"source"' in raw:
+            value = docs.metadata(i).get("source")
+            if isinstance(value, str) and value:
+                sources[value] = sources.get(value, 0) + 1
+    out += [(v, "source", c) for v, c in sources.items()]
+    return out
+
+# ---------- 3. current index ----------
+_lock = threading.Lock()
+_current: Optional[SuggestIndex] = None
+_built_at = 0.0
+
+def _load_names(db) -> Tuple[List[Tuple[str, str, int]], int]:
+    from . import search
+    if search.INDEX_MODE == "sharded":
+        # the chunks live in the shard processes; only the name columns are read here
+        from sqlalchemy import text
+        from .docstore import DocStore
+        rows = db.execute(text("SELECT id, source_type AS source, title, chunk_metadata FROM unified_chunks"))
+        docs = DocStore.from_rows({"id": r.id, "source": r.source, "title": r.title, "content": "",
+                                   "metadata": r.chunk_metadata} for r in rows)
+        return names_from_docs(docs), 0
+    search._ensure_cache(db)
+    with search._cache_lock:
+        docs, generation = search._cached_docs, search._cache_generation
+    return names_from_docs(docs), generation
+
+def _stale(idx: Optional[SuggestIndex]) -> bool:
+    from . import search
+    if idx is None:
+        return True
+    if search.INDEX_MODE == "sharded":
+        return time.monotonic() - _built_at > SUGGEST_REFRESH_S
+    return not search._cache_ready or idx.generation != search.index_generation()
+
+def ready() -> Optional[SuggestIndex]:
+    """The built index if it can be served as is: no DB, no file I/O, safe on the event loop."""
+    from . import search
+    idx = _current
+    if search.INDEX_MODE == "shared":
+        from . import shared_index
+        if time.monotonic() - search._shared_checked_at >= shared_index.POLL_S:
+            return None                 # a newer generation may be published; refresh() checks
+    return None if _stale(idx) else idx
+
+def current(db) -> SuggestIndex:
+    """The index for the generation being served, rebuilt when the search index changes."""
+    global _current, _built_at
+    from . import search
+    if search._cache_ready and search.INDEX_MODE == "shared":
+        search._maybe_swap_shared()
+    idx = _current
+    if not _stale(idx):
+        return idx
+    with _lock:
+        if _current is not idx:
+            return _current
+        names, generation = _load_names(db)
+        _current, _built_at = SuggestIndex(names, generation), time.monotonic()
+        logger.info(f"Suggest index: {len(_current)} names, {len(_current.folded_keys)} keys in {_current.build_s}s")
+        return _current
+
+def refresh() -> SuggestIndex:
+    """current() on a session of its own; blocking (corpus query / index load), run it in a worker thread."""
+    from .database import SessionLocal
+    with SessionLocal() as db:
+        return current(db)
+
+def suggest(query: str, limit: int = SUGGEST_LIMIT) -> List[Dict[str, Any]]:
+    return (ready() or refresh()).lookup(query, limit)
+
+def stats() -> Dict[str, Any]:
+    idx = _current
+    if idx is None:
+        return {"built": False}
+    return {"built": True, "generation": idx.generation, "names": len(idx), "keys": len(idx.folded_keys),
+            "bytes": idx.nbytes(), "build_s": idx.build_s}
@@ -0,0 +1,30 @@
+# python -m bench  -> retrieve() and HTTP endpoint benchmarks in one JSON report
+import argparse
+import json
+from pathlib import Path
+from . import endpoints, retrieval
+from .common import git_commit
+
+def main():
+    p = argparse.ArgumentParser(description="Run the full NeethiSaarathi benchmark suite")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    p.add_argument("--http-sizes", type=int, nargs="+", default=[1000, 5000])
+    p.add_argument("--queries", type=Path, default=None)
+    p.add_argument("--threads", type=int, default=4)
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--workdir", type=Path, default=None)
+    p.add_argument("--out", type=Path, default=None)
+    args = p.parse_args()
+
+    common = ["--workdir", str(args.workdir)] if args.workdir else []
+    if args.queries:
+        common += ["--queries", str(args.queries)]
+    report = {"commit": git_commit()}
+    report["retrieve"] = retrieval.main(["--sizes", *map(str, args.sizes), "--threads", str(args.threads),
+                                         "--k", str(args.k), *common])["retrieve"]
+    report["endpoints"] = endpoints.main(["--sizes", *map(str, args.http_sizes), *common])["endpoints"]
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
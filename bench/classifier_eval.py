@@ -0,0 +1,112 @@
+# bench/classifier_eval.py  (embedding nearest-centroid classifier vs the keyword heuristics: accuracy + cost)
+#
+#   python -m bench.classifier_eval --size 2000
+#   python -m bench.classifier_eval --labels my_labels.jsonl   # {"q": ..., "category": ..., "form": true|false}
+#   python -m bench.classifier_eval --content-weight 0.3        # blend the retrieved chunks into the category
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from app import search, classifier
+from app.agent import classify_by_keywords, needs_form_by_keywords
+from .common import git_commit
+from .corpus import create_sqlite_corpus
+
+LABELS = [
+    ("What scholarships are available for OBC students in Karnataka?", "SCHEME", False),
+    ("How do I apply for the post matric scholarship?", "SCHEME", True),
+    ("Which pension schemes exist for widows?", "SCHEME", False),
+    ("Steps to register for PM Kisan", "SCHEME", True),
+    ("documents needed for awas yojana application", "SCHEME", True),
+    ("financial assistance for farmers in Odisha", "SCHEME", False),
+    ("health insurance for BPL families", "SCHEME", False),
+    ("how to enroll in the skill development scheme", "SCHEME", True),
+    ("benefits of mahila shakti scheme", "SCHEME", False),
+    ("is there any subsidy for small business owners", "SCHEME", False),
+    ("where can I get the form for disability pension", "SCHEME", True),
+    ("loan scheme for startups by women", "SCHEME", False),
+    ("eligibility for deendayal housing scheme", "SCHEME", False),
+    ("application procedure for vidya lakshmi education loan", "SCHEME", True),
+    ("What does Article 21 of the constitution say?", "CONSTITUTION", False),
+    ("Explain the right to equality", "CONSTITUTION", False),
+    ("What are the fundamental rights of citizens?", "CONSTITUTION", False),
+    ("Which article prohibits discrimination on grounds of religion?", "CONSTITUTION", False),
+    ("directive principles of state policy meaning", "CONSTITUTION", False),
+    ("how is the constitution amended", "CONSTITUTION", False),
+    ("right to constitutional remedies article 32", "CONSTITUTION", False),
+    ("is education a fundamental right in india", "CONSTITUTION", False),
+    ("what protection does the law give to personal liberty", "CONSTITUTION", False),
+    ("cultural and educational rights of minorities", "CONSTITUTION", False),
+    ("freedom of religion under the constitution", "CONSTITUTION", False),
+    ("how to file a petition for violation of my rights", "CONSTITUTION", True),
+    ("hello", "GENERAL", False),
+    ("thank you so much", "GENERAL", False),
+    ("who are you?", "GENERAL", False),
+    ("what can you do for me", "GENERAL", False),
+    ("can you explain that again in simple words", "GENERAL", False),
+    ("good morning", "GENERAL", False),
+    ("what's the weather like", "GENERAL", False),
+    ("tell me a fun fact", "GENERAL", False),
+]
+
+def load_labels(path: Path | None) -> list[tuple[str, str, bool]]:
+    if not path:
+        return LABELS
+    out = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            row = json.loads(line)
+            out.append((row["q"], row["category"], bool(row.get("form", False))))
+    return out
+
+def _time_us(fn, *args, repeats: int = 20) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        fn(*args)
+    return (time.perf_counter() - t0) / repeats * 1e6
+
+def evaluate(size: int, labels: list[tuple[str, str, bool]], seed: int = 0, workdir: Path | None = None) -> dict:
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="neethi-bench-"))
+    _, SessionLocal = create_sqlite_corpus(workdir / f"corpus_{size}_{seed}.sqlite", size, seed)
+    search.invalidate_cache()
+    classifier.warm()
+    results = {"keywords": {"category": 0, "form": 0, "category_us": [], "form_us": []},
+               "embedding": {"category": 0, "form": 0, "category_us": [], "form_us": []}}
+    confusion: dict = {}
+    with SessionLocal() as db:
+        for q, category, form in labels:
+            chunks = search.retrieve(q, k=5, db=db)
+            kw_cat, kw_form = classify_by_keywords(chunks), needs_form_by_keywords(q)
+            emb_cat, emb_form = classifier.classify_category(q, chunks), classifier.wants_form(q)
+            for name, cat, frm in (("keywords", kw_cat, kw_form), ("embedding", emb_cat, emb_form)):
+                results[name]["category"] += cat == category
+                results[name]["form"] += frm == form
+            confusion.setdefault(category, {}).setdefault(emb_cat, 0)
+            confusion[category][emb_cat] += 1
+            # classification cost only; the query vector is already cached by retrieve()
+            results["keywords"]["category_us"].append(_time_us(classify_by_keywords, chunks))
+            results["keywords"]["form_us"].append(_time_us(needs_form_by_keywords, q))
+            results["embedding"]["category_us"].append(_time_us(classifier.classify_category, q, chunks))
+            results["embedding"]["form_us"].append(_time_us(classifier.wants_form, q))
+    n = len(labels)
+    report = {"commit": git_commit(), "corpus_size": size, "n": n, "content_weight": classifier.CONTENT_WEIGHT,
+              "embedding_confusion": confusion}
+    for name, r in results.items():
+        report[name] = {"category_accuracy": round(r["category"] / n, 3), "form_accuracy": round(r["form"] / n, 3),
+                        "category_us_p50": round(float(np.median(r["category_us"])), 1),
+                        "form_us_p50": round(float(np.median(r["form_us"])), 1)}
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--labels", type=Path, default=None)
+    parser.add_argument("--workdir", type=Path, default=None)
+    parser.add_argument("--content-weight", type=float, default=classifier.CONTENT_WEIGHT,
+                        help="CLASSIFIER_CONTENT_WEIGHT to evaluate (default: the configured one)")
+    args = parser.parse_args()
+    classifier.CONTENT_WEIGHT = args.content_weight
+    print(json.dumps(evaluate(args.size, load_labels(args.labels), args.seed, args.workdir), indent=2))
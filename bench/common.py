@@ -0,0 +1,69 @@
+# bench/common.py  (shared helpers for the benchmark harness)
+import json
+import subprocess
+import sys
+from pathlib import Path
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_QUERIES = ROOT / "requests.jsonl"
+
+FALLBACK_QUERIES = [
+    "What is the procedure for constitutional amendments?",
+    "schemes for me",
+    "scholarship for OBC students in Karnataka",
+    "how to apply for widow pension",
+    "documents required for PM Kisan",
+    "financial assistance for persons with disability",
+    "right to equality article",
+    "housing subsidy for BPL families",
+]
+
+def load_queries(path: Path | None = None, limit: int | None = None) -> list[str]:
+    """Read recorded queries from a JSONL file (q / question / query, else title + body)."""
+    path = Path(path) if path else DEFAULT_QUERIES
+    queries = []
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                q = rec.get("q") or rec.get("question") or rec.get("query")
+                if not q:
+                    q = " ".join(p for p in (rec.get("title"), rec.get("body")) if p)
+                if q and q.strip():
+                    queries.append(q.strip())
+    if not queries:
+        queries = list(FALLBACK_QUERIES)
+    return queries[:limit] if limit else queries
+
+def latency_summary(samples_s: list[float]) -> dict:
+    """p50/p95/p99/mean in milliseconds."""
+    if not samples_s:
+        return {"n": 0}
+    arr = np.asarray(samples_s) * 1000.0
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"n": len(arr), "mean_ms": round(float(arr.mean()), 3), "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+
+def peak_rss_mb() -> float | None:
+    """Process high-water RSS in MB (None where `resource` is unavailable, e.g. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
@@ -0,0 +1,98 @@
+# bench/corpus.py  (synthetic unified_chunks corpora in a local SQLite file)
+import argparse
+import json
+import random
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.fixtures import insert_chunks, seed_database
+
+STATES = ["Karnataka", "Tamil Nadu", "Kerala", "Maharashtra", "Uttar Pradesh",
+          "Bihar", "Rajasthan", "West Bengal", "Gujarat", "Odisha"]
+CATEGORIES = ["Education", "Agriculture", "Health", "Housing", "Employment",
+              "Social Welfare", "Women and Child", "Disability", "Pension", "Business"]
+FIELDS = ["eligibility", "benefits", "application_process", "documents_required", "details"]
+BENEFICIARIES = ["students", "farmers", "widows", "senior citizens", "persons with disability",
+                 "SC/ST households", "OBC students", "small entrepreneurs", "BPL families", "women"]
+SCHEME_PREFIX = ["PM", "Mukhyamantri", "Rashtriya", "Post Matric", "Pre Matric", "Pradhan Mantri",
+                 "National", "State", "Atal", "Deendayal"]
+SCHEME_NOUN = ["Kisan", "Scholarship", "Awas Yojana", "Pension Yojana", "Swasthya Bima",
+               "Udyam Sahayata", "Kaushal Vikas", "Vidya Lakshmi", "Shramik Kalyan", "Mahila Shakti"]
+
+FIELD_TEMPLATES = {
+    "eligibility": "Applicants must be {ben} residing in {state}. Annual family income should not exceed Rs. {inc} lakh. "
+                   "Applicants belonging to {cat_lower} categories receive priority under the scheme.",
+    "benefits": "The scheme provides financial assistance of Rs. {amt} per year to {ben}. "
+                "Benefits are transferred directly to the bank account of the beneficiary through DBT.",
+    "application_process": "Step by step application process: register on the {state} portal, fill the online form, "
+                           "upload documents and submit. The application process is verified by the district officer.",
+    "documents_required": "Documents required include Aadhaar card, income certificate, caste certificate, "
+                          "bank passbook, passport size photograph and residence proof from {state}.",
+    "details": "{name} is a {level} government scheme under the {cat} department aimed at {ben}. "
+               "It supports {ben} with subsidy, training and financial aid.",
+}
+ARTICLE_TEMPLATE = ("Article {num}. {topic} The State shall not deny to any person equality before the law "
+                    "or the equal protection of the laws within the territory of India. Provision {num}({sub}) "
+                    "applies subject to the amendment procedure laid down in Part {part}.")
+ARTICLE_TOPICS = ["Right to equality.", "Right to freedom of religion.", "Protection of life and personal liberty.",
+                  "Right to education.", "Prohibition of discrimination.", "Cultural and educational rights.",
+                  "Right to constitutional remedies.", "Directive principles of state policy."]
+
+FILLER = ("Officials may verify the information furnished by the applicant at any stage. "
+          "Incomplete applications are liable to be rejected without notice. ")
+
+def generate_chunks(n: int, seed: int = 0, pdf_ratio: float = 0.2):
+    """Yield n deterministic unified_chunks rows (scheme fields mixed with constitution articles)."""
+    rng = random.Random(seed)
+    for i in range(1, n + 1):
+        if rng.random() < pdf_ratio:
+            num = rng.randint(12, 395)
+            content = ARTICLE_TEMPLATE.format(num=num, topic=rng.choice(ARTICLE_TOPICS),
+                                              sub=rng.randint(1, 6), part=rng.choice(["III", "IV", "XX"]))
+            content += " " + FILLER * rng.randint(0, 4)
+            yield {"id": i, "source_type": "pdf", "title": f"Article {num}",
+                   "content": content, "chunk_metadata": json.dumps({"page": rng.randint(1, 400)})}
+            continue
+        state = rng.choice(STATES)
+        cat = rng.choice(CATEGORIES)
+        level = rng.choice(["Central", "State"])
+        name = f"{rng.choice(SCHEME_PREFIX)} {rng.choice(SCHEME_NOUN)}"
+        if level == "State":
+            name = f"{state} {name}"
+        field = rng.choice(FIELDS)
+        content = FIELD_TEMPLATES[field].format(
+            ben=rng.choice(BENEFICIARIES), state=state, inc=rng.choice([1, 2, 2.5, 3, 8]),
+            cat_lower=rng.choice(["SC", "ST", "OBC", "EWS"]), amt=rng.choice([6000, 12000, 25000, 50000]),
+            name=name, level=level, cat=cat)
+        content += " " + FILLER * rng.randint(0, 4)
+        metadata = {"scheme_name": name, "field": field, "level": level, "category": cat, "state": state}
+        yield {"id": i, "source_type": "scheme", "title": name,
+               "content": content, "chunk_metadata": json.dumps(metadata)}
+
+def create_sqlite_corpus(path: Path, n: int, seed: int = 0, echo: bool = False):
+    """Create (or reuse) a SQLite DB at `path` holding n synthetic chunks; return (engine, SessionLocal)."""
+    path = Path(path)
+    fresh = not path.exists()
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    seed_database(engine)
+    engine.echo = echo
+    if fresh:
+        with engine.begin() as conn:
+            insert_chunks(conn, generate_chunks(n, seed))
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+    return engine, SessionLocal
+
+def write_fixtures(path: Path, n: int, seed: int = 0) -> None:
+    """Dump n synthetic chunks as JSONL for DB_BACKEND=sqlite / DB_FIXTURES."""
+    with open(path, "w", encoding="utf-8") as f:
+        for row in generate_chunks(n, seed):
+            f.write(json.dumps(row) + "\n")
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Write a synthetic unified_chunks fixture file")
+    p.add_argument("--size", type=int, default=5000)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", type=Path, required=True)
+    args = p.parse_args()
+    write_fixtures(args.out, args.size, args.seed)
+    print(f"Wrote {args.size} chunks to {args.out}")
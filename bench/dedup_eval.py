@@ -0,0 +1,79 @@
+# bench/dedup_eval.py  (near-duplicate collapse: dedup ratio, index memory, retrieval latency, top-k redundancy)
+#
+#   python -m bench.dedup_eval --size 2000 --thresholds 0.85,0.95
+#
+# For each setting the index is rebuilt from the same corpus. Redundancy is the share of top-k result
+# pairs whose MinHash similarity is >= 0.85 (copies of one text in the prompt); context_chars is the
+# size of the context build_database_context() would send.
+import argparse
+import json
+import tempfile
+import time
+from itertools import combinations
+from pathlib import Path
+import numpy as np
+from app import search, segment_cache, dedup
+from app.agent import build_database_context
+from .classifier_eval import LABELS
+from .common import latency_summary, git_commit
+from .corpus import create_sqlite_corpus
+
+def redundancy(results: list[list[dict]], threshold: float = 0.85) -> float:
+    pairs = dup = 0
+    for chunks in results:
+        if len(chunks) < 2:
+            continue
+        sig = dedup.signatures([c["content"] for c in chunks])
+        for a, b in combinations(range(len(chunks)), 2):
+            pairs += 1
+            dup += (sig[a] == sig[b]).mean() >= threshold
+    return round(dup / pairs, 3) if pairs else 0.0
+
+def run(SessionLocal, queries: list[str], k: int, repeats: int, threshold: float | None) -> dict:
+    dedup.DEDUP_ENABLED = threshold is not None
+    if threshold is not None:
+        dedup.DEDUP_THRESHOLD = threshold
+    search.invalidate_cache()
+    with SessionLocal() as db:
+        t0 = time.perf_counter()
+        search._ensure_cache(db)
+        build_s = time.perf_counter() - t0
+        results = [search.retrieve(q, k=k, db=db) for q in queries]     # also warms the query embeddings
+        samples = []
+        for _ in range(repeats):
+            for q in queries:
+                t = time.perf_counter()
+                search.retrieve(q, k=k, db=db)
+                samples.append(time.perf_counter() - t)
+    out = {"chunks": len(search._cached_docs), "build_s": round(build_s, 2),
+           "index_mb": round((search._cached_mat.nbytes + search._cached_norms.nbytes + search._cached_docs.nbytes()) / 2**20, 2),
+           "latency": latency_summary(samples), "redundancy_at_k": redundancy(results),
+           "context_chars": int(np.mean([len(build_database_context(r)) for r in results]))}
+    if threshold is not None:
+        out["dedup"] = {key: dedup.last_report[key] for key in ("dedup_ratio", "clusters", "largest_cluster", "bytes_saved", "seconds")}
+    return out
+
+def evaluate(size: int, k: int, repeats: int, thresholds: list[float], seed: int = 0, workdir: Path | None = None) -> dict:
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="neethi-bench-"))
+    _, SessionLocal = create_sqlite_corpus(workdir / f"corpus_{size}_{seed}.sqlite", size, seed)
+    segment_cache.SEGMENT_CACHE_ENABLED = False
+    queries = [q for q, _, _ in LABELS]
+    report = {"commit": git_commit(), "corpus_size": size, "k": k, "queries": len(queries),
+              "off": run(SessionLocal, queries, k, repeats, None)}
+    for t in thresholds:
+        report[f"threshold_{t}"] = run(SessionLocal, queries, k, repeats, t)
+    dedup.DEDUP_ENABLED = False
+    search.invalidate_cache()
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--thresholds", default="0.85,0.95")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=Path, default=None)
+    args = parser.parse_args()
+    print(json.dumps(evaluate(args.size, args.k, args.repeats, [float(t) for t in args.thresholds.split(",")],
+                              args.seed, args.workdir), indent=2))
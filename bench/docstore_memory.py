@@ -0,0 +1,54 @@
+# bench/docstore_memory.py  (bytes per chunk: list-of-dicts cache vs columnar DocStore)
+#
+#   python -m bench.docstore_memory --sizes 10000 50000
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from app.docstore import DocStore
+from .corpus import generate_chunks
+
+def _rows(n: int, seed: int):
+    # same shape as the rows _load_docs() reads from unified_chunks
+    for r in generate_chunks(n, seed):
+        yield {"id": r["id"], "source": r["source_type"], "title": r["title"],
+               "content": r["content"], "metadata": r["chunk_metadata"]}
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, peak, elapsed
+
+def bench(n: int, seed: int = 0) -> dict:
+    docs, dict_bytes, dict_peak, dict_s = _measure(lambda: list(_rows(n, seed)))
+    del docs
+    store, store_bytes, store_peak, store_s = _measure(lambda: DocStore.from_rows(_rows(n, seed)))
+    t0 = time.perf_counter()
+    for i in range(0, len(store), max(len(store) // 1000, 1)):
+        store[i]
+    view_us = (time.perf_counter() - t0) / min(len(store), 1000) * 1e6
+    return {
+        "chunks": n,
+        "list_of_dicts_bytes_per_chunk": round(dict_bytes / n, 1),
+        "docstore_bytes_per_chunk": round(store_bytes / n, 1),
+        "docstore_array_bytes_per_chunk": round(store.nbytes() / n, 1),
+        "reduction": round(dict_bytes / store_bytes, 2) if store_bytes else None,
+        "build_peak_mb": {"list_of_dicts": round(dict_peak / 2**20, 1), "docstore": round(store_peak / 2**20, 1)},
+        "build_s": {"list_of_dicts": round(dict_s, 3), "docstore": round(store_s, 3)},
+        "materialise_row_us": round(view_us, 2),
+    }
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Compare chunk cache memory: list of dicts vs DocStore")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+    for n in args.sizes:
+        print(json.dumps(bench(n, args.seed)))
@@ -0,0 +1,76 @@
+# bench/embedding_batching.py  (corpus embedding: fixed batches of 16 + gc vs the memory-budget executor)
+#
+#   python -m bench.embedding_batching --size 2000 --budgets 32,128,512
+#
+# Each configuration runs in a fresh process (ONNX Runtime's arena never shrinks, so peak RSS is
+# only comparable across processes). Reports texts/s, peak RSS, RSS growth over the loaded model,
+# and the max abs difference to the fixed-batch vectors.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from .common import ROOT, git_commit, peak_rss_mb
+from .corpus import create_sqlite_corpus
+
+def child(corpus: Path, mode: str, budget_mb: float, out: Path) -> dict:
+    from sqlalchemy import text
+    from app import search, embed_executor
+    engine, _ = create_sqlite_corpus(corpus, 0)
+    with engine.connect() as conn:
+        texts = [r[0] for r in conn.execute(text("SELECT content FROM unified_chunks ORDER BY id"))]
+    search._embed(["warm up"])
+    base = embed_executor.current_rss()
+    embed_executor.EMBED_BATCHING = mode
+    embed_executor.EMBED_MEMORY_BUDGET_MB = budget_mb
+    t0 = time.perf_counter()
+    vecs = search._embed_corpus(texts)
+    elapsed = time.perf_counter() - t0
+    np.save(out, vecs)
+    report = {"texts": len(texts), "seconds": round(elapsed, 2), "texts_per_s": round(len(texts) / elapsed, 1),
+              "peak_rss_mb": peak_rss_mb(), "rss_growth_mb": round((embed_executor.current_rss() - base) / 2**20, 1)}
+    if mode != "fixed":
+        report["executor"] = {k: embed_executor.last_run[k] for k in ("batches", "batch_min", "batch_max", "padding_ratio",
+                                                                  "scale", "rss_growth_mb")}
+    return report
+
+def run(corpus: Path, mode: str, budget_mb: float, workdir: Path) -> dict:
+    out = workdir / f"{mode}_{budget_mb:g}.npy"
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "LOG_LEVEL": "WARNING"}
+    proc = subprocess.run([sys.executable, "-m", "bench.embedding_batching", "--child", mode, str(budget_mb),
+                           "--corpus", str(corpus), "--out", str(out)],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return {**json.loads(proc.stdout.strip().splitlines()[-1]), "vectors": out}
+
+def evaluate(size: int, budgets: list[float], seed: int = 0, workdir: Path | None = None) -> dict:
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="neethi-bench-"))
+    corpus = workdir / f"corpus_{size}_{seed}.sqlite"
+    create_sqlite_corpus(corpus, size, seed)
+    results = {"fixed_16_gc": run(corpus, "fixed", 0, workdir)}
+    ref = np.load(results["fixed_16_gc"]["vectors"])
+    for b in budgets:
+        r = run(corpus, "adaptive", b, workdir)
+        r["max_abs_diff"] = float(np.abs(np.load(r["vectors"]) - ref).max())
+        results[f"adaptive_{b:g}mb"] = r
+    for r in results.values():
+        r.pop("vectors")
+    return {"commit": git_commit(), "corpus_size": size, "results": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--budgets", default="32,128,512", help="EMBED_MEMORY_BUDGET_MB values")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=Path, default=None)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "BUDGET_MB"), help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--out", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(child(args.corpus, args.child[0], float(args.child[1]), args.out)))
+    else:
+        print(json.dumps(evaluate(args.size, [float(b) for b in args.budgets.split(",")], args.seed, args.workdir), indent=2))
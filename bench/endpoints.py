@@ -0,0 +1,96 @@
+# bench/endpoints.py  (HTTP benchmark of /api/query and /api/agent with a stubbed LLM)
+import argparse
+import json
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from fastapi.testclient import TestClient
+from app import agent, routes, search
+from app.database import DB_ECHO, get_db
+from app.main import app
+from .common import load_queries, latency_summary, peak_rss_mb, git_commit
+from .corpus import create_sqlite_corpus
+
+BENCH_SESSION = "bench-session"
+BENCH_PROFILE = {"session_id": BENCH_SESSION, "state": "Karnataka", "gender": "female",
+                 "social_category": "OBC", "annual_income": "below 1 lakh",
+                 "has_disability": False, "occupation": "student"}
+
+def stub_answer(question: str, context: str) -> str:
+    """Local stand-in for llm.answer: no network, size proportional to the prompt."""
+    return f"[stub] {len(question) + len(context)} prompt chars"
+
+@contextmanager
+def local_app(SessionLocal, llm=stub_answer):
+    """TestClient with get_db pointed at SessionLocal and the Groq call replaced by `llm`."""
+    def _get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    saved = (routes.answer, agent.answer)
+    routes.answer = agent.answer = llm
+    app.dependency_overrides[get_db] = _get_db
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        routes.answer, agent.answer = saved
+        app.dependency_overrides.pop(get_db, None)
+
+def bench_endpoints(size: int, queries: list[str], repeats: int = 1, seed: int = 0,
+                    workdir: Path | None = None) -> dict:
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="neethi-bench-"))
+    engine, SessionLocal = create_sqlite_corpus(workdir / f"corpus_{size}_{seed}.sqlite", size, seed, echo=DB_ECHO)
+    search.invalidate_cache()
+    result = {"corpus_size": size}
+    try:
+        with local_app(SessionLocal) as client:
+            client.post("/api/user/profile", json=BENCH_PROFILE).raise_for_status()
+            client.post("/api/query", json={"q": queries[0]}).raise_for_status()  # builds the cache
+            calls = {
+                "query": lambda q: client.post("/api/query", json={"q": q}),
+                "query_profile": lambda q: client.post("/api/query", json={"q": q, "session_id": BENCH_SESSION}),
+                "agent": lambda q: client.post("/api/agent", json={"question": q, "session_id": BENCH_SESSION}),
+                "profile_get": lambda q: client.get("/api/user/profile", params={"session_id": BENCH_SESSION}),
+            }
+            for name, call in calls.items():
+                samples, errors = [], 0
+                for _ in range(repeats):
+                    for q in queries:
+                        t0 = time.perf_counter()
+                        resp = call(q)
+                        samples.append(time.perf_counter() - t0)
+                        errors += resp.status_code >= 400
+                result[name] = {**latency_summary(samples), "errors": errors}
+        result["peak_rss_mb"] = peak_rss_mb()
+    finally:
+        search.invalidate_cache()
+        engine.dispose()
+    return result
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark HTTP endpoints against a synthetic SQLite corpus")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000])
+    p.add_argument("--queries", type=Path, default=None)
+    p.add_argument("--max-queries", type=int, default=25)
+    p.add_argument("--repeats", type=int, default=1)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--workdir", type=Path, default=None)
+    p.add_argument("--out", type=Path, default=None)
+    args = p.parse_args(argv)
+    queries = load_queries(args.queries, args.max_queries)
+    report = {"commit": git_commit(), "queries": len(queries), "endpoints": []}
+    for size in sorted(args.sizes):
+        res = bench_endpoints(size, queries, args.repeats, args.seed, args.workdir)
+        print(json.dumps(res))
+        report["endpoints"].append(res)
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+    return report
+
+if __name__ == "__main__":
+    main()
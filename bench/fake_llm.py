@@ -0,0 +1,97 @@
+# bench/fake_llm.py  (OpenAI/Groq-compatible chat server with configurable latency and token rate)
+#
+#   python -m bench.fake_llm --port 9000 --latency-ms 400 --tokens-per-s 250 --tokens 300
+#   LLM_BACKEND=groq GROQ_BASE_URL=http://127.0.0.1:9000 uvicorn app.main:app
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "300"))      # time to first token
+TOKENS_PER_S = float(os.getenv("FAKE_LLM_TOKENS_PER_S", "250"))  # decode speed
+TOKENS = int(os.getenv("FAKE_LLM_TOKENS", "300"))                # completion length
+JITTER = float(os.getenv("FAKE_LLM_JITTER", "0.1"))              # +/- fraction applied to latency
+ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))        # fraction of requests answered 503
+
+WORDS = ("Eligibility Benefits Application Process Documents Required applicants must apply online "
+         "through the official portal with Aadhaar income certificate and bank details").split()
+
+app = FastAPI(title="fake-llm")
+stats = {"requests": 0, "errors": 0, "in_flight": 0}
+
+def _completion_tokens(n: int) -> list[str]:
+    return [WORDS[i % len(WORDS)] + " " for i in range(n)]
+
+async def _first_token_delay():
+    delay = LATENCY_MS * (1 + random.uniform(-JITTER, JITTER)) / 1000.0
+    await asyncio.sleep(max(delay, 0))
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        stats["errors"] += 1
+        return JSONResponse(status_code=503, content={"error": {"message": "fake overload"}})
+
+    n_tokens = min(TOKENS, int(body.get("max_tokens") or TOKENS))
+    prompt_chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+    cid, created, model = f"chatcmpl-{uuid.uuid4().hex[:12]}", int(time.time()), body.get("model", "fake")
+    tokens = _completion_tokens(n_tokens)
+    per_token = 1.0 / TOKENS_PER_S if TOKENS_PER_S > 0 else 0.0
+
+    if body.get("stream"):
+        async def gen():
+            stats["in_flight"] += 1
+            try:
+                await _first_token_delay()
+                for tok in tokens:
+                    chunk = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                             "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if per_token:
+                        await asyncio.sleep(per_token)
+                done = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                yield f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n"
+            finally:
+                stats["in_flight"] -= 1
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    stats["in_flight"] += 1
+    try:
+        await _first_token_delay()
+        await asyncio.sleep(per_token * n_tokens)
+    finally:
+        stats["in_flight"] -= 1
+    return {
+        "id": cid, "object": "chat.completion", "created": created, "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                     "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": n_tokens,
+                  "total_tokens": prompt_chars // 4 + n_tokens},
+    }
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+if __name__ == "__main__":
+    import uvicorn
+
+    p = argparse.ArgumentParser(description="Fake Groq/OpenAI chat completions server")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=9000)
+    p.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    p.add_argument("--tokens-per-s", type=float, default=TOKENS_PER_S)
+    p.add_argument("--tokens", type=int, default=TOKENS)
+    p.add_argument("--error-rate", type=float, default=ERROR_RATE)
+    args = p.parse_args()
+    LATENCY_MS, TOKENS_PER_S, TOKENS, ERROR_RATE = args.latency_ms, args.tokens_per_s, args.tokens, args.error_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
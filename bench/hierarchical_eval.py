@@ -0,0 +1,90 @@
+# bench/hierarchical_eval.py  (two-stage centroid search vs the flat scan: work, latency, recall, diversity)
+#
+#   python -m bench.hierarchical_eval --size 10000 --top-groups 4,8,16,32
+#
+# Ranking only: query vectors are embedded once up front and passed to search._rank_rows, so the
+# latency is the scoring path, not ONNX. recall_at_k is the overlap with the flat top-k (the flat
+# scan is the reference, not ground truth). The generated corpus repeats each field template across
+# hundreds of schemes, so many chunks tie on cosine and id overlap understates quality; sim_ratio is the
+# mean cosine of the returned chunks over that of the flat top-k. cap=0 isolates the pruning, cap=2 adds
+# the per-scheme diversity rule. work_ratio = (centroids + chunks scored) / chunks in the index.
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from app import search, segment_cache, hierarchy
+from .classifier_eval import LABELS
+from .common import latency_summary, git_commit
+from .corpus import create_sqlite_corpus
+
+def rank_all(queries, q_vecs, k: int, repeats: int):
+    docs, mat, norms = search._cached_docs, search._cached_mat, search._cached_norms
+    results = [search._rank_rows(q, k, None, docs, mat, norms, q_vec=v) for q, v in zip(queries, q_vecs)]
+    samples = []
+    for _ in range(repeats):
+        for q, v in zip(queries, q_vecs):
+            t = time.perf_counter()
+            search._rank_rows(q, k, None, docs, mat, norms, q_vec=v)
+            samples.append(time.perf_counter() - t)
+    return results, latency_summary(samples)
+
+def mean_sim(results, q_vecs) -> np.ndarray:
+    mat, norms = search._cached_mat, search._cached_norms
+    return np.array([search._cosine_sim_matrix(v, mat[r], norms[r]).mean() for r, v in zip(results, q_vecs)])
+
+def diversity(results, groups: np.ndarray) -> dict:
+    per_query = [np.bincount(groups[r]).max() for r in results if len(r)]
+    return {"mean_distinct_groups": round(float(np.mean([len(set(groups[r].tolist())) for r in results])), 2),
+            "max_per_group": int(max(per_query, default=0))}
+
+def evaluate(size: int, k: int, top_groups: list[int], caps: list[int], repeats: int, seed: int = 0,
+             workdir: Path | None = None) -> dict:
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="neethi-bench-"))
+    _, SessionLocal = create_sqlite_corpus(workdir / f"corpus_{size}_{seed}.sqlite", size, seed)
+    segment_cache.SEGMENT_CACHE_ENABLED = False
+    queries = [q for q, _, _ in LABELS]
+    with SessionLocal() as db:
+        search.invalidate_cache()
+        search._ensure_cache(db)
+        q_vecs = [search.query_vector(q, None, db) for q in queries]
+    docs, mat, norms = search._cached_docs, search._cached_mat, search._cached_norms
+    tree = hierarchy.for_index(docs, mat, norms)
+
+    hierarchy.SEARCH_HIERARCHICAL = False
+    flat, flat_latency = rank_all(queries, q_vecs, k, repeats)
+    flat_sim = mean_sim(flat, q_vecs)
+    report = {"commit": git_commit(), "corpus_size": size, "chunks": len(docs), "groups": len(tree),
+              "mean_group_size": round(len(docs) / max(len(tree), 1), 2), "hierarchy_build_s": tree.build_s,
+              "k": k, "queries": len(queries),
+              "flat": {"latency": flat_latency, "work_ratio": 1.0, **diversity(flat, tree.groups)}}
+    hierarchy.SEARCH_HIERARCHICAL = True
+    for cap in caps:
+        hierarchy.HIER_MAX_PER_GROUP = cap
+        for m in top_groups:
+            hierarchy.HIER_TOP_GROUPS = m
+            hierarchy._work.update(queries=0, rows_scored=0, groups_scored=0, rows_total=0)
+            results, latency = rank_all(queries, q_vecs, k, repeats)
+            recall = np.mean([len(set(a.tolist()) & set(b.tolist())) / max(len(b), 1) for a, b in zip(results, flat)])
+            stats = hierarchy.stats()
+            report[f"top{m}_cap{cap}"] = {"latency": latency, "recall_at_k": round(float(recall), 3),
+                                          "sim_ratio": round(float(np.mean(mean_sim(results, q_vecs) / flat_sim)), 3),
+                                          "mean_rows_scored": stats["mean_rows_scored"],
+                                          "work_ratio": stats["mean_work_ratio"], **diversity(results, tree.groups)}
+    hierarchy.SEARCH_HIERARCHICAL = False
+    search.invalidate_cache()
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--top-groups", default="4,8,16,32")
+    parser.add_argument("--caps", default="0,2", help="HIER_MAX_PER_GROUP values")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=Path, default=None)
+    args = parser.parse_args()
+    print(json.dumps(evaluate(args.size, args.k, [int(m) for m in args.top_groups.split(",")],
+                              [int(c) for c in args.caps.split(",")], args.repeats, args.seed, args.workdir), indent=2))
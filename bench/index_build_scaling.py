@@ -0,0 +1,46 @@
+# bench/index_build_scaling.py  (offline index build: throughput vs worker processes)
+#
+#   python -m bench.index_build_scaling --size 10000 --workers 1,2,4
+#
+# Every run builds the same corpus from scratch into its own directory. Speedup and efficiency are
+# relative to the first entry of --workers; efficiency = speedup / (workers / first workers). Scaling
+# is bounded by the cores visible to this process (reported as "cores").
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+import numpy as np
+from app import index_build, shared_index
+from .common import git_commit
+from .corpus import create_sqlite_corpus
+
+def evaluate(size: int, workers: list[int], part_size: int, seed: int = 0, workdir: Path | None = None) -> dict:
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="neethi-bench-"))
+    engine, _ = create_sqlite_corpus(workdir / f"corpus_{size}_{seed}.sqlite", size, seed)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    results, ref = {}, None
+    for w in workers:
+        out = workdir / f"index_w{w}"
+        r = index_build.build(engine, out, workers=w, part_size=part_size)
+        mat = shared_index.attach(directory=out).mat
+        ref = mat if ref is None else ref
+        results[f"workers_{w}"] = {k: r[k] for k in ("workers", "threads_per_worker", "embed_s", "chunks_per_s", "elapsed_s")}
+        results[f"workers_{w}"]["max_abs_diff"] = float(np.abs(mat - ref).max())
+    base = results[f"workers_{workers[0]}"]
+    for w in workers:
+        r = results[f"workers_{w}"]
+        r["speedup"] = round(r["chunks_per_s"] / base["chunks_per_s"], 2)
+        r["efficiency"] = round(r["speedup"] / (w / workers[0]), 2)
+    return {"commit": git_commit(), "corpus_size": size, "part_size": part_size, "cores": cores, "results": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--part-size", type=int, default=index_build.INDEX_BUILD_PART_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=Path, default=None)
+    args = parser.parse_args()
+    print(json.dumps(evaluate(args.size, [int(w) for w in args.workers.split(",")], args.part_size,
+                              args.seed, args.workdir), indent=2))
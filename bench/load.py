@@ -0,0 +1,134 @@
+# bench/load.py  (async closed-loop load generator for a running API server)
+#
+#   python -m bench.load --url http://127.0.0.1:8000 --concurrency 32 --duration 30 \
+#       --mix query=40,agent=30,profile_get=15,profile_save=10,profile_exists=5
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from pathlib import Path
+import httpx
+from .common import load_queries, latency_summary, git_commit
+
+DEFAULT_MIX = "query=40,agent=30,profile_get=15,profile_save=10,profile_exists=5"
+
+PROFILE_CHOICES = {
+    "state": ["Karnataka", "Tamil Nadu", "Kerala", "Maharashtra", "Bihar", "Uttar Pradesh"],
+    "gender": ["male", "female"],
+    "social_category": ["General", "OBC", "SC", "ST", "EWS"],
+    "annual_income": ["below 1 lakh", "1-3 lakh", "3-8 lakh", "above 8 lakh"],
+    "has_disability": [False, False, False, True],
+    "occupation": ["student", "farmer", "business", "unemployed", "retired"],
+}
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def random_profile(rng: random.Random, session_id: str) -> dict:
+    return {"session_id": session_id, **{k: rng.choice(v) for k, v in PROFILE_CHOICES.items()}}
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, queries: list[str], sessions: int, seed: int = 0):
+        self.client = client
+        self.queries = queries
+        self.sessions = [f"load-{i}" for i in range(sessions)]
+        self.rng = random.Random(seed)
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.status = defaultdict(int)
+
+    def _session(self) -> str:
+        return self.rng.choice(self.sessions)
+
+    async def _call(self, op: str):
+        q, sid = self.rng.choice(self.queries), self._session()
+        if op == "query":
+            return await self.client.post("/api/query", json={"q": q, "session_id": sid})
+        if op == "agent":
+            return await self.client.post("/api/agent", json={"question": q, "session_id": sid})
+        if op == "profile_get":
+            return await self.client.get("/api/user/profile", params={"session_id": sid})
+        if op == "profile_exists":
+            return await self.client.get("/api/user/profile/exists", params={"session_id": sid})
+        if op == "profile_save":
+            return await self.client.post("/api/user/profile", json=random_profile(self.rng, sid))
+        raise ValueError(f"unknown op {op!r}")
+
+    async def seed_profiles(self):
+        await asyncio.gather(*(self.client.post("/api/user/profile", json=random_profile(self.rng, s))
+                               for s in self.sessions))
+
+    async def worker(self, ops: list[str], weights: list[float], deadline: float, budget: list[int]):
+        while time.perf_counter() < deadline and budget[0] != 0:
+            budget[0] -= 1
+            op = self.rng.choices(ops, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                resp = await self._call(op)
+                code = resp.status_code
+            except httpx.HTTPError:
+                code = 0
+            self.samples[op].append(time.perf_counter() - t0)
+            self.status[code] += 1
+            if code == 0 or code >= 400:
+                self.errors[op] += 1
+
+    async def run(self, mix: dict[str, float], concurrency: int, duration: float, max_requests: int = -1) -> dict:
+        ops, weights = list(mix), list(mix.values())
+        budget = [max_requests]  # shared countdown, -1 = unbounded
+        t0 = time.perf_counter()
+        await asyncio.gather(*(self.worker(ops, weights, t0 + duration, budget) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+        total = sum(len(v) for v in self.samples.values())
+        errors = sum(self.errors.values())
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "status": {str(k): v for k, v in sorted(self.status.items())},
+            "overall": latency_summary([s for v in self.samples.values() for s in v]),
+            "per_endpoint": {op: {**latency_summary(self.samples[op]), "errors": self.errors[op]}
+                             for op in ops if self.samples[op]},
+        }
+
+async def amain(args) -> dict:
+    queries = load_queries(args.queries, args.max_queries)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        gen = LoadGenerator(client, queries, args.sessions, args.seed)
+        if not args.no_seed_profiles:
+            await gen.seed_profiles()
+        result = await gen.run(parse_mix(args.mix), args.concurrency, args.duration, args.requests)
+    return {"commit": git_commit(), "url": args.url, "concurrency": args.concurrency,
+            "mix": parse_mix(args.mix), **result}
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Drive /api/query, /api/agent and profile endpoints")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--duration", type=float, default=30.0, help="seconds")
+    p.add_argument("--requests", type=int, default=-1, help="stop after N requests (-1 = duration only)")
+    p.add_argument("--mix", default=DEFAULT_MIX)
+    p.add_argument("--sessions", type=int, default=100)
+    p.add_argument("--queries", type=Path, default=None)
+    p.add_argument("--max-queries", type=int, default=200)
+    p.add_argument("--timeout", type=float, default=120.0)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--no-seed-profiles", action="store_true")
+    p.add_argument("--out", type=Path, default=None)
+    args = p.parse_args(argv)
+    report = asyncio.run(amain(args))
+    print(json.dumps(report, indent=2))
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# bench/logging_overhead.py  (endpoint latency under different logging configurations)
+#
+#   python -m bench.logging_overhead --size 2000
+# Each configuration runs bench.endpoints in a fresh process with stdout going to a file,
+# so handler I/O is real but the terminal does not skew the numbers.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from .common import ROOT, git_commit
+
+CONFIGS = {
+    # the old behaviour: synchronous handler, SQL echo, every chunk preview logged
+    "sync_verbose": {"LOG_ASYNC": "0", "LOG_LEVEL": "DEBUG", "DB_ECHO": "1", "LOG_MAX_CHARS": "0"},
+    # queue handler, same volume
+    "async_verbose": {"LOG_ASYNC": "1", "LOG_LEVEL": "DEBUG", "DB_ECHO": "1"},
+    # queue handler, DEBUG sampled at 5%
+    "async_sampled": {"LOG_ASYNC": "1", "LOG_LEVEL": "DEBUG", "LOG_SAMPLE": "app=0.05,sqlalchemy=0.05"},
+    # shipped defaults
+    "default": {},
+}
+
+def run(name: str, env_overrides: dict, args) -> dict:
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="neethi-logbench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    out = workdir / f"{name}.json"
+    env = {**os.environ, **env_overrides}
+    cmd = [sys.executable, "-m", "bench.endpoints", "--sizes", str(args.size), "--max-queries",
+           str(args.max_queries), "--repeats", str(args.repeats), "--workdir", str(workdir), "--out", str(out)]
+    with open(workdir / f"{name}.log", "wb") as log:
+        subprocess.run(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT, check=True)
+    log_bytes = (workdir / f"{name}.log").stat().st_size
+    res = json.loads(out.read_text())["endpoints"][0]
+    return {"config": name, "log_bytes": log_bytes,
+            **{ep: {k: res[ep][k] for k in ("p50_ms", "p95_ms", "p99_ms")} for ep in ("query", "agent")}}
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Request latency with and without the async logging pipeline")
+    p.add_argument("--size", type=int, default=2000)
+    p.add_argument("--max-queries", type=int, default=25)
+    p.add_argument("--repeats", type=int, default=2)
+    p.add_argument("--configs", nargs="+", default=list(CONFIGS))
+    p.add_argument("--workdir", type=Path, default=None)
+    args = p.parse_args(argv)
+    results = [run(name, CONFIGS[name], args) for name in args.configs]
+    print(json.dumps({"commit": git_commit(), "corpus_size": args.size, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
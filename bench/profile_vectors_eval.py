@@ -0,0 +1,118 @@
+# bench/profile_vectors_eval.py  (profile terms appended to the query text vs stored profile vectors)
+#
+#   python -m bench.profile_vectors_eval --size 2000 --profiles 300 --requests 5000
+#
+# Parity: overlap@k and NDCG@k of each vector weighting against the text-mode ranking, plus
+# profile-match@k (share of scheme hits in the profile's state or, for students, Education).
+# Cache: embedding calls for a random (query, profile) request stream under each mode.
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from app import search, profile_vectors, segment_cache
+from app.docstore import _parse_metadata
+from .classifier_eval import LABELS
+from .common import git_commit
+from .corpus import create_sqlite_corpus
+from .load import random_profile
+
+def _ndcg(got: list[int], ref: list[int]) -> float:
+    gains = {cid: 1.0 / np.log2(i + 2) for i, cid in enumerate(ref)}
+    dcg = sum(gains.get(cid, 0.0) / np.log2(i + 2) for i, cid in enumerate(got))
+    ideal = sum(g / np.log2(i + 2) for i, g in enumerate(sorted(gains.values(), reverse=True)))
+    return dcg / ideal if ideal else 1.0
+
+def _profile_match(chunks: list[dict], profile: dict) -> float:
+    schemes = [_parse_metadata(c.get("metadata")) for c in chunks if c.get("source") == "scheme"]
+    if not schemes:
+        return 0.0
+    student = profile.get("occupation") == "student"
+    return float(np.mean([m.get("state") == profile.get("state") or (student and m.get("category") == "Education")
+                          for m in schemes]))
+
+def _set_mode(mode: str, weight: str = "auto") -> None:
+    profile_vectors.PROFILE_VECTOR_MODE, profile_vectors.PROFILE_VECTOR_WEIGHT = mode, weight
+
+def _clear_caches() -> None:
+    search._embed_query.cache_clear()
+    with profile_vectors._lock:
+        profile_vectors._vectors.clear()
+
+def parity(db, queries: list[str], profiles: list[dict], k: int, weights: list[str]) -> dict:
+    variants = [("text", "auto")] + [("vector", w) for w in weights]
+    ranked = {}
+    for mode, w in variants:
+        _set_mode(mode, w)
+        ranked[(mode, w)] = [(p, search.retrieve(q, k=k, db=db, user_profile=p)) for q in queries for p in profiles]
+    ref = [[c["id"] for c in chunks] for _, chunks in ranked[("text", "auto")]]
+    out = {}
+    for (mode, w), rows in ranked.items():
+        ids = [[c["id"] for c in chunks] for _, chunks in rows]
+        out[mode if mode == "text" else f"vector:{w}"] = {
+            "overlap_at_k": round(float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ids, ref)])), 3),
+            "ndcg_vs_text": round(float(np.mean([_ndcg(a, b) for a, b in zip(ids, ref)])), 3),
+            "profile_match_at_k": round(float(np.mean([_profile_match(c, p) for p, c in rows])), 3),
+        }
+    return out
+
+def cache_stream(queries: list[str], profiles: list[dict], n_requests: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    stream = [(rng.choice(queries), rng.choice(profiles)) for _ in range(n_requests)]
+    out = {}
+    for mode in ("text", "vector"):
+        _set_mode(mode)
+        _clear_caches()
+        computed = 0
+        real_compute = profile_vectors._compute
+
+        def counting_compute(terms_list):
+            nonlocal computed
+            computed += len(terms_list)
+            return real_compute(terms_list)
+
+        profile_vectors._compute = counting_compute
+        try:
+            t0 = time.perf_counter()
+            for q, p in stream:
+                search.query_vector(q, p)
+            elapsed = time.perf_counter() - t0
+        finally:
+            profile_vectors._compute = real_compute
+        info = search._embed_query.cache_info()
+        embeds = info.misses + computed
+        out[mode] = {"embed_calls": embeds, "hit_rate": round(1 - embeds / n_requests, 3),
+                     "us_per_request": round(elapsed / n_requests * 1e6, 1)}
+    return out
+
+def evaluate(size: int, n_profiles: int, n_requests: int, k: int = 5, seed: int = 0,
+             weights: list[str] | None = None, workdir: Path | None = None) -> dict:
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="neethi-bench-"))
+    _, SessionLocal = create_sqlite_corpus(workdir / f"corpus_{size}_{seed}.sqlite", size, seed)
+    search.invalidate_cache()
+    segment_cache.SEGMENT_CACHE_ENABLED = False
+    rng = random.Random(seed)
+    queries = [q for q, _, _ in LABELS]
+    profiles = [random_profile(rng, f"eval-{i}") for i in range(n_profiles)]
+    with SessionLocal() as db:
+        search._ensure_cache(db)
+        report = {"commit": git_commit(), "corpus_size": size, "profiles": n_profiles, "queries": len(queries), "k": k,
+                  "parity": parity(db, queries, profiles[:min(20, n_profiles)], k, weights or ["auto", "0.3", "0.5"]),
+                  "cache": cache_stream(queries, profiles, n_requests, seed)}
+    _set_mode("vector")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--profiles", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--weights", default="auto,0.3,0.5", help="vector-mode weightings to compare")
+    parser.add_argument("--workdir", type=Path, default=None)
+    args = parser.parse_args()
+    print(json.dumps(evaluate(args.size, args.profiles, args.requests, args.k, args.seed,
+                              args.weights.split(","), args.workdir), indent=2))
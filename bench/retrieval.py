@@ -0,0 +1,113 @@
+# bench/retrieval.py  (retrieve() benchmark: build time, latency, QPS, RSS, recall@k)
+import argparse
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+from app import search, segment_cache
+from .common import load_queries, latency_summary, peak_rss_mb, git_commit
+from .corpus import create_sqlite_corpus
+
+def exact_top_k(query: str, k: int) -> list[int]:
+    """Brute-force cosine top-k ids over the whole cached matrix (no re-ranking heuristics)."""
+    q_vec = search._embed([search._enhance_query_for_search(query, None)])[0]
+    sims = search._cosine_sim_matrix(q_vec, search._cached_mat, search._cached_norms)
+    top = np.argsort(sims)[-k:][::-1]
+    return [int(i) for i in search._cached_docs.ids[top]]
+
+def measure_build(SessionLocal) -> float:
+    search.invalidate_cache()
+    with SessionLocal() as db:
+        t0 = time.perf_counter()
+        search._ensure_cache(db)
+        return time.perf_counter() - t0
+
+def measure_latency(SessionLocal, queries: list[str], k: int, repeats: int = 1) -> list[float]:
+    samples = []
+    with SessionLocal() as db:
+        for _ in range(repeats):
+            for q in queries:
+                t0 = time.perf_counter()
+                search.retrieve(q, k=k, db=db)
+                samples.append(time.perf_counter() - t0)
+    return samples
+
+def measure_qps(SessionLocal, queries: list[str], k: int, threads: int, repeats: int = 1) -> float:
+    work = queries * repeats
+
+    def one(q):
+        with SessionLocal() as db:
+            search.retrieve(q, k=k, db=db)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        t0 = time.perf_counter()
+        list(pool.map(one, work))
+        elapsed = time.perf_counter() - t0
+    return len(work) / elapsed if elapsed > 0 else float("inf")
+
+def measure_recall(SessionLocal, queries: list[str], k: int) -> float:
+    recalls = []
+    with SessionLocal() as db:
+        for q in queries:
+            got = {d["id"] for d in search.retrieve(q, k=k, db=db)}
+            exact = exact_top_k(q, k)
+            recalls.append(len(got.intersection(exact)) / max(len(exact), 1))
+    return float(np.mean(recalls)) if recalls else 0.0
+
+def bench_size(size: int, queries: list[str], k: int = 5, max_threads: int = 4,
+               repeats: int = 1, seed: int = 0, workdir: Path | None = None) -> dict:
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="neethi-bench-"))
+    db_path = workdir / f"corpus_{size}_{seed}.sqlite"
+    engine, SessionLocal = create_sqlite_corpus(db_path, size, seed)
+    try:
+        build_s = measure_build(SessionLocal)
+        # first query pays ONNX warm-up; keep it out of the percentiles
+        with SessionLocal() as db:
+            search.retrieve(queries[0], k=k, db=db)
+        result = {
+            "corpus_size": size,
+            "cache_build_s": round(build_s, 3),
+            "latency": latency_summary(measure_latency(SessionLocal, queries, k, repeats)),
+            "qps": {str(t): round(measure_qps(SessionLocal, queries, k, t, repeats), 2)
+                    for t in range(1, max_threads + 1)},
+            f"recall@{k}": round(measure_recall(SessionLocal, queries, k), 4),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    finally:
+        search.invalidate_cache()
+        engine.dispose()
+    return result
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmark app.search.retrieve on synthetic corpora")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    p.add_argument("--queries", type=Path, default=None, help="JSONL query log (default: requests.jsonl)")
+    p.add_argument("--max-queries", type=int, default=50)
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--threads", type=int, default=4, help="measure QPS at 1..N threads")
+    p.add_argument("--repeats", type=int, default=1)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--workdir", type=Path, default=None, help="where corpus DBs are created/reused")
+    p.add_argument("--segment-cache", action="store_true",
+                   help="leave the profile-segment result cache on (off by default so repeats measure scoring)")
+    p.add_argument("--out", type=Path, default=None, help="write JSON report here")
+    return p
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    segment_cache.SEGMENT_CACHE_ENABLED = args.segment_cache
+    queries = load_queries(args.queries, args.max_queries)
+    report = {"commit": git_commit(), "queries": len(queries), "k": args.k, "retrieve": []}
+    # ascending sizes so the RSS high-water mark is attributable to the current size
+    for size in sorted(args.sizes):
+        res = bench_size(size, queries, args.k, args.threads, args.repeats, args.seed, args.workdir)
+        print(json.dumps(res))
+        report["retrieve"].append(res)
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+    return report
+
+if __name__ == "__main__":
+    main()
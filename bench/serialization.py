@@ -0,0 +1,87 @@
+# bench/serialization.py  (response encoding time and bytes on the wire, per representative payload)
+#
+#   python -m bench.serialization --size 2000 --repeat 2000
+#
+# Payloads are built from the synthetic corpus: an /agent answer with k source previews, a /query
+# answer, a profile read and a recommendations list. Encoders: FastAPI's default path
+# (jsonable_encoder + json.dumps), jsonable_encoder + orjson (a dict returned from a route with
+# ORJSONResponse as the default class), and orjson alone (a route returning ORJSONResponse).
+# Bytes are reported raw, gzip and (if installed) brotli at the levels CompressionMiddleware uses.
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+from starlette.responses import JSONResponse
+from app import responses
+from app.models import UserProfile
+from .common import git_commit
+from .corpus import create_sqlite_corpus
+from .load import random_profile
+
+ANSWER_WORDS = "eligible applicants must submit the form with income certificate caste proof and bank details".split()
+
+def _answer(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(ANSWER_WORDS) for _ in range(words))
+
+def payloads(db, k: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    chunks = db.execute(text("SELECT id, source_type AS source, title, content FROM unified_chunks LIMIT :k"), {"k": k}).all()
+    profile = UserProfile(**{key: v for key, v in random_profile(rng, "bench-1").items()
+                             if key in UserProfile.__table__.columns})
+    return {
+        "agent": {"answer": _answer(rng, 350), "category": "SCHEME", "file": None, "sources": [
+            {"id": c.id, "title": c.title, "type": c.source, "field": "general", "scheme": c.title,
+             "content_preview": c.content[:100] + "..." if len(c.content) > 100 else c.content} for c in chunks]},
+        "query": {"answer": _answer(rng, 250), "sources": [c.source for c in chunks],
+                  "matches": [{"id": c.id, "title": c.title} for c in chunks]},
+        "profile": {"success": True, "profile": profile.to_dict()},
+        "recommendations": {"success": True, "computed_at": "2026-01-01T00:00:00", "recommendations": [
+            {"rank": i + 1, "chunk_id": c.id, "scheme_name": c.title, "title": c.title, "category": "Education",
+             "level": "state", "score": rng.random()} for i, c in enumerate(chunks)]},
+    }
+
+ENCODERS = {
+    "default": lambda p: JSONResponse(jsonable_encoder(p)).body,
+    "encoder+orjson": lambda p: responses.ORJSONResponse(jsonable_encoder(p)).body,
+    "orjson": lambda p: responses.ORJSONResponse(p).body,
+}
+
+def measure(payload: dict, repeat: int) -> dict:
+    out = {}
+    for name, encode in ENCODERS.items():
+        encode(payload)
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            body = encode(payload)
+        out[name + "_us"] = round((time.perf_counter() - t0) / repeat * 1e6, 1)
+    encodings = ["gzip"] + (["br"] if responses.brotli is not None else [])
+    out["bytes"] = {"raw": len(body), **{e: len(responses.compress(body, e)) for e in encodings}}
+    for e in encodings:
+        t0 = time.perf_counter()
+        for _ in range(max(repeat // 10, 1)):
+            responses.compress(body, e)
+        out[e + "_us"] = round((time.perf_counter() - t0) / max(repeat // 10, 1) * 1e6, 1)
+    return out
+
+def evaluate(size: int, k: int, repeat: int, seed: int = 0, workdir: Path | None = None) -> dict:
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="neethi-bench-"))
+    _, SessionLocal = create_sqlite_corpus(workdir / f"corpus_{size}_{seed}.sqlite", size, seed)
+    with SessionLocal() as db:
+        built = payloads(db, k, seed)
+    return {"commit": git_commit(), "k": k, "repeat": repeat, "brotli": responses.brotli is not None,
+            "compress_min_bytes": responses.COMPRESS_MIN_BYTES,
+            "payloads": {name: measure(p, repeat) for name, p in built.items()}}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5, help="sources / matches per answer")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=Path, default=None)
+    args = parser.parse_args()
+    print(json.dumps(evaluate(args.size, args.k, args.repeat, args.seed, args.workdir), indent=2))
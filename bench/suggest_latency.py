@@ -0,0 +1,113 @@
+# bench/suggest_latency.py  (/api/suggest: prefix index build time, size, per-keystroke latency, hit rate)
+#
+#   python -m bench.suggest_latency --sizes 10000,100000 --names 200
+#
+# For each corpus size the index is built from a DocStore of generated chunks (no embedding). The
+# workloads replay typing sampled scheme names: every keystroke prefix, the full name respelled
+# ("Yojana" -> "Yojna", "sh" -> "s", "v" -> "w", doubled letters), and the full name with two adjacent
+# letters swapped. hit@k is the share of full-name queries whose intended name is in the top k.
+# The HTTP run goes through the FastAPI app on the smallest corpus.
+import argparse
+import json
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+from app import suggest
+from app.docstore import DocStore
+from .common import latency_summary, git_commit
+from .corpus import create_sqlite_corpus, generate_chunks
+
+RESPELL = [(r"Yojana", "Yojna"), (r"sh", "s"), (r"v", "w"), (r"Kisan", "Kissan"), (r"ee", "i"),
+           (r"Pradhan Mantri", "Pradhanmantri"), (r"a\b", "aa")]
+
+def respell(name: str) -> str:
+    for pattern, repl in RESPELL:
+        name = re.sub(pattern, repl, name)
+    return name
+
+def swap_typo(name: str, rng: random.Random) -> str:
+    spots = [i for i in range(1, len(name) - 2) if name[i].isalpha() and name[i + 1].isalpha() and name[i] != name[i + 1]]
+    if not spots:
+        return name
+    i = rng.choice(spots)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+def docstore(size: int, seed: int) -> DocStore:
+    return DocStore.from_rows({"id": r["id"], "source": r["source_type"], "title": r["title"],
+                               "content": "", "metadata": r["chunk_metadata"]} for r in generate_chunks(size, seed))
+
+def timed(idx, queries: list[str], k: int, repeats: int = 3):
+    samples, results = [], []
+    for rep in range(repeats):
+        for q in queries:
+            t = time.perf_counter()
+            r = idx.lookup(q, k)
+            samples.append(time.perf_counter() - t)
+            if rep == 0:
+                results.append(r)
+    return latency_summary(samples), results
+
+def hit_rate(targets: list[str], results: list[list[dict]]) -> float:
+    hits = sum(any(suggest.fold(s["text"]) == suggest.fold(t) for s in r) for t, r in zip(targets, results))
+    return round(hits / len(targets), 3) if targets else 0.0
+
+def run_size(size: int, n_names: int, k: int, seed: int) -> dict:
+    docs = docstore(size, seed)
+    t0 = time.perf_counter()
+    idx = suggest.SuggestIndex(suggest.names_from_docs(docs))
+    build_s = time.perf_counter() - t0
+    rng = random.Random(seed)
+    names = [n for n, kind in zip(idx.names, idx.kinds) if kind == "scheme"]
+    sample = rng.sample(names, min(n_names, len(names)))
+    keystrokes = [n[:i] for n in sample for i in range(1, len(n) + 1)]
+    respelled = [respell(n) for n in sample]
+    typos = [swap_typo(n, rng) for n in sample]
+    out = {"chunks": size, "names": len(idx), "keys": len(idx.folded_keys) + len(idx.sound_keys),
+           "index_kb": round(idx.nbytes() / 1024, 1), "build_s": round(build_s, 3)}
+    for label, queries, targets in (("keystrokes", keystrokes, None), ("exact", sample, sample),
+                                    ("respelled", respelled, sample), ("typo", typos, sample)):
+        latency, results = timed(idx, queries, k)
+        out[label] = {"latency": latency}
+        if targets:
+            out[label][f"hit_at_{k}"] = hit_rate(targets, results)
+    return out
+
+def run_http(size: int, n_names: int, seed: int, workdir: Path) -> dict:
+    from .endpoints import local_app
+    _, SessionLocal = create_sqlite_corpus(workdir / f"corpus_{size}_{seed}.sqlite", size, seed)
+    rng = random.Random(seed)
+    with local_app(SessionLocal) as client:
+        with SessionLocal() as db:          # the handler rebuilds on app.database's session, not the override
+            suggest.current(db)
+        client.get("/api/suggest", params={"q": "warm"})
+        names = [s["text"] for s in client.get("/api/suggest", params={"q": "a", "limit": 20}).json()["suggestions"]]
+        queries = [n[:rng.randint(1, len(n))] for n in names for _ in range(max(n_names // max(len(names), 1), 1))]
+        samples, server = [], []
+        for q in queries:
+            t = time.perf_counter()
+            r = client.get("/api/suggest", params={"q": q}).json()
+            samples.append(time.perf_counter() - t)
+            server.append(r["took_ms"] / 1000)
+    return {"chunks": size, "requests": len(queries), "client_latency": latency_summary(samples),
+            "handler_latency": latency_summary(server)}
+
+def evaluate(sizes: list[int], n_names: int, k: int, seed: int = 0, http: bool = True, workdir: Path | None = None) -> dict:
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="neethi-bench-"))
+    report = {"commit": git_commit(), "k": k, "sizes": {str(s): run_size(s, n_names, k, seed) for s in sizes}}
+    if http:
+        report["http"] = run_http(min(sizes), n_names, seed, workdir)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--names", type=int, default=200, help="scheme names sampled per workload")
+    parser.add_argument("--k", type=int, default=suggest.SUGGEST_LIMIT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-http", action="store_true")
+    parser.add_argument("--workdir", type=Path, default=None)
+    args = parser.parse_args()
+    print(json.dumps(evaluate([int(s) for s in args.sizes.split(",")], args.names, args.k, args.seed,
+                              not args.no_http, args.workdir), indent=2))
@@ -0,0 +1,70 @@
+# tests/test_actions.py  (FormStore: LRU eviction, spill before drop, bounded key map, spill expiry)
+import os
+import time
+import threading
+from app import actions
+from app.actions import FormStore
+
+def wait_for(cond, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_janitor_runs_from_construction(tmp_path):
+    store = FormStore(max_bytes=10_000, spill_dir=tmp_path)
+    assert store._janitor.is_alive()
+
+def test_evicted_form_stays_readable_until_spilled(tmp_path, monkeypatch):
+    gate = threading.Event()
+    spill = FormStore._spill
+    def held_spill(self, digest, body):
+        gate.wait(5)
+        spill(self, digest, body)
+    monkeypatch.setattr(FormStore, "_spill", held_spill)
+    store = FormStore(max_bytes=600, spill_dir=tmp_path)
+    first = store.form_for("education", "PM Kisan")
+    store.form_for("health", "Ayushman")               # evicts the first
+    assert store.stats()["evicted"] == 1 and store.stats()["spilling"] == 1
+    assert not (tmp_path / f"{first}.json").exists()
+    assert store.get(first) == actions.build_form_template("education", "PM Kisan")
+    gate.set()
+    wait_for(lambda: store.stats()["spilling"] == 0)
+    assert (tmp_path / f"{first}.json").exists()
+    assert store.get(first) == actions.build_form_template("education", "PM Kisan")
+    assert store.stats()["spill_reads"] == 1
+
+def test_key_map_only_holds_resident_forms(tmp_path):
+    store = FormStore(max_bytes=2_000, spill_dir=tmp_path)
+    for i in range(50):
+        store.form_for("general", f"scheme {i}")
+    stats = store.stats()
+    assert stats["keys"] == stats["entries"] < 50
+    assert set(store._digests.values()) == set(store._blobs)
+
+def test_evicted_key_is_rebuilt_and_served(tmp_path):
+    store = FormStore(max_bytes=600, spill_dir=tmp_path)
+    first = store.form_for("education", "A")
+    store.form_for("health", "B")
+    assert store.form_for("education", "A") == first
+    assert store.stats()["built"] == 3
+
+def test_unknown_or_malformed_digest(tmp_path):
+    store = FormStore(spill_dir=tmp_path)
+    assert store.get("0" * 64) is None
+    assert store.get("../../etc/passwd") is None
+
+def test_cleanup_expires_and_caps_spill_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(actions, "FORMS_SPILL_MAX_FILES", 2)
+    monkeypatch.setattr(actions, "FORMS_SPILL_TTL_S", 3600)
+    store = FormStore(spill_dir=tmp_path)
+    old = time.time() - 7200
+    for i in range(5):
+        p = tmp_path / f"{i:064x}.json"
+        p.write_text("{}")
+        if i == 0:
+            os.utime(p, (old, old))
+        else:
+            os.utime(p, (old + 3600 + i, old + 3600 + i))
+    assert store.cleanup() == 3
+    assert sorted(p.name[-6] for p in tmp_path.glob("*.json")) == ["3", "4"]
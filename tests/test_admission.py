@@ -0,0 +1,63 @@
+# tests/test_admission.py  (LLM admission slots held by streamed answers)
+import gc
+import time
+import asyncio
+import pytest
+from app import admission, routes, singleflight
+from app.admission import AdmissionController, Overloaded, SlotStream
+
+@pytest.fixture
+def gate(monkeypatch):
+    g = AdmissionController(max_concurrency=1, queue_size=0, per_session=4, timeout_s=0.05)
+    monkeypatch.setattr(routes, "llm_gate", g)
+    return g
+
+def test_slot_is_taken_at_open_and_freed_when_exhausted(gate):
+    s = SlotStream(gate, "a", 1, lambda: iter(["x", "y"]))
+    assert gate.stats()["active"] == 1
+    assert list(s) == ["x", "y"]
+    assert gate.stats()["active"] == 0
+
+def test_shed_stream_fails_before_the_response_starts(gate):
+    s = SlotStream(gate, "a", 1, lambda: iter(["x"]))
+    with pytest.raises(Overloaded):
+        SlotStream(gate, "b", 1, lambda: iter(["x"]))
+    s.close()
+
+def test_dropping_an_unstarted_stream_frees_the_slot(gate):
+    s = iter(SlotStream(gate, "a", 1, lambda: iter(["x"])))
+    del s
+    gc.collect()
+    assert gate.stats()["active"] == 0
+
+def test_failing_upstream_frees_the_slot_once(gate):
+    def broken():
+        yield "x"
+        raise RuntimeError("upstream closed")
+    s = SlotStream(gate, "a", 1, broken)
+    with pytest.raises(RuntimeError):
+        list(s)
+    s.close()
+    assert gate.stats()["active"] == 0
+    assert list(s) == []                 # a released stream does not run without a slot
+
+@pytest.mark.parametrize("coalesce", [False, True])
+def test_client_dropped_before_the_first_delta(gate, monkeypatch, coalesce):
+    monkeypatch.setattr(singleflight, "SINGLEFLIGHT_ENABLED", coalesce)
+    monkeypatch.setattr(routes, "_query_context", lambda request, db: ([], "ctx", False))
+    monkeypatch.setattr(routes, "answer_stream", lambda q, context: iter(["a", "b"]))
+    response = routes.query_stream(routes.QueryRequest(q="pension"), db=None)
+
+    async def head_then_disconnect():
+        body = response.body_iterator
+        head = await body.__anext__()    # head line sent, then the client goes away
+        await body.aclose()
+        return head
+    assert '"sources"' in asyncio.run(head_then_disconnect())
+    del response
+    gc.collect()
+    deadline = time.monotonic() + 2      # with coalescing, the pump drains on its own thread
+    while gate.stats()["active"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert gate.stats()["active"] == 0
+    assert gate.stats()["admitted"] == 1
@@ -0,0 +1,40 @@
+# tests/test_classifier.py  (nearest-centroid scoring and the CLASSIFIER_CONTENT_WEIGHT blend)
+import numpy as np
+import pytest
+from app import classifier, search
+from app.classifier import NearestCentroid
+
+CATEGORY = NearestCentroid(["SCHEME", "CONSTITUTION", "GENERAL"], np.eye(3, 4, dtype=np.float32))
+FORM = NearestCentroid([True, False], np.eye(2, 4, dtype=np.float32))
+
+@pytest.fixture
+def vectors(monkeypatch):
+    looked_up = []
+    def chunk_vectors(ids):
+        looked_up.append(list(ids))
+        return np.tile(np.array([1, 0, 0, 0], dtype=np.float32), (len(ids), 1))   # chunks look like SCHEME
+    monkeypatch.setattr(classifier, "_models", (CATEGORY, FORM))
+    monkeypatch.setattr(search, "query_vector", lambda q, profile=None: np.array([0.2, 0.5, 0, 0], dtype=np.float32))
+    monkeypatch.setattr(search, "chunk_vectors", chunk_vectors)
+    return monkeypatch, looked_up
+
+def test_predict_is_nearest_centroid():
+    assert CATEGORY.predict(np.array([0, 0, 3, 0], dtype=np.float32)) == "GENERAL"
+    assert list(CATEGORY.scores(np.zeros(4, dtype=np.float32))) == [0, 0, 0]
+
+def test_default_weight_reads_the_question_only(vectors):
+    monkeypatch, looked_up = vectors
+    monkeypatch.setattr(classifier, "CONTENT_WEIGHT", 0.0)
+    assert classifier.classify_category("what does article 21 say", [{"id": 1}, {"id": 2}]) == "CONSTITUTION"
+    assert looked_up == []
+
+def test_content_weight_blends_in_the_chunks(vectors):
+    monkeypatch, looked_up = vectors
+    monkeypatch.setattr(classifier, "CONTENT_WEIGHT", 0.7)
+    assert classifier.classify_category("what does article 21 say", [{"id": 1}, {"id": 2}]) == "SCHEME"
+    assert looked_up == [[1, 2]]
+
+def test_no_chunks_falls_back_to_the_question(vectors):
+    monkeypatch, _ = vectors
+    monkeypatch.setattr(classifier, "CONTENT_WEIGHT", 0.7)
+    assert classifier.classify_category("what does article 21 say", []) == "CONSTITUTION"
@@ -0,0 +1,70 @@
+# tests/test_conversation.py  (turn store: LRU, TTL expiry, SQLite persistence; follow-up planning; history)
+import time
+import numpy as np
+import pytest
+from app import conversation
+from app.conversation import ConversationStore, Turn, history, plan, summarize
+
+def vec(*xs):
+    return np.array(xs, dtype=np.float32)
+
+def turn(q: str, v, ts: float = None, ids=(1, 2)) -> Turn:
+    return Turn(q, f"answer to {q}", ids, v, time.time() if ts is None else ts)
+
+def test_turns_are_capped_and_ordered():
+    store = ConversationStore(max_turns=2, db_path="")
+    for q in ("a", "b", "c"):
+        store.append("s", turn(q, vec(1, 0)))
+    assert [t.question for t in store.turns("s")] == ["b", "c"]
+
+def test_sessions_are_lru_evicted():
+    store = ConversationStore(max_sessions=2, db_path="")
+    store.append("s1", turn("a", vec(1, 0)))
+    store.append("s2", turn("b", vec(1, 0)))
+    store.turns("s1")                                  # s2 is now the least recently used
+    store.append("s3", turn("c", vec(1, 0)))
+    assert store.stats()["sessions"] == 2 and store.counters["evicted"] == 1
+    assert list(store._sessions) == ["s1", "s3"]
+
+def test_expired_turns_are_hidden():
+    store = ConversationStore(ttl_s=60, db_path="")
+    store.append("s", turn("old", vec(1, 0), ts=time.time() - 120))
+    store.append("s", turn("new", vec(1, 0)))
+    assert [t.question for t in store.turns("s")] == ["new"]
+
+def test_sqlite_is_shared_and_pruned(tmp_path):
+    path = str(tmp_path / "conv.sqlite")
+    a = ConversationStore(max_turns=2, db_path=path)
+    b = ConversationStore(max_turns=2, db_path=path)     # another worker on the same file
+    for q in ("q1", "q2", "q3"):
+        a.append("s", turn(q, vec(0.6, 0.8)))
+    seen = b.turns("s")
+    assert [t.question for t in seen] == ["q2", "q3"]
+    assert np.allclose(seen[0].q_vec, vec(0.6, 0.8)) and seen[0].chunk_ids == [1, 2]
+    assert a._db.execute("SELECT COUNT(*) FROM conversation_turns").fetchone()[0] == 2
+    b.forget("s")
+    assert a.turns("s") == []
+
+def test_sqlite_skips_expired_rows(tmp_path):
+    store = ConversationStore(ttl_s=60, db_path=str(tmp_path / "conv.sqlite"))
+    store.append("s", turn("old", vec(1, 0), ts=time.time() - 120))
+    assert store.turns("s") == []
+
+def test_plan_modes():
+    turns = [turn("pm kisan benefits", vec(1, 0, 0))]
+    assert plan("anything", vec(1, 0, 0), [])[0] == "fresh"
+    mode, v, reused = plan("pm kisan benefits?", vec(0.99, 0.01, 0), turns)
+    assert mode == "reuse" and reused is turns[0]
+    mode, v, _ = plan("documents needed", vec(0.6, 0.8, 0), turns)
+    assert mode == "blend" and np.isclose(np.linalg.norm(v), 1.0)
+    assert plan("what is article 21 of the constitution about", vec(0, 0, 1), turns)[0] == "fresh"
+    assert plan("how do I apply for it", vec(0, 0, 1), turns)[0] == "blend"          # anaphora
+
+def test_summarize_and_history_limits():
+    answer = "First sentence here. Second sentence is longer and goes on. Third one."
+    assert summarize(answer, limit=40) == "First sentence here."
+    assert summarize("word " * 20, limit=22).endswith("…")
+    turns = [turn(f"q{i}", vec(1, 0)) for i in range(5)]
+    text = history(turns, limit=60)
+    assert text.startswith("Q: q3") and text.endswith("answer to q4")
+    assert history(turns[:1], limit=1) == "Q: q0\nA: answer to q0"          # the latest turn always fits
@@ -0,0 +1,58 @@
+# tests/test_dedup.py  (MinHash/LSH clustering and the DocStore collapse)
+import json
+import numpy as np
+from app import dedup
+from app.docstore import DocStore
+
+BOILERPLATE = ("the applicant must be a resident of the state and submit an income certificate issued "
+               "by the competent authority along with aadhaar and bank account details to the district office")
+
+def test_identical_texts_have_identical_signatures():
+    sig = dedup.signatures([BOILERPLATE, BOILERPLATE, "something else entirely about pensions"])
+    assert (sig[0] == sig[1]).all() and not (sig[0] == sig[2]).all()
+
+def test_rows_per_band_threshold():
+    r = dedup.rows_per_band(0.85, 64)
+    assert 64 % r == 0 and (r / 64) ** (1 / r) <= 0.85
+
+def test_clusters_respect_groups_and_threshold():
+    texts = [BOILERPLATE, BOILERPLATE + " in karnataka", "fundamental rights under article 21 of the constitution",
+             BOILERPLATE]
+    labels = dedup.clusters(texts, threshold=0.8)
+    assert labels[0] == labels[1] == labels[3] == 0 and labels[2] == 2
+    # the same text in another source type never merges
+    labels = dedup.clusters(texts, groups=np.array([0, 0, 0, 1]), threshold=0.8)
+    assert labels[3] == 3
+
+def rows():
+    return [
+        {"id": 1, "source": "scheme", "title": "Central", "content": BOILERPLATE,
+         "metadata": {"scheme_name": "Awas", "level": "Central"}},
+        {"id": 2, "source": "scheme", "title": "Bihar", "content": BOILERPLATE + " in bihar",
+         "metadata": {"scheme_name": "Awas Bihar", "level": "State", "state": "Bihar"}},
+        {"id": 3, "source": "scheme", "title": "Other", "content": "pension for widows above sixty years of age",
+         "metadata": {}},
+    ]
+
+def test_collapse_keeps_highest_quality_member_with_variants():
+    docs = DocStore.from_rows(rows(), quality_fn=lambda text: 2.0 if text.endswith("bihar") else 1.0)
+    out, report = dedup.collapse(docs, threshold=0.8)
+    assert list(out.ids) == [2, 3]
+    meta = json.loads(out[0]["metadata"])
+    assert meta["variant_count"] == 1
+    assert meta["variants"] == [{"id": 1, "title": "Central", "scheme_name": "Awas", "level": "Central"}]
+    assert list(out.quality) == [2.0, 1.0]
+    assert report["collapsed"] == 1 and report["chunks_out"] == 2 and report["largest_cluster"] == 2
+
+def test_collapse_ties_go_to_lowest_id(monkeypatch):
+    monkeypatch.setattr(dedup, "DEDUP_MAX_VARIANTS", 0)
+    docs = DocStore.from_rows(rows())
+    out, _ = dedup.collapse(docs, threshold=0.8)
+    assert list(out.ids) == [1, 3]
+    meta = json.loads(out[0]["metadata"])
+    assert meta["variants"] == [] and meta["variant_count"] == 1      # refs capped, count kept
+
+def test_nothing_to_collapse():
+    docs = DocStore.from_rows(rows()[2:])
+    out, report = dedup.collapse(docs)
+    assert len(out) == 1 and report["collapsed"] == 0 and report["dedup_ratio"] == 0.0
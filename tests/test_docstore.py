@@ -0,0 +1,54 @@
+# tests/test_docstore.py  (columnar chunk store: row round trip, interned columns, serialisation)
+import json
+import numpy as np
+from app.docstore import DocStore, _parse_metadata
+
+ROWS = [
+    {"id": 10, "source": "scheme", "title": "PM Kisan", "content": "किसान सम्मान निधि: ₹6000 a year",
+     "metadata": {"scheme_name": "PM Kisan", "level": "Central", "category": "Agriculture"}},
+    {"id": 11, "source": "scheme", "title": "Scholarship", "content": "post matric scholarship",
+     "metadata": json.dumps({"scheme_name": "Post Matric", "level": "State", "category": "Education"})},
+    {"id": 12, "source": "act", "title": "Article 21", "content": "", "metadata": None},
+]
+
+def store() -> DocStore:
+    return DocStore.from_rows(ROWS, quality_fn=lambda text: 0.5 + len(text) / 1000)
+
+def test_rows_round_trip():
+    docs = store()
+    assert len(docs) == 3 and list(docs.ids) == [10, 11, 12]
+    assert docs[0]["content"] == ROWS[0]["content"]                     # multi-byte UTF-8 survives
+    assert json.loads(docs[0]["metadata"]) == ROWS[0]["metadata"]        # dict metadata is stored as JSON
+    assert docs[1]["metadata"] == ROWS[1]["metadata"]
+    assert docs[-1] == {"id": 12, "source": "act", "title": "Article 21", "content": "", "metadata": None}
+    assert [d["id"] for d in docs[1:]] == [11, 12]
+
+def test_interned_columns_and_lookup():
+    docs = store()
+    assert docs.value("source", 1) == "scheme" and docs.code("source", "act") == 1
+    assert docs.code("level", "District") == -1
+    state = docs.columns["level"] == docs.code("level", "State")
+    assert list(state) == [False, True, False]
+    edu = docs.table_mask("category", lambda c: "education" in str(c).lower())
+    assert list(edu[docs.columns["category"]]) == [False, True, False]
+    assert docs.metadata(2) == {}
+
+def test_quality_and_byte_lengths():
+    docs = store()
+    assert np.allclose(docs.quality, [0.5 + len(r["content"]) / 1000 for r in ROWS])
+    assert list(docs.contents.byte_lengths()) == [len(r["content"].encode("utf-8")) for r in ROWS]
+
+def test_sections_round_trip():
+    docs = store()
+    copy = DocStore.from_sections(dict(docs.sections()), docs.tables)
+    assert [copy[i] for i in range(3)] == [docs[i] for i in range(3)]
+    assert copy.nbytes() == docs.nbytes() > 0
+
+def test_empty():
+    docs = DocStore.empty()
+    assert len(docs) == 0 and list(docs.contents) == []
+
+def test_parse_metadata_tolerates_garbage():
+    assert _parse_metadata("not json") == {}
+    assert _parse_metadata("[1, 2]") == {}
+    assert _parse_metadata({"a": 1}) == {"a": 1}
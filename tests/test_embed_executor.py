@@ -0,0 +1,68 @@
+# tests/test_embed_executor.py  (length-bucketed corpus embedding against a fake session/tokenizer)
+import numpy as np
+import pytest
+from app import embed_executor
+from app.embed_executor import batch_size_for, embed_corpus, estimate_bytes
+
+class FakeTokenizer:
+    pad_token_id = 0
+
+    def __call__(self, texts, truncation, max_length, **kwargs):
+        # one token per word; token id = word length, so the pooled vector encodes the text
+        return {"input_ids": [[len(w) for w in t.split()][:max_length] for t in texts]}
+
+class FakeInput:
+    name = "input_ids"
+
+class FakeSession:
+    def __init__(self):
+        self.shapes = []
+
+    def get_inputs(self):
+        return [FakeInput()]
+
+    def run(self, outputs, feeds):
+        ids = feeds["input_ids"]
+        self.shapes.append(ids.shape)
+        hidden = np.zeros(ids.shape + (384,), dtype=np.float32)
+        hidden[..., 0] = ids
+        hidden[..., 1] = 1.0
+        return [hidden]
+
+def expected(text: str) -> np.ndarray:
+    v = np.zeros(384, dtype=np.float32)
+    v[0], v[1] = np.mean([len(w) for w in text.split()]), 1.0
+    return v
+
+TEXTS = ["a bb ccc", "dddd", "e " * 40, "ff gg", "hhh iii jjj kkk lll"]
+
+def test_rows_match_input_order_and_ignore_padding():
+    sess = FakeSession()
+    out = embed_corpus(TEXTS, sess=sess, tok=FakeTokenizer())
+    assert out.shape == (5, 384)
+    assert np.allclose(out, np.stack([expected(t) for t in TEXTS]))
+
+def test_batches_pad_to_their_own_length():
+    sess = FakeSession()
+    embed_corpus(TEXTS, max_batch=2, sess=sess, tok=FakeTokenizer())
+    assert [s[1] for s in sess.shapes] == [2, 5, 40]      # lengths 1,2 | 3,5 | 40, sorted by length
+    assert embed_executor.last_run["batches"] == 3 and embed_executor.last_run["batch_max"] == 2
+
+def test_budget_limits_batch_size():
+    assert batch_size_for(128, budget=estimate_bytes(3, 128), scale=1.0) == 3
+    assert batch_size_for(128, budget=estimate_bytes(3, 128), scale=2.0) == 1
+    assert batch_size_for(8, budget=1, scale=1.0) == 1                # never below one
+    assert batch_size_for(8, budget=1e12, scale=1.0, max_batch=64) == 64
+
+def test_rss_growth_shrinks_later_batches(monkeypatch):
+    rss = iter([0] + [2**30] * 100)                              # huge growth after the first batch
+    monkeypatch.setattr(embed_executor, "current_rss", lambda: next(rss))
+    texts = ["w " * 10] * 8
+    sess = FakeSession()
+    embed_corpus(texts, budget_mb=estimate_bytes(4, 10) / 2**20, sess=sess, tok=FakeTokenizer())
+    sizes = [s[0] for s in sess.shapes]
+    assert sizes[0] == 4 and max(sizes[1:]) < 4 and sum(sizes) == 8
+    assert embed_executor.last_run["scale"] > 1.0
+
+def test_empty_corpus():
+    assert embed_corpus([], sess=FakeSession(), tok=FakeTokenizer()).shape == (0, 384)
@@ -0,0 +1,66 @@
+# tests/test_hierarchy.py  (grouping, centroid selection with widening, per-group cap with backfill)
+import json
+import numpy as np
+import pytest
+from app import hierarchy
+from app.docstore import DocStore
+from app.hierarchy import Hierarchy, diversify, group_codes
+
+def index():
+    # 3 "Kisan" chunks along axis 0, 2 "Awas" along axis 1, 2 untitled-scheme articles along axis 2
+    rows, vecs = [], []
+    for i, (scheme, title, axis) in enumerate([("Kisan", "a", 0), ("Kisan", "b", 0), ("Kisan", "c", 0),
+                                               ("Awas", "d", 1), ("Awas", "e", 1),
+                                               (None, "Article 21", 2), (None, "Article 21", 2)]):
+        rows.append({"id": i + 1, "source": "scheme", "title": title, "content": f"chunk {i}",
+                     "metadata": json.dumps({"scheme_name": scheme} if scheme else {})})
+        v = np.full(4, 0.05, dtype=np.float32)
+        v[axis] = 1.0 + 0.1 * i
+        vecs.append(v)
+    mat = np.stack(vecs)
+    return DocStore.from_rows(rows), mat, np.linalg.norm(mat, axis=1).astype(np.float32)
+
+def test_groups_by_scheme_else_title():
+    docs, _, _ = index()
+    groups, names = group_codes(docs)
+    assert sorted(names) == ["Article 21", "Awas", "Kisan"]
+    by_name = {names[g]: int((groups == g).sum()) for g in set(groups.tolist())}
+    assert by_name == {"Kisan": 3, "Awas": 2, "Article 21": 2}
+
+def test_centroids_are_unit_and_select_best_group():
+    docs, mat, norms = index()
+    h = Hierarchy(docs, mat, norms)
+    assert np.allclose(np.linalg.norm(h.centroids, axis=1), 1.0)
+    rows, chosen = h.select(np.array([0, 1, 0, 0], dtype=np.float32), top_groups=1, min_rows=1)
+    assert [h.names[c] for c in chosen] == ["Awas"] and sorted(rows.tolist()) == [3, 4]
+
+def test_select_widens_to_min_rows():
+    docs, mat, norms = index()
+    h = Hierarchy(docs, mat, norms)
+    rows, chosen = h.select(np.array([0, 1, 0, 0], dtype=np.float32), top_groups=1, min_rows=4)
+    assert len(chosen) == 2 and len(rows) >= 4 and h.names[chosen[0]] == "Awas"
+
+def test_diversify_caps_then_backfills():
+    ranked = np.array([10, 11, 12, 13, 14])
+    groups = np.array([0, 0, 0, 1, 0])
+    assert diversify(ranked, groups, 3, cap=2).tolist() == [10, 11, 13]
+    assert diversify(ranked, groups, 4, cap=1).tolist() == [10, 13, 11, 12]    # short -> rank-order backfill
+    assert diversify(ranked, groups, 2, cap=0).tolist() == [10, 11]
+
+def test_for_index_is_cached_per_snapshot(monkeypatch):
+    monkeypatch.setattr(hierarchy, "_current", None)
+    docs, mat, norms = index()
+    first = hierarchy.for_index(docs, mat, norms)
+    assert hierarchy.for_index(docs, mat, norms) is first
+    other = DocStore.from_sections(dict(docs.sections()), docs.tables)
+    assert hierarchy.for_index(other, mat, norms) is not first
+
+def test_candidate_rows_tracks_work(monkeypatch):
+    monkeypatch.setattr(hierarchy, "_current", None)
+    monkeypatch.setattr(hierarchy, "_work", {"queries": 0, "rows_scored": 0, "groups_scored": 0, "rows_total": 0})
+    monkeypatch.setattr(hierarchy, "HIER_TOP_GROUPS", 1)
+    docs, mat, norms = index()
+    _, rows = hierarchy.candidate_rows(np.array([1, 0, 0, 0], dtype=np.float32), 1, docs, mat, norms)
+    assert sorted(rows.tolist()) == [0, 1, 2]
+    stats = hierarchy.stats()
+    assert stats["queries"] == 1 and stats["mean_rows_scored"] == 3.0 and stats["groups"] == 3
@@ -0,0 +1,46 @@
+# tests/test_prewarm.py  (readiness only after the required steps succeed)
+import pytest
+from app import prewarm
+
+def boom(*args):
+    raise RuntimeError("boom")
+
+@pytest.fixture
+def steps(monkeypatch, tmp_path):
+    monkeypatch.setattr(prewarm, "_ready", type(prewarm._ready)())
+    monkeypatch.setattr(prewarm, "state", {"status": "pending", "runs": 0})
+    monkeypatch.setattr(prewarm, "PREWARM_TRAFFIC_LOG", str(tmp_path / "none.jsonl"))
+    for name, fn in {"warm_db_pool": lambda: 1, "warm_index": lambda db: 10, "warm_suggest": lambda db: 5,
+                     "warm_model": lambda: [], "replay": lambda db, pairs: 0}.items():
+        monkeypatch.setattr(prewarm, name, fn)
+    return monkeypatch
+
+def test_all_steps_ok_is_ready(steps):
+    result = prewarm.run()
+    assert result["status"] == "ready" and result["failed"] == []
+    assert prewarm.ready()
+
+def test_best_effort_failure_is_ready_and_reported(steps):
+    steps.setattr(prewarm, "warm_model", boom)
+    result = prewarm.run()
+    assert prewarm.ready()
+    assert result["failed"] == ["model"] and "RuntimeError" in result["steps"]["model"]["error"]
+
+@pytest.mark.parametrize("name", ["warm_db_pool", "warm_index"])
+def test_required_failure_is_not_ready(steps, name):
+    steps.setattr(prewarm, name, boom)
+    result = prewarm.run()
+    assert result["status"] == "failed" and not prewarm.ready()
+    steps.setattr(prewarm, name, lambda *a: 1)
+    assert prewarm.run()["status"] == "ready" and prewarm.ready()
+
+def test_no_session_fails_the_index_step(steps):
+    from app import database
+    steps.setattr(database, "SessionLocal", boom)
+    result = prewarm.run()
+    assert result["failed"] == ["index"] and not prewarm.ready()
+
+def test_startup_is_opt_in(steps):
+    steps.setattr(prewarm, "PREWARM_ON_STARTUP", False)
+    prewarm.start_background()
+    assert prewarm.ready() and prewarm.status()["status"] == "skipped"
@@ -0,0 +1,60 @@
+# tests/test_recommendations.py  (segment grouping, scheme de-duplication, sweep replaces the previous run)
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import recommendations, search
+from app.models import SchemeRecommendation, UserProfile
+from app.recommendations import group_by_segment, lookup, sweep, top_schemes
+
+PROFILES = [("s1", "Bihar", "farmer"), ("s2", "Bihar", "farmer"), ("s3", "Goa", "student"),
+            ("s4", "Bihar", "farmer"), ("s5", None, None)]
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    UserProfile.__table__.create(engine)
+    SchemeRecommendation.__table__.create(engine)
+    with sessionmaker(bind=engine)() as session:
+        session.add_all(UserProfile(session_id=sid, state=state, occupation=occ) for sid, state, occ in PROFILES)
+        session.commit()
+        yield session
+
+def chunk(i: int, name: str, source: str = "scheme"):
+    return {"id": i, "source": source, "title": f"title {i}", "metadata": f'{{"scheme_name": "{name}", "level": "State"}}'}
+
+def test_profiles_collapse_to_segments_across_pages(db):
+    representative, members, seen = group_by_segment(db, page_size=2)
+    assert seen == 5 and len(representative) == 3
+    assert sorted(len(m) for m in members.values()) == [1, 1, 3]
+    farmers = next(m for m in members.values() if len(m) == 3)
+    assert farmers == ["s1", "s2", "s4"]
+
+def test_top_schemes_keeps_one_chunk_per_scheme():
+    chunks = [chunk(1, "A"), chunk(2, "A"), chunk(3, "faq", source="faq"), chunk(4, "B"), chunk(5, "C")]
+    out = top_schemes(chunks, top_n=2)
+    assert [(r["chunk_id"], r["scheme_name"], r["level"]) for r in out] == [(1, "A", "State"), (4, "B", "State")]
+
+def test_sweep_writes_every_member_and_drops_old_runs(db, monkeypatch):
+    ranked = []
+    def rank(profiles, query, top_n):
+        ranked.extend(profiles)
+        return [top_schemes([chunk(10, "A"), chunk(11, "B"), chunk(12, "C")], top_n) for _ in profiles]
+    monkeypatch.setattr(search, "_ensure_cache", lambda db: None)
+    monkeypatch.setattr(search, "index_generation", lambda: 7)
+    monkeypatch.setattr(recommendations, "rank_segments", rank)
+    db.add(SchemeRecommendation(session_id="s1", run_id=1, rank=1, chunk_id=99, scheme_name="stale"))
+    db.commit()
+
+    report = sweep(db, workers=0, top_n=2, batch=2)
+    assert len(ranked) == 3                                   # one representative per segment
+    assert report["profiles"] == 5 and report["segments"] == 3 and report["rows"] == 10
+    assert report["index_generation"] == 7
+    assert db.query(SchemeRecommendation).filter(SchemeRecommendation.run_id == 1).count() == 0
+    assert [(r.rank, r.scheme_name) for r in lookup(db, "s4")] == [(1, "A"), (2, "B")]
+    assert lookup(db, "nobody") == []
+
+def test_lookup_reads_only_the_latest_run(db):
+    db.add_all([SchemeRecommendation(session_id="s1", run_id=1, rank=r, chunk_id=r, scheme_name=f"old{r}") for r in (1, 2, 3)]
+               + [SchemeRecommendation(session_id="s1", run_id=2, rank=r, chunk_id=r, scheme_name=f"new{r}") for r in (2, 1)])
+    db.commit()
+    assert [r.scheme_name for r in lookup(db, "s1")] == ["new1", "new2"]
@@ -0,0 +1,180 @@
+# tests/test_resilience.py  (circuit breaker state machine and Guard probe bookkeeping)
+import asyncio
+import time
+import pytest
+import threading
+from app import resilience
+from app.resilience import CircuitBreaker, CircuitOpen, Guard, Hedger
+
+def transient(e: BaseException) -> bool:
+    return isinstance(e, ConnectionError)
+
+def make_guard(breaker: CircuitBreaker, deadline_s: float = 5.0) -> Guard:
+    return Guard("test", breaker, transient, attempts=1, base_ms=1, max_ms=1, deadline_s=deadline_s)
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.on_failure()
+
+def test_opens_after_consecutive_failures():
+    b = CircuitBreaker("db", failure_threshold=3, reset_timeout_s=60)
+    for _ in range(2):
+        b.before_call()
+        b.on_failure()
+    assert b.state == "closed"
+    b.before_call()
+    b.on_failure()
+    assert b.state == "open"
+    with pytest.raises(CircuitOpen):
+        b.before_call()
+    assert b.snapshot()["rejected"] == 1
+
+def test_success_resets_failure_count():
+    b = CircuitBreaker("db", failure_threshold=2, reset_timeout_s=60)
+    b.before_call()
+    b.on_failure()
+    b.before_call()
+    b.on_success()
+    b.before_call()
+    b.on_failure()
+    assert b.state == "closed"
+
+def test_half_open_allows_one_probe_then_closes():
+    b = CircuitBreaker("db", failure_threshold=1, reset_timeout_s=0.01)
+    open_breaker(b)
+    time.sleep(0.02)
+    b.before_call()                      # the probe
+    assert b.state == "half_open"
+    with pytest.raises(CircuitOpen):
+        b.before_call()                  # only one probe at a time
+    b.on_success()
+    assert b.state == "closed"
+    b.before_call()
+
+def test_failed_probe_reopens():
+    b = CircuitBreaker("db", failure_threshold=1, reset_timeout_s=0.01)
+    open_breaker(b)
+    time.sleep(0.02)
+    b.before_call()
+    b.on_failure()
+    assert b.state == "open"
+    with pytest.raises(CircuitOpen):
+        b.before_call()
+
+def test_interrupted_probe_frees_the_slot():
+    b = CircuitBreaker("db", failure_threshold=1, reset_timeout_s=0.01)
+    guard = make_guard(b)
+    open_breaker(b)
+    time.sleep(0.02)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        guard.call(interrupted)
+    assert b.state == "half_open"
+    assert guard.call(lambda: "ok") == "ok"      # a new probe is allowed and closes the breaker
+    assert b.state == "closed"
+
+def test_cancelled_async_probe_frees_the_slot():
+    b = CircuitBreaker("db", failure_threshold=1, reset_timeout_s=0.01)
+    guard = make_guard(b)
+    open_breaker(b)
+    time.sleep(0.02)
+
+    async def scenario():
+        task = asyncio.create_task(guard.acall(asyncio.sleep, 10))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await guard.acall(asyncio.sleep, 0, "ok")
+
+    assert asyncio.run(scenario()) == "ok"
+    assert b.state == "closed"
+
+def test_deadline_is_not_a_dependency_failure():
+    b = CircuitBreaker("db", failure_threshold=1, reset_timeout_s=60)
+    guard = make_guard(b, deadline_s=0.01)
+    with pytest.raises(TimeoutError):
+        asyncio.run(guard.acall(asyncio.sleep, 1))
+    assert b.state == "closed"
+    assert b.snapshot().get("failures", 0) == 0
+    assert guard.snapshot()["deadline_exceeded"] == 1
+
+def test_transient_errors_open_the_breaker_through_guard():
+    b = CircuitBreaker("db", failure_threshold=2, reset_timeout_s=60)
+    guard = make_guard(b)
+
+    def down():
+        raise ConnectionError("refused")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            guard.call(down)
+    with pytest.raises(CircuitOpen):
+        guard.call(down)
+
+def test_non_transient_error_counts_as_success():
+    b = CircuitBreaker("db", failure_threshold=1, reset_timeout_s=60)
+    guard = make_guard(b)
+
+    def bad_query():
+        raise ValueError("syntax")
+
+    with pytest.raises(ValueError):
+        guard.call(bad_query)
+    assert b.state == "closed"
+
+# ---------- hedged reads ----------
+@pytest.fixture
+def hedge_slots(monkeypatch):
+    def set_idle(n: int) -> None:
+        monkeypatch.setattr(resilience, "_hedge_idle", threading.BoundedSemaphore(max(n, 1)))
+        if n == 0:
+            resilience._hedge_idle.acquire()
+    return set_idle
+
+def test_hedge_wins_when_the_primary_is_slow(hedge_slots):
+    hedge_slots(2)
+    h, calls = Hedger("t", min_ms=10), []
+
+    def read():
+        calls.append(1)
+        time.sleep(1.0 if len(calls) == 1 else 0)
+        return len(calls)
+    t0 = time.monotonic()
+    assert h.call(read) == 2
+    assert time.monotonic() - t0 < 0.9
+    assert h.snapshot()["hedge_won"] == 1
+
+def test_busy_pool_runs_the_read_inline(hedge_slots):
+    hedge_slots(0)
+    h, caller = Hedger("t"), threading.current_thread()
+    assert h.call(lambda: threading.current_thread() is caller)
+    assert h.snapshot()["inline"] == 1 and h.snapshot().get("hedged", 0) == 0
+
+def test_no_hedge_without_an_idle_worker(hedge_slots):
+    hedge_slots(1)
+    h, calls = Hedger("t", min_ms=10), []
+
+    def read():
+        calls.append(1)
+        time.sleep(0.3)
+        return "primary"
+    assert h.call(read) == "primary"
+    assert len(calls) == 1 and h.snapshot()["hedge_skipped_busy"] == 1
+
+def test_pool_size_does_not_cap_concurrent_reads(hedge_slots):
+    hedge_slots(2)
+    h, n = Hedger("t", min_ms=5000), 12
+    barrier = threading.Barrier(n, timeout=5)    # only completes if all n reads run at once
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(h.call(barrier.wait))) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert len(results) == n
+    assert h.snapshot()["calls"] == n
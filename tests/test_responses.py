@@ -0,0 +1,81 @@
+# tests/test_responses.py  (encoding negotiation, compression middleware, per-encoding ETags)
+import gzip
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app import responses
+from app.responses import CompressionMiddleware, conditional, etag_for, negotiate
+
+PAYLOAD = {"items": [{"id": i, "text": "scheme eligibility " * 4} for i in range(40)]}
+ETAG = etag_for("payload", 1)
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/doc")
+    def doc(request: Request):
+        return conditional(request, ETAG, lambda: PAYLOAD)
+
+    @app.get("/small")
+    def small(request: Request):
+        return conditional(request, ETAG, lambda: {"ok": True})
+    return TestClient(app)
+
+def get(client, path, encoding, **headers):
+    return client.get(path, headers={"Accept-Encoding": encoding, **headers})
+
+def test_negotiate_prefers_q_values():
+    assert negotiate("gzip;q=1, br;q=0.5") == "gzip"
+    assert negotiate("identity") is None
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("*") in ("br", "gzip")
+
+def test_identity_keeps_plain_etag(client):
+    r = get(client, "/doc", "identity")
+    assert "content-encoding" not in r.headers
+    assert r.headers["etag"] == ETAG
+
+def test_gzip_gets_suffixed_etag_and_vary(client):
+    r = get(client, "/doc", "gzip")
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["etag"] == ETAG[:-1] + '-gzip"'
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert r.json() == PAYLOAD
+
+def test_below_minimum_is_not_compressed_and_keeps_tag(client):
+    r = get(client, "/small", "gzip")
+    assert "content-encoding" not in r.headers
+    assert r.headers["etag"] == ETAG and "Accept-Encoding" in r.headers["vary"]
+
+def test_revalidating_compressed_copy_gets_304_with_its_tag(client):
+    tag = get(client, "/doc", "gzip").headers["etag"]
+    r = get(client, "/doc", "gzip", **{"If-None-Match": tag})
+    assert r.status_code == 304 and r.content == b""
+    assert r.headers["etag"] == tag and "Accept-Encoding" in r.headers["vary"]
+
+def test_revalidating_identity_copy(client):
+    r = get(client, "/doc", "identity", **{"If-None-Match": ETAG})
+    assert r.status_code == 304 and r.headers["etag"] == ETAG
+    r = get(client, "/doc", "gzip", **{"If-None-Match": ETAG})
+    assert r.status_code == 304 and r.headers["etag"] == ETAG
+
+def test_stale_tag_gets_full_body(client):
+    r = get(client, "/doc", "gzip", **{"If-None-Match": '"other-gzip"'})
+    assert r.status_code == 200 and r.json() == PAYLOAD
+
+def test_disabled(client, monkeypatch):
+    monkeypatch.setattr(responses, "COMPRESS_ENABLED", False)
+    r = get(client, "/doc", "gzip")
+    assert "content-encoding" not in r.headers and r.headers["etag"] == ETAG
+
+def test_compress_gzip_is_deterministic():
+    body = b"x" * 4096
+    assert responses.compress(body, "gzip") == responses.compress(body, "gzip")
+    assert gzip.decompress(responses.compress(body, "gzip")) == body
+
+def test_etag_suffix_helpers():
+    assert responses.etag_with_encoding('W/"a"', "br") == 'W/"a-br"'
+    assert responses.strip_encoding('"a-br"') == '"a"'
+    assert responses.strip_encoding('"a-b"') == '"a-b"'
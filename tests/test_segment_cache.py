@@ -0,0 +1,89 @@
+# tests/test_segment_cache.py  (LRU + generation invalidation, bounded per-segment stats, no caching of fallbacks)
+import numpy as np
+import pytest
+from app import search, segment_cache
+from app.docstore import DocStore
+from app.segment_cache import OTHER_SEGMENTS, SegmentCache, segment_of
+
+NONE = ("", False, False)
+
+def test_hit_after_put_with_normalised_query():
+    cache = SegmentCache(maxsize=4)
+    assert cache.get(NONE, "PM  Kisan", 3, 1) is None
+    cache.put(NONE, "pm kisan", 3, 1, np.array([4, 2]))
+    assert cache.get(NONE, " PM Kisan ", 3, 1) == [4, 2]
+    assert cache.get(NONE, "pm kisan", 5, 1) is None          # k is part of the key
+    report = cache.report()
+    assert report["hits"] == 1 and report["misses"] == 2
+
+def test_lru_eviction():
+    cache = SegmentCache(maxsize=2)
+    for q in ("a", "b"):
+        cache.put(NONE, q, 3, 1, [1])
+    cache.get(NONE, "a", 3, 1)                                 # b is now the oldest
+    cache.put(NONE, "c", 3, 1, [1])
+    assert cache.get(NONE, "b", 3, 1) is None
+    assert cache.get(NONE, "a", 3, 1) == [1] and cache.get(NONE, "c", 3, 1) == [1]
+
+def test_new_generation_drops_entries():
+    cache = SegmentCache()
+    cache.put(NONE, "a", 3, 1, [1])
+    assert cache.get(NONE, "a", 3, 2) is None
+    assert cache.report()["entries"] == 0 and cache.report()["generation"] == 2
+
+def test_per_segment_stats_are_bounded(monkeypatch):
+    monkeypatch.setattr(segment_cache, "SEGMENT_STATS_MAX", 3)
+    cache = SegmentCache()
+    for i in range(10):
+        cache.get((f"terms {i}", False, False), "q", 3, 1)
+    cache.get(("terms 0", False, False), "q", 3, 1)
+    labels = {s["segment"]: s["misses"] for s in cache.report()["segments"]}
+    assert len(labels) == 4
+    assert labels["terms 0"] == 2 and labels[segment_cache.segment_label(OTHER_SEGMENTS)] == 7
+    assert cache.report()["misses"] == 11
+
+def test_segment_projection_ignores_unranked_fields():
+    a = {"state": "Bihar", "occupation": "farmer", "age": 40, "income": 1}
+    b = dict(a, age=25, income=999999)
+    assert segment_of(a) == segment_of(b)
+    assert segment_of(None) == segment_of({}) == NONE
+
+@pytest.fixture
+def tiny_index(monkeypatch):
+    docs = DocStore.from_rows({"id": i, "source": "scheme", "title": f"t{i}", "content": f"chunk {i}",
+                               "metadata": "{}"} for i in range(1, 5))
+    mat = np.eye(4, dtype=np.float32)
+    monkeypatch.setattr(search, "INDEX_MODE", "local")
+    monkeypatch.setattr(search, "_ensure_cache", lambda db: None)
+    monkeypatch.setattr(search, "_cached_docs", docs)
+    monkeypatch.setattr(search, "_cached_mat", mat)
+    monkeypatch.setattr(search, "_cached_norms", np.ones(4, dtype=np.float32))
+    monkeypatch.setattr(search, "_cache_generation", 7)
+    monkeypatch.setattr(segment_cache, "SEGMENT_CACHE_ENABLED", True)
+    monkeypatch.setattr(segment_cache, "cache", SegmentCache())
+    return monkeypatch
+
+@pytest.mark.parametrize("fallback", [False, True])
+def test_fallback_results_are_served_but_not_cached(tiny_index, fallback):
+    calls = []
+    def rank(query, k, profile, docs, mat, norms):
+        calls.append(query)
+        return np.array([2, 0]), fallback
+    tiny_index.setattr(search, "_rank", rank)
+    first = search.retrieve("which scheme", k=2, db=object())
+    assert [c["id"] for c in first] == [3, 1]
+    again = search.retrieve("which scheme", k=2, db=object())
+    assert again == first
+    assert len(calls) == (2 if fallback else 1)
+    assert search.served_from_cache() is (not fallback)
+
+@pytest.mark.parametrize("scores, fallback", [(None, True), (np.array([0.0, 5.0, 1.0, 2.0]), False)])
+def test_rank_reports_rerank_fallback(tiny_index, scores, fallback):
+    from app import rerank
+    tiny_index.setattr(rerank, "enabled", lambda: True)
+    tiny_index.setattr(rerank, "score", lambda query, passages: None if scores is None else scores[:len(passages)])
+    tiny_index.setattr(search.hierarchy, "enabled", lambda: False)
+    q_vec = np.array([0.1, 0.9, 0.2, 0.3], dtype=np.float32)
+    rows, was_fallback = search._rank("q", 2, None, search._cached_docs, search._cached_mat,
+                                      search._cached_norms, q_vec)
+    assert was_fallback is fallback and len(rows) == 2
@@ -0,0 +1,101 @@
+# tests/test_sharding.py  (shard RPC error replies, ownership on stop, partitioning, scatter with a failed shard)
+import threading
+import numpy as np
+import pytest
+from multiprocessing.connection import Listener
+from sqlalchemy import create_engine, text
+from app import sharding
+from app.docstore import DocStore
+from app.sharding import ShardClient, ShardCluster, ShardServer, partition
+
+KEY = b"test-key"
+
+def make_server(n: int = 4) -> ShardServer:
+    server = ShardServer.__new__(ShardServer)            # skip reload(): no DB
+    server.shard, server.of, server.by, server.generation = 0, 1, "id", 1
+    server._lock = threading.Lock()
+    server.docs = DocStore.from_rows({"id": i, "source": "scheme", "title": f"t{i}", "content": f"chunk {i}",
+                                      "metadata": "{}"} for i in range(1, n + 1))
+    server.mat = np.eye(n, dtype=np.float32)
+    server.norms = np.ones(n, dtype=np.float32)
+    return server
+
+@pytest.fixture
+def shard():
+    server = make_server()
+    listener = Listener(("127.0.0.1", 0), authkey=KEY)
+    threading.Thread(target=server.serve, args=(listener.address, listener), daemon=True).start()
+    return server, ShardClient(listener.address, KEY)
+
+def test_search_and_ping(shard):
+    server, client = shard
+    hits = client.call(("search", np.array([0, 1, 0, 0], dtype=np.float32), 1, None), timeout_s=5)
+    assert hits[0][3]["id"] == 2 and len(hits) == 3
+    assert client.call(("ping",), timeout_s=5)["chunks"] == 4
+
+def test_failed_request_gets_error_reply_and_connection_survives(shard):
+    server, client = shard
+    with pytest.raises(RuntimeError, match="shard 0: TypeError"):
+        client.call(("search", "not a vector"), timeout_s=5)     # missing args -> TypeError in the shard
+    assert client._pool.qsize() == 1                             # connection went back to the pool
+    with pytest.raises(ValueError, match="unknown op"):
+        client.call(("drop_tables",), timeout_s=5)
+    assert client.call(("ping",), timeout_s=5)["shard"] == 0
+    assert client._pool.qsize() == 1
+
+def test_scatter_skips_failing_shard(shard, monkeypatch):
+    server, good = shard
+    broken = make_server()
+    broken.search = lambda *a: 1 / 0
+    listener = Listener(("127.0.0.1", 0), authkey=KEY)
+    threading.Thread(target=broken.serve, args=(listener.address, listener), daemon=True).start()
+    monkeypatch.setattr(sharding, "SHARD_AUTHKEY", KEY.decode())
+    cluster = ShardCluster([good.address, listener.address], spawn=False)
+    cluster._started = True
+    results = cluster.scatter(("search", np.array([1, 0, 0, 0], dtype=np.float32), 1, None))
+    assert results[0][0][3]["id"] == 1 and results[1] is None
+    failed = cluster.clients[1]
+    assert not failed.healthy and failed.errors == 1 and "ZeroDivisionError" in failed.last_error
+
+class FakeProcess:
+    def __init__(self, alive=True):
+        self.alive, self.terminated = alive, False
+
+    def is_alive(self):
+        return self.alive
+
+    def terminate(self):
+        self.terminated = True
+
+def test_stop_only_terminates_shards_this_process_bound(monkeypatch):
+    monkeypatch.setattr(sharding, "SHARD_AUTHKEY", KEY.decode())
+    cluster = ShardCluster([("127.0.0.1", 1), ("127.0.0.1", 2)], spawn=False)
+    mine, lost_bind = FakeProcess(), FakeProcess()
+    bound, not_bound = threading.Event(), threading.Event()
+    bound.set()
+    cluster._procs = [(mine, bound), (lost_bind, not_bound)]
+    cluster.stop()
+    assert mine.terminated and not lost_bind.terminated
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE unified_chunks (id INTEGER PRIMARY KEY, source_type TEXT, content TEXT)"))
+        for i, source in enumerate(["scheme", "faq", "scheme", "act", "faq", "scheme", "act"], start=10):
+            conn.execute(text("INSERT INTO unified_chunks VALUES (:i, :s, 'x')"), {"i": i, "s": source})
+    with engine.connect() as conn:
+        yield conn
+
+@pytest.mark.parametrize("by", ["id", "source"])
+def test_partitions_cover_every_chunk_once(db, by):
+    seen = []
+    for shard in range(3):
+        where, params = partition(db, shard, 3, by)
+        seen += [r[0] for r in db.execute(text(f"SELECT id FROM unified_chunks WHERE {where}"), params)]
+    assert sorted(seen) == list(range(10, 17))
+
+def test_remote_shards_require_a_key(monkeypatch):
+    monkeypatch.setattr(sharding, "SHARD_AUTHKEY", "")
+    with pytest.raises(RuntimeError, match="SHARD_AUTHKEY"):
+        sharding.authkey(local=False)
@@ -0,0 +1,59 @@
+# tests/test_shared_index.py  (publish/attach round trip and the fingerprint check in attach_or_build)
+import numpy as np
+import pytest
+from app import shared_index
+from app.docstore import DocStore
+
+def corpus(n: int = 3):
+    docs = DocStore.from_rows({"id": i, "source": "scheme", "title": f"t{i}", "content": f"chunk {i}",
+                               "metadata": "{}"} for i in range(1, n + 1))
+    mat = np.arange(n * 4, dtype=np.float32).reshape(n, 4)
+    return docs, mat, np.linalg.norm(mat, axis=1).astype(np.float32)
+
+def counting(n: int = 3):
+    calls = []
+    def build():
+        calls.append(1)
+        return corpus(n)
+    return build, calls
+
+def test_round_trip_is_zero_copy(tmp_path):
+    docs, mat, norms = corpus()
+    gen = shared_index.publish(docs, mat, norms, directory=tmp_path, meta={"model": "m1"})
+    idx = shared_index.attach(directory=tmp_path)
+    assert idx.generation == gen == 1
+    assert np.array_equal(idx.mat, mat) and not idx.mat.flags.writeable
+    assert list(idx.docs.ids) == [1, 2, 3] and idx.docs[1]["content"] == "chunk 2"
+    assert idx.header["meta"] == {"model": "m1"}
+
+def test_attach_or_build_builds_once(tmp_path):
+    build, calls = counting()
+    fp = {"model": "m1", "corpus": "3:3:21:0"}
+    first = shared_index.attach_or_build(build, directory=tmp_path, fingerprint=fp)
+    second = shared_index.attach_or_build(build, directory=tmp_path, fingerprint=fp)
+    assert len(calls) == 1
+    assert first.generation == second.generation == 1
+    assert second.header["meta"]["model"] == "m1"
+
+@pytest.mark.parametrize("changed", ["model", "corpus"])
+def test_attach_or_build_rebuilds_on_fingerprint_mismatch(tmp_path, changed):
+    build, calls = counting()
+    fp = {"model": "m1", "corpus": "3:3:21:0"}
+    shared_index.attach_or_build(build, directory=tmp_path, fingerprint=fp)
+    idx = shared_index.attach_or_build(build, directory=tmp_path, fingerprint=dict(fp, **{changed: "other"}))
+    assert len(calls) == 2
+    assert idx.generation == 2 and idx.header["meta"][changed] == "other"
+    assert shared_index.current_generation(tmp_path) == 2
+
+def test_file_without_fingerprint_is_rebuilt(tmp_path):
+    shared_index.publish(*corpus(), directory=tmp_path)         # e.g. published before fingerprints existed
+    build, calls = counting(5)
+    idx = shared_index.attach_or_build(build, directory=tmp_path, fingerprint={"model": "m1"})
+    assert len(calls) == 1 and idx.header["n"] == 5
+
+def test_corrupt_file_is_rebuilt(tmp_path):
+    shared_index.publish(*corpus(), directory=tmp_path, meta={"model": "m1"})
+    (tmp_path / "index-1.bin").write_bytes(b"garbage!" * 8)
+    build, calls = counting()
+    idx = shared_index.attach_or_build(build, directory=tmp_path, fingerprint={"model": "m1"})
+    assert len(calls) == 1 and idx.generation == 2
@@ -0,0 +1,241 @@
+# tests/test_singleflight.py  (request coalescing and admission control under concurrency)
+import threading
+import time
+import pytest
+from app.admission import AdmissionController, Overloaded
+from app.resilience import CircuitOpen
+from app.singleflight import SingleFlight, llm_flight
+
+def wait_for(predicate, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out waiting for threads"
+        time.sleep(0.001)
+
+def run_threads(n: int, target) -> list:
+    """Run target(i) on n threads; returns each thread's result or exception."""
+    results = [None] * n
+
+    def wrap(i):
+        try:
+            results[i] = target(i)
+        except BaseException as e:
+            results[i] = e
+    threads = [threading.Thread(target=wrap, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results
+
+def join(threads) -> None:
+    for t in threads:
+        t.join(5)
+        assert not t.is_alive()
+
+# ---------- SingleFlight.do ----------
+def test_followers_share_the_leaders_result():
+    flight, release, calls = SingleFlight("t"), threading.Event(), []
+
+    def fn(i):
+        calls.append(i)
+        release.wait(5)
+        return f"answer-{i}"
+    leader, lres = run_threads(1, lambda i: flight.do("k", fn, "leader"))
+    wait_for(lambda: flight.stats()["in_flight"] == 1)
+    followers, fres = run_threads(4, lambda i: flight.do("k", fn, f"follower-{i}"))
+    wait_for(lambda: flight.counters["coalesced"] == 4)
+    release.set()
+    join(leader + followers)
+    assert calls == ["leader"]
+    assert lres + fres == ["answer-leader"] * 5
+    assert flight.stats()["in_flight"] == 0
+
+def test_leader_error_propagates_to_followers():
+    flight, release = SingleFlight("t", private=(Overloaded,)), threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError("model failed")
+    leader, lres = run_threads(1, lambda i: flight.do("k", fn))
+    wait_for(lambda: flight.stats()["in_flight"] == 1)
+    followers, fres = run_threads(3, lambda i: flight.do("k", fn))
+    wait_for(lambda: flight.counters["coalesced"] == 3)
+    release.set()
+    join(leader + followers)
+    assert all(isinstance(r, ValueError) for r in lres + fres)
+    assert flight.counters["executed"] == 1 and flight.counters["errors"] == 1
+
+def test_private_error_is_not_shared_with_followers():
+    flight, release, calls = SingleFlight("t", private=(Overloaded,)), threading.Event(), []
+
+    def fn(session):
+        calls.append(session)
+        if session == "busy":
+            release.wait(5)
+            raise Overloaded(429, "Too many concurrent requests for this session", 1)
+        return f"answer-{session}"
+    leader, lres = run_threads(1, lambda i: flight.do("k", fn, "busy"))
+    wait_for(lambda: flight.stats()["in_flight"] == 1)
+    followers, fres = run_threads(3, lambda i: flight.do("k", fn, f"s{i}"))
+    wait_for(lambda: flight.counters["coalesced"] == 3)
+    release.set()
+    join(leader + followers)
+    assert isinstance(lres[0], Overloaded) and lres[0].status_code == 429
+    # the followers retried under their own sessions: one led, the others joined it or led later
+    assert all(isinstance(r, str) and r.startswith("answer-s") for r in fres)
+    assert calls[0] == "busy" and 1 <= len(calls) - 1 <= 3
+    assert flight.counters["follower_retries"] == 3
+
+def test_shared_subclass_of_private_error_fails_the_group():
+    flight, release, calls = SingleFlight("t", private=(Overloaded,), shared=(CircuitOpen,)), threading.Event(), []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        raise CircuitOpen("llm", 30)
+    leader, lres = run_threads(1, lambda i: flight.do("k", fn))
+    wait_for(lambda: flight.stats()["in_flight"] == 1)
+    followers, fres = run_threads(3, lambda i: flight.do("k", fn))
+    wait_for(lambda: flight.counters["coalesced"] == 3)
+    release.set()
+    join(leader + followers)
+    assert all(isinstance(r, CircuitOpen) for r in lres + fres)
+    assert len(calls) == 1 and flight.counters["follower_retries"] == 0
+
+def test_llm_flight_shares_breaker_rejections_only():
+    assert llm_flight._is_private(Overloaded(429, "busy", 1))
+    assert not llm_flight._is_private(CircuitOpen("llm", 1))
+
+def test_keys_are_forgotten_after_an_error():
+    flight = SingleFlight("t")
+    with pytest.raises(KeyError):
+        flight.do("k", lambda: {}["missing"])
+    assert flight.do("k", lambda: 42) == 42
+
+# ---------- SingleFlight.stream ----------
+def test_stream_followers_replay_from_the_start():
+    flight, release = SingleFlight("t"), threading.Event()
+
+    def source():
+        yield "a"
+        release.wait(5)
+        yield "b"
+    leader = flight.stream("k", source)
+    assert next(leader) == "a"
+    follower = flight.stream("k", source)
+    release.set()
+    assert list(leader) == ["b"]
+    assert list(follower) == ["a", "b"]
+    assert flight.counters["streams_executed"] == 1
+
+def test_stream_private_open_error_is_retried_by_followers():
+    flight, release = SingleFlight("t", private=(Overloaded,)), threading.Event()
+
+    def open_fn(session):
+        if session == "busy":
+            release.wait(5)
+            raise Overloaded(429, "Too many concurrent requests for this session", 1)
+        return iter([session])
+    leader, lres = run_threads(1, lambda i: flight.stream("k", open_fn, "busy"))
+    wait_for(lambda: flight.stats()["streams_in_flight"] == 1)
+    followers, fres = run_threads(2, lambda i: list(flight.stream("k", open_fn, f"s{i}")))
+    wait_for(lambda: flight.counters["streams_coalesced"] == 2)
+    release.set()
+    join(leader + followers)
+    assert isinstance(lres[0], Overloaded)
+    assert all(r in (["s0"], ["s1"]) for r in fres)
+
+def test_stream_shared_open_error_reaches_followers_before_iteration():
+    flight, release = SingleFlight("t", private=(Overloaded,)), threading.Event()
+
+    def open_fn():
+        release.wait(5)
+        raise ValueError("backend down")
+    leader, lres = run_threads(1, lambda i: flight.stream("k", open_fn))
+    wait_for(lambda: flight.stats()["streams_in_flight"] == 1)
+    followers, fres = run_threads(2, lambda i: flight.stream("k", open_fn))
+    wait_for(lambda: flight.counters["streams_coalesced"] == 2)
+    release.set()
+    join(leader + followers)
+    assert all(isinstance(r, ValueError) for r in lres + fres)
+
+# ---------- AdmissionController ----------
+def test_per_session_limit_rejects_with_429():
+    gate = AdmissionController(max_concurrency=4, queue_size=4, per_session=1, timeout_s=1)
+    gate.acquire("a")
+    with pytest.raises(Overloaded) as exc:
+        gate.acquire("a")
+    assert exc.value.status_code == 429
+    gate.acquire("b")                      # other sessions are unaffected
+    gate.release("a")
+    gate.release("b")
+    assert gate.stats()["active"] == 0
+
+def test_full_queue_rejects_with_503():
+    gate = AdmissionController(max_concurrency=1, queue_size=1, per_session=4, timeout_s=5)
+    gate.acquire("a")
+    waiter, res = run_threads(1, lambda i: gate.acquire("b"))
+    wait_for(lambda: gate.stats()["queued"] == 1)
+    with pytest.raises(Overloaded) as exc:
+        gate.acquire("c")
+    assert exc.value.status_code == 503
+    gate.release("a")
+    join(waiter)
+    assert res == [None] and gate.stats()["active"] == 1
+    gate.release("b")
+
+def test_queue_timeout_frees_the_session_slot():
+    gate = AdmissionController(max_concurrency=1, queue_size=4, per_session=1, timeout_s=0.05)
+    gate.acquire("a")
+    with pytest.raises(Overloaded) as exc:
+        gate.acquire("b")
+    assert exc.value.status_code == 503
+    gate.release("a")
+    gate.acquire("b")                      # the timed-out wait did not leak b's session load
+    gate.release("b")
+    assert gate.stats()["queued"] == 0 and gate.stats()["rejected_timeout"] == 1
+
+def test_queued_waiters_are_granted_in_priority_order():
+    gate = AdmissionController(max_concurrency=1, queue_size=8, per_session=4, timeout_s=5)
+    gate.acquire("hold")
+    order, lock = [], threading.Lock()
+
+    def waiter(i):
+        session, priority = [("long", 2), ("short", 1), ("cached", 0)][i]
+        gate.acquire(session, priority)
+        with lock:
+            order.append(session)
+        gate.release(session)
+    threads = []
+    for i in range(3):                     # enqueue one at a time so arrival order is fixed
+        t, _ = run_threads(1, lambda _, i=i: waiter(i))
+        threads += t
+        wait_for(lambda: gate.stats()["queued"] == i + 1)
+    gate.release("hold")
+    join(threads)
+    assert order == ["cached", "short", "long"]
+
+def test_rejected_leader_does_not_reject_followers_of_other_sessions():
+    gate = AdmissionController(max_concurrency=4, queue_size=4, per_session=1, timeout_s=1)
+    flight, release = SingleFlight("t", private=(Overloaded,)), threading.Event()
+
+    def gated(session):
+        with gate.slot(session):
+            release.wait(5)
+            return "answer"
+    gate.acquire("busy")                   # "busy" already has its one request in flight
+    hold = threading.Event()
+
+    def slow_reject(session):
+        hold.wait(5)
+        return gated(session)
+    leader, lres = run_threads(1, lambda i: flight.do("k", slow_reject, "busy"))
+    wait_for(lambda: flight.stats()["in_flight"] == 1)
+    followers, fres = run_threads(2, lambda i: flight.do("k", gated, f"s{i}"))
+    wait_for(lambda: flight.counters["coalesced"] == 2)
+    hold.set()
+    release.set()
+    join(leader + followers)
+    gate.release("busy")
+    assert isinstance(lres[0], Overloaded) and lres[0].status_code == 429
+    assert fres == ["answer", "answer"]
+    assert gate.stats()["active"] == 0
@@ -0,0 +1,63 @@
+# tests/test_suggest.py  (name folding, match tiers, phonetic/typo tolerance, staleness of the built index)
+import json
+import pytest
+from app import search, suggest
+from app.docstore import DocStore
+from app.suggest import SuggestIndex, fold, names_from_docs, phonetic
+
+NAMES = [("Pradhan Mantri Kisan Samman Nidhi", "scheme", 16), ("Rajasthan PM Kisan Yojana", "scheme", 4),
+         ("Post Matric Scholarship", "scheme", 9), ("Mukhyamantri Awas Yojana", "scheme", 3),
+         ("PM Kisan", "title", 2)]
+
+def test_fold_and_aliases():
+    assert fold("Pradhan  Mantri Kisan-Yojanā") == "pm kisan yojana"
+    assert fold("Mukhyamantri Awas") == fold("Mukhya Mantri Awas") == "cm awas"
+    assert fold("Mukhyamantri Awas", aliases=False) == "mukhyamantri awas"
+    assert phonetic("yojana") == phonetic("yojna") == phonetic("yojanaa")
+
+def test_duplicate_folded_names_merge_counts():
+    idx = SuggestIndex(NAMES)
+    # "Pradhan Mantri Kisan..." and "PM Kisan" fold differently; the title "PM Kisan" stays its own name
+    assert len(idx) == 5
+    merged = SuggestIndex([("PM Kisan", "title", 2), ("pm  kisan", "scheme", 3)])
+    assert len(merged) == 1 and merged.names == ["pm  kisan"] and merged.counts[0] == 5
+
+def test_tiers_in_order():
+    idx = SuggestIndex(NAMES)
+    out = idx.lookup("pm ki")
+    assert [o["match"] for o in out][:2] == ["prefix", "prefix"]
+    assert out[0]["text"] == "Pradhan Mantri Kisan Samman Nidhi"               # more chunks first
+    assert {"text": "Rajasthan PM Kisan Yojana", "kind": "scheme", "chunks": 4, "match": "word"} in out
+    assert idx.lookup("pradhan man")[0]["text"] == "Pradhan Mantri Kisan Samman Nidhi"
+
+def test_phonetic_and_typo_matches():
+    idx = SuggestIndex(NAMES)
+    assert idx.lookup("awas yojna")[0] == {"text": "Mukhyamantri Awas Yojana", "kind": "scheme", "chunks": 3,
+                                           "match": "phonetic"}
+    assert idx.lookup("kisaan")[0]["match"] == "phonetic"
+    assert idx.lookup("scholarhsip")[0] == {"text": "Post Matric Scholarship", "kind": "scheme", "chunks": 9,
+                                            "match": "fuzzy"}
+    assert idx.lookup("zzzz") == [] and idx.lookup("  ") == []
+
+def test_limit():
+    assert len(SuggestIndex(NAMES).lookup("p", limit=2)) == 2
+
+def test_names_from_docs():
+    docs = DocStore.from_rows([
+        {"id": 1, "source": "scheme", "title": "Overview", "content": "",
+         "metadata": json.dumps({"scheme_name": "PM Kisan", "source": "pmkisan.gov.in"})},
+        {"id": 2, "source": "scheme", "title": "Overview", "content": "", "metadata": json.dumps({"scheme_name": "PM Kisan"})},
+    ])
+    assert sorted(names_from_docs(docs)) == [("Overview", "title", 2), ("PM Kisan", "scheme", 2),
+                                             ("pmkisan.gov.in", "source", 1)]
+
+def test_index_is_stale_after_a_generation_change(monkeypatch):
+    monkeypatch.setattr(search, "INDEX_MODE", "local")
+    monkeypatch.setattr(search, "_cache_ready", True)
+    monkeypatch.setattr(search, "_cache_generation", 3)
+    monkeypatch.setattr(suggest, "_current", SuggestIndex(NAMES, generation=3))
+    assert suggest.ready() is suggest._current
+    monkeypatch.setattr(search, "_cache_generation", 4)
+    assert suggest.ready() is None
+    monkeypatch.setattr(suggest, "_current", None)
+    assert suggest.ready() is None